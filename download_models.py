@@ -2,15 +2,26 @@ import os
 
 from transformers import T5ForConditionalGeneration, T5Tokenizer
 
+from translator.model_store import save_model_store
+from translator.provisioning import write_manifest
+from translator.tokenization import convert_fast_tokenizer, fast_tokenizer_path
+
 model_name = "utrobinmv/t5_translate_en_ru_zh_small_1024"
 MODEL_PATH = "./models"
 
-os.mkdir(MODEL_PATH, exist_ok=True)
+os.makedirs(MODEL_PATH, exist_ok=True)
 
 # 下载模型和分词器并保存到本地
 model = T5ForConditionalGeneration.from_pretrained(model_name)
 tokenizer = T5Tokenizer.from_pretrained(model_name)
 
-# 保存模型和分词器到指定目录
-model.save_pretrained(MODEL_PATH)
+# 保存模型和分词器到指定目录，权重保存为safetensors，翻译时以内存映射方式加载
+save_model_store(model, MODEL_PATH)
 tokenizer.save_pretrained(MODEL_PATH)
+
+# 转换并缓存快速分词器，翻译时直接加载tokenizer.json
+convert_fast_tokenizer(MODEL_PATH, tokenizer, fast_tokenizer_path(MODEL_PATH))
+
+# 最后生成完整性清单：记录各文件的大小和sha256，启动时据此校验，
+# 也可将models目录打包后用 python -m translator.provisioning install 安装到其他机器
+write_manifest(MODEL_PATH)
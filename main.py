@@ -3,8 +3,11 @@ AI 智能翻译器主入口文件
 支持中文、英文、俄文之间的互译
 """
 
+import logging
+import multiprocessing
 import sys
 
+from PyQt6.QtCore import QTimer
 from PyQt6.QtGui import QFont
 from PyQt6.QtWidgets import QApplication
 
@@ -15,6 +18,7 @@ from translator.translator_app import TranslatorApp
 
 def main():
     """主函数"""
+    logging.basicConfig(format="%(levelname)s %(name)s: %(message)s")
     app = QApplication(sys.argv)
 
     # 设置全局字体
@@ -28,8 +32,13 @@ def main():
     translator.theme_button.setText("🌓")  # 月亮图标表示可以切换到暗色主题
 
     translator.show()
+
+    # 窗口显示后再在后台加载并预热模型，避免阻塞界面启动
+    QTimer.singleShot(0, translator.start_warmup)
     sys.exit(app.exec())
 
 
 if __name__ == "__main__":
+    # 打包后的程序以spawn方式启动推理进程时需要
+    multiprocessing.freeze_support()
     main()
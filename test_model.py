@@ -1,4 +1,6 @@
-from transformers import T5ForConditionalGeneration, T5Tokenizer
+from transformers import T5ForConditionalGeneration
+
+from translator.tokenization import load_tokenizer
 
 device = "cpu"  # or 'cpu' for translate on cpu
 
@@ -9,7 +11,8 @@ MODEL_PATH = "./models"
 
 model = T5ForConditionalGeneration.from_pretrained(MODEL_PATH)
 model.to(device)
-tokenizer = T5Tokenizer.from_pretrained(MODEL_PATH)
+# 优先使用快速分词器（首次运行时转换并缓存为 MODEL_PATH/tokenizer.json）
+tokenizer = load_tokenizer(MODEL_PATH)
 
 # model = T5ForConditionalGeneration.from_pretrained(model_name)
 
@@ -0,0 +1,111 @@
+"""命令行批量翻译的测试：输入解析、输出格式和文件收集，不加载模型"""
+
+import json
+
+import pytest
+
+from translator import cli
+
+
+def translate_upper(units):
+    return [unit.upper() for unit in units]
+
+
+def run_job(tmp_path, name, content, *extra):
+    source = tmp_path / name
+    source.write_text(content, encoding="utf-8")
+    args = cli.build_parser().parse_args(["-t", "zh", str(source), *extra])
+    jobs = cli.collect_jobs(args.inputs, args.format, args.output, args.target)
+    stats = cli.translate_job(jobs[0], translate_upper, args)
+    with open(jobs[0].output, encoding="utf-8") as f:
+        return f.read(), stats
+
+
+def test_plain_text_paragraphs(tmp_path):
+    output, stats = run_job(
+        tmp_path, "doc.txt", "first line\nstill first\n\n\nsecond\n"
+    )
+    assert output == "FIRST LINE\nSTILL FIRST\n\nSECOND\n"
+    assert stats["units"] == 2
+    assert (tmp_path / "doc.zh.txt").exists()
+
+
+def test_empty_text(tmp_path):
+    output, stats = run_job(tmp_path, "empty.txt", "\n\n")
+    assert output == ""
+    assert stats["units"] == 0
+
+
+def test_jsonl_records(tmp_path):
+    content = '{"id": 1, "text": "hello"}\n\n{"id": 2, "text": "привет"}\n'
+    output, stats = run_job(tmp_path, "data.jsonl", content)
+    records = [json.loads(line) for line in output.splitlines()]
+    assert records == [
+        {"id": 1, "text": "hello", "translation": "HELLO"},
+        {"id": 2, "text": "привет", "translation": "ПРИВЕТ"},
+    ]
+    assert stats["skipped"] == 0
+
+
+def test_jsonl_custom_fields(tmp_path):
+    output, _ = run_job(
+        tmp_path,
+        "data.jsonl",
+        '{"src": "hi"}\n',
+        "--field",
+        "src",
+        "--output-field",
+        "dst",
+    )
+    assert json.loads(output) == {"src": "hi", "dst": "HI"}
+
+
+def test_jsonl_invalid_records_pass_through(tmp_path, capsys):
+    lines = [
+        '"just a string"',
+        "[1, 2]",
+        "42",
+        '{"text": null}',
+        '{"text": 5}',
+        '{"other": "x"}',
+        "{not json",
+        '{"text": "ok"}',
+    ]
+    output, stats = run_job(tmp_path, "data.jsonl", "\n".join(lines) + "\n")
+    assert output.splitlines()[:-1] == lines[:-1]
+    assert json.loads(output.splitlines()[-1]) == {"text": "ok", "translation": "OK"}
+    assert stats["units"] == 1
+    assert stats["skipped"] == 7
+    errors = capsys.readouterr().err
+    assert "data.jsonl:1:" in errors and "data.jsonl:7:" in errors
+    assert "None" not in output
+
+
+def test_directory_skips_previous_outputs(tmp_path):
+    (tmp_path / "a.txt").write_text("x", encoding="utf-8")
+    (tmp_path / "a.zh.txt").write_text("X", encoding="utf-8")
+    (tmp_path / "b.jsonl").write_text("{}", encoding="utf-8")
+    (tmp_path / "c.csv").write_text("", encoding="utf-8")
+    jobs = cli.collect_jobs([str(tmp_path)], "auto", None, "zh")
+    assert [(job.source, job.format) for job in jobs] == [
+        (str(tmp_path / "a.txt"), "text"),
+        (str(tmp_path / "b.jsonl"), "jsonl"),
+    ]
+
+
+def test_missing_input(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        cli.collect_jobs([str(tmp_path / "missing.txt")], "auto", None, "zh")
+
+
+def test_batch_translate_units_keeps_blank_units():
+    class Pipeline:
+        def translate_many(self, units, target_lang, source_lang=None):
+            return [f"{target_lang}:{unit}" for unit in units]
+
+    args = cli.build_parser().parse_args(["-t", "zh"])
+    assert cli.batch_translate_units(Pipeline(), ["a", " ", "b"], args) == [
+        "zh:a",
+        " ",
+        "zh:b",
+    ]
@@ -0,0 +1,114 @@
+"""术语表匹配规则的测试"""
+
+import pytest
+
+from translator.glossary import Glossary
+
+
+@pytest.fixture
+def glossary():
+    return Glossary(
+        ["en", "zh", "ru"],
+        [
+            {"en": "life cycle", "zh": "全寿命周期", "ru": "жизненный цикл"},
+            {"en": "life cycle cost", "zh": "全寿命周期成本"},
+            {"en": "cost", "ru": "стоимость"},
+            {"en": "LCC"},
+            {"en": "cycle"},
+        ],
+    )
+
+
+def spans(glossary, text, target_lang=None):
+    return [
+        (text[start:end], index)
+        for start, end, index in glossary.find(text, target_lang)
+    ]
+
+
+def test_longest_match_wins(glossary):
+    assert spans(glossary, "The life cycle cost rises.") == [("life cycle cost", 1)]
+
+
+def test_overlap_keeps_earliest_match(glossary):
+    # "cycle"被先开始的"life cycle"覆盖
+    assert spans(glossary, "life cycle and cost") == [
+        ("life cycle", 0),
+        ("cost", 2),
+    ]
+
+
+def test_matching_ignores_case(glossary):
+    assert spans(glossary, "LIFE CYCLE, lcc") == [("LIFE CYCLE", 0), ("lcc", 3)]
+
+
+def test_latin_terms_respect_word_boundaries(glossary):
+    assert spans(glossary, "costly recycle LCCs") == []
+    assert spans(glossary, "(cost), cost_x, cost2") == [("cost", 2)]
+
+
+def test_cjk_terms_match_inside_text(glossary):
+    assert spans(glossary, "降低全寿命周期成本的方法") == [("全寿命周期成本", 1)]
+
+
+def test_cyrillic_terms(glossary):
+    assert spans(glossary, "Жизненный цикл и стоимость") == [
+        ("Жизненный цикл", 0),
+        ("стоимость", 2),
+    ]
+
+
+def test_target_lang_filter(glossary):
+    text = "life cycle cost and LCC"
+    assert spans(glossary, text, "zh") == [("life cycle cost", 1)]
+
+
+def test_filtered_match_does_not_hide_shorter_terms(glossary):
+    # 最长的术语在目标语言中没有写法时，改用它包含的较短术语
+    assert spans(glossary, "life cycle cost and LCC", "ru") == [
+        ("life cycle", 0),
+        ("cost", 2),
+    ]
+
+
+def test_fingerprint_changes_with_entries():
+    first = Glossary(["en", "zh"], [{"en": "cost", "zh": "成本"}])
+    same = Glossary(["en", "zh"], [{"en": "cost", "zh": "成本"}])
+    changed = Glossary(["en", "zh"], [{"en": "cost", "zh": "费用"}])
+    assert first.fingerprint == same.fingerprint
+    assert first.fingerprint != changed.fingerprint
+
+
+def test_load_uses_index_cache(tmp_path):
+    path = tmp_path / "glossary.tsv"
+    path.write_text("# 注释\nen\tzh\ncost\t成本\n\t仅中文\n", encoding="utf-8")
+    cache_dir = tmp_path / "cache"
+    built = Glossary.load(str(path), str(cache_dir))
+    assert len(list(cache_dir.iterdir())) == 1
+    cached = Glossary.load(str(path), str(cache_dir))
+    assert (
+        cached.entries
+        == built.entries
+        == [{"en": "cost", "zh": "成本"}, {"zh": "仅中文"}]
+    )
+    assert cached.find("cost") == [(0, 4, 0)]
+
+
+def test_duplicate_spellings_pick_entry_for_target_lang():
+    glossary = Glossary(
+        ["en", "zh", "ru"],
+        [
+            {"en": "bearing", "zh": "轴承"},
+            {"en": "bearing", "ru": "подшипник"},
+        ],
+    )
+    assert glossary.find("the bearing", "zh") == [(4, 11, 0)]
+    assert glossary.find("the bearing", "ru") == [(4, 11, 1)]
+    assert glossary.find("the bearing") == [(4, 11, 0)]
+
+
+def test_term_shared_by_two_columns():
+    glossary = Glossary(
+        ["en", "ru", "zh"], [{"en": "GPU", "ru": "GPU", "zh": "图形处理器"}]
+    )
+    assert glossary.find("GPU", "zh") == [(0, 3, 0)]
@@ -0,0 +1,55 @@
+"""语言识别的测试：按文字统计，夹杂的缩写、型号和网址不影响结果"""
+
+import re
+
+import pytest
+
+from translator.language_detection import detect_language
+
+
+@pytest.mark.parametrize(
+    "text, lang",
+    [
+        ("你好，世界", "zh"),
+        ("Привет, мир", "ru"),
+        ("Hello, world", "en"),
+        ("Crème brûlée", "en"),
+        ("NASA and ESA launched it", "en"),
+    ],
+)
+def test_single_script(text, lang):
+    assert detect_language(text) == lang
+
+
+@pytest.mark.parametrize(
+    "text, lang",
+    [
+        ("GPU显存", "zh"),
+        ("显卡型号是NVIDIA RTX4090，支持CUDA 12", "zh"),
+        ("请访问https://example.com/docs/guide了解详情", "zh"),
+        ("联系support@example.com获取iPhone的GPT-4配置", "zh"),
+        ("今天天气很好 and the weather", "zh"),
+        ("Видеокарта NVIDIA GeForce RTX", "ru"),
+        ("The word 你好 means hello", "en"),
+    ],
+)
+def test_mixed_script_picks_dominant(text, lang):
+    assert detect_language(text) == lang
+
+
+@pytest.mark.parametrize("text", ["", "GPU", "123 456", "你好 hello"])
+def test_too_short_or_balanced(text):
+    assert detect_language(text) is None
+
+
+def test_ignore_pattern():
+    pattern = re.compile(r"`[^`]*`")
+    text = "运行`pip install --upgrade package`"
+    assert detect_language(text) == "en"
+    assert detect_language(text, pattern) == "zh"
+
+
+def test_sample_chars():
+    text = "你好世界" + "hello world " * 100
+    assert detect_language(text, sample_chars=4) == "zh"
+    assert detect_language(text, sample_chars=0) == "en"
@@ -0,0 +1,68 @@
+"""长文本切分的测试：句子切分和按token数合并片段，不加载模型"""
+
+import pytest
+
+from translator.pipeline import pack_chunks, split_sentences
+
+
+def count_words(texts):
+    return [len(text.split()) for text in texts]
+
+
+def count_chars(texts):
+    return [len(text) for text in texts]
+
+
+@pytest.mark.parametrize(
+    "text, sentences",
+    [
+        ("One. Two! Three? Four", ["One.", "Two!", "Three?", "Four"]),
+        ("他来了。她走了！真的？", ["他来了。", "她走了！", "真的？"]),
+        ("Wait… what? Yes.", ["Wait…", "what?", "Yes."]),
+        ("Dr. Smith arrived. He sat down.", ["Dr. Smith arrived.", "He sat down."]),
+        ("Mrs. Brown and Mr. Green met.", ["Mrs. Brown and Mr. Green met."]),
+        (
+            "Use fruit, e.g. apples. Or i.e. pears.",
+            ["Use fruit, e.g. apples.", "Or i.e. pears."],
+        ),
+        ("J. K. Rowling wrote it. Fine.", ["J. K. Rowling wrote it.", "Fine."]),
+        ("It was the U.S. Army. Ok.", ["It was the U.S. Army.", "Ok."]),
+        ("See Fig. 3 and No. 5 here.", ["See Fig. 3 and No. 5 here."]),
+        ("(Dr. Who) left. Bye.", ["(Dr. Who) left.", "Bye."]),
+        ("Это, т.е. пример. Да.", ["Это, т.е. пример.", "Да."]),
+        ("Version 2.0 is out. now lowercase", ["Version 2.0 is out. now lowercase"]),
+    ],
+)
+def test_split_sentences(text, sentences):
+    assert split_sentences(text) == sentences
+
+
+def test_split_sentences_empty():
+    assert split_sentences("   ") == []
+
+
+def test_pack_chunks_merges_greedily():
+    sentences = ["a b", "c", "d e f", "g"]
+    assert pack_chunks(sentences, count_words, 3) == ["a b c", "d e f", "g"]
+
+
+def test_pack_chunks_splits_long_sentence_by_clauses():
+    sentences = ["x", "a b, c d, e f", "y"]
+    assert pack_chunks(sentences, count_words, 2) == ["x", "a b,", "c d,", "e f", "y"]
+
+
+def test_pack_chunks_splits_long_sentence_by_words():
+    assert pack_chunks(["a b c d e"], count_words, 2) == ["a b", "c d", "e"]
+
+
+def test_pack_chunks_splits_text_without_spaces():
+    chunks = pack_chunks(["一二三四五"], count_chars, 2)
+    assert chunks == ["一二", "三", "四五"]
+    assert all(len(chunk) <= 2 for chunk in chunks)
+
+
+def test_pack_chunks_keeps_all_text():
+    sentences = split_sentences("Dr. Smith came home. " * 20)
+    assert len(sentences) == 20
+    chunks = pack_chunks(sentences, count_words, 10)
+    assert chunks == ["Dr. Smith came home. Dr. Smith came home."] * 10
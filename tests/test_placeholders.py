@@ -0,0 +1,70 @@
+"""占位符保护与还原的测试"""
+
+import pytest
+
+from translator.glossary import Glossary
+from translator.placeholders import PlaceholderProtector
+
+
+@pytest.fixture
+def protector():
+    return PlaceholderProtector(quote_hyphenated=False)
+
+
+@pytest.mark.parametrize(
+    "text, protected",
+    [
+        ("数值为1,000元。", ["1,000"]),
+        ("于2024-01-01发布", ["2024-01-01"]),
+        ("编号123456的订单", ["123456"]),
+        ("版本1.2.3已发布", ["1.2.3"]),
+        ("见10.1000/xyz。", ["10.1000/xyz"]),
+        ("访问https://example.com/a?b=1，谢谢", ["https://example.com/a?b=1"]),
+        ("Visit www.example.com.", ["www.example.com"]),
+        ("联系邮箱a.b@example.com获取", ["a.b@example.com"]),
+        ("运行`pip install x`即可", ["`pip install x`"]),
+        ("The value is 3,500.", ["3,500"]),
+    ],
+)
+def test_patterns_match_next_to_cjk_and_punctuation(protector, text, protected):
+    assert protector.protect(text).spans == protected
+
+
+@pytest.mark.parametrize("text", ["共12件", "abc12345", "COVID-19", "第3章"])
+def test_short_or_embedded_numbers_are_not_protected(protector, text):
+    assert protector.protect(text).spans == []
+
+
+def test_round_trip(protector):
+    text = "数值为1,000元，见https://example.com/a。"
+    protected = protector.protect(text)
+    assert protected.text == "数值为[0]元，见[1]。"
+    assert protected.restore("The value is [0] yuan, see [1].") == (
+        "The value is 1,000 yuan, see https://example.com/a."
+    )
+
+
+def test_existing_markers_are_skipped(protector):
+    protected = protector.protect("参见[0]和[1]，共1,000条")
+    assert protected.text == "参见[0]和[1]，共[2]条"
+    # 原文中的[0]、[1]保持不变
+    assert protected.restore("See [0] and [1], [2] in total") == (
+        "See [0] and [1], 1,000 in total"
+    )
+
+
+def test_restore_tolerates_spacing_and_appends_missing(protector):
+    protected = protector.protect("日期2024-01-01，网址www.example.com")
+    assert protected.restore("Date [ 0 ]") == "Date 2024-01-01 www.example.com"
+    # 流式显示中不补回缺失的片段
+    assert protected.restore("Date [0]", partial=True) == "Date 2024-01-01"
+
+
+def test_glossary_terms_restore_to_target_spelling():
+    glossary = Glossary(
+        ["en", "zh"], [{"en": "life cycle cost", "zh": "全寿命周期成本"}]
+    )
+    protector = PlaceholderProtector(quote_hyphenated=False, glossary=glossary)
+    protected = protector.protect("The life cycle cost is 1,000.", "zh")
+    assert protected.text == "The [0] is [1]."
+    assert protected.restore("[0]为[1]。") == "全寿命周期成本为1,000。"
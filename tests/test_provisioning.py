@@ -0,0 +1,228 @@
+"""模型安装、续传与启动校验的测试"""
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import struct
+import tarfile
+import zipfile
+
+import pytest
+
+from translator import provisioning
+from translator.provisioning import (
+    ProvisioningError,
+    check_stamp,
+    ensure_model,
+    install_model,
+    read_manifest,
+    resolve_path,
+    verify_files,
+    write_manifest,
+)
+
+
+def _safetensors(data_size: int) -> bytes:
+    header = json.dumps(
+        {"w": {"dtype": "U8", "shape": [data_size], "data_offsets": [0, data_size]}}
+    ).encode("utf-8")
+    return struct.pack("<Q", len(header)) + header + os.urandom(data_size)
+
+
+@pytest.fixture
+def source(tmp_path):
+    """带清单的模型镜像目录"""
+    path = tmp_path / "source"
+    (path / "sub").mkdir(parents=True)
+    (path / "config.json").write_text("{}")
+    (path / "model.safetensors").write_bytes(_safetensors(64))
+    (path / "spiece.model").write_bytes(os.urandom(3 * provisioning.CHUNK_SIZE // 2))
+    (path / "sub" / "extra.bin").write_bytes(b"x" * 10)
+    # 可重新生成的缓存不计入清单
+    (path / "tokenizer.json").write_text("{}")
+    write_manifest(str(path))
+    return path
+
+
+def _archive(source, tmp_path, kind):
+    if kind == "dir":
+        return str(source)
+    if kind == "zip":
+        archive = tmp_path / "model.zip"
+        with zipfile.ZipFile(archive, "w") as zf:
+            for path in source.rglob("*"):
+                if path.is_file():
+                    zf.write(path, path.relative_to(source).as_posix())
+        return str(archive)
+    archive = tmp_path / "model.tar.gz"
+    with tarfile.open(archive, "w:gz") as tf:
+        # 压缩包中的文件位于顶层目录下
+        tf.add(source, arcname="models")
+    return str(archive)
+
+
+@pytest.mark.parametrize("kind", ["dir", "zip", "tar"])
+def test_install_from_source(source, tmp_path, kind):
+    target = tmp_path / "model"
+    manifest = install_model(_archive(source, tmp_path, kind), str(target))
+    assert "tokenizer.json" not in manifest["files"]
+    assert verify_files(str(target), manifest) == []
+    assert check_stamp(str(target))
+    assert not list(target.rglob("*.part"))
+
+
+def test_install_resumes_from_part(source, tmp_path):
+    target = tmp_path / "model"
+    target.mkdir()
+    data = (source / "spiece.model").read_bytes()
+    (target / "spiece.model.part").write_bytes(data[: len(data) // 2])
+    install_model(str(source), str(target))
+    assert (target / "spiece.model").read_bytes() == data
+    assert not (target / "spiece.model.part").exists()
+    assert check_stamp(str(target))
+
+
+def test_copy_resumable_reads_only_remainder(tmp_path):
+    data = os.urandom(1000)
+    target = tmp_path / "file.bin"
+    (tmp_path / "file.bin.part").write_bytes(data[:400])
+    reader = io.BytesIO(data)
+    reads = []
+    original_read = reader.read
+
+    def read(size=-1):
+        chunk = original_read(size)
+        reads.append(len(chunk))
+        return chunk
+
+    reader.read = read
+    provisioning._copy_resumable(
+        reader, str(target), len(data), hashlib.sha256(data).hexdigest()
+    )
+    assert target.read_bytes() == data
+    assert sum(reads) == 600
+
+
+def test_corrupted_part_is_removed(source, tmp_path):
+    target = tmp_path / "model"
+    target.mkdir()
+    part = target / "spiece.model.part"
+    part.write_bytes(b"\0" * 100)
+    with pytest.raises(ProvisioningError):
+        install_model(str(source), str(target))
+    assert not part.exists()
+    assert not check_stamp(str(target))
+    # 删除损坏的进度后重新安装即可完成
+    install_model(str(source), str(target))
+    assert check_stamp(str(target))
+
+
+def test_oversized_part_is_discarded(source, tmp_path):
+    target = tmp_path / "model"
+    target.mkdir()
+    data = (source / "spiece.model").read_bytes()
+    (target / "spiece.model.part").write_bytes(data + b"extra")
+    install_model(str(source), str(target))
+    assert (target / "spiece.model").read_bytes() == data
+
+
+def test_corrupted_source_fails(source, tmp_path):
+    (source / "config.json").write_text("{1}")
+    target = tmp_path / "model"
+    with pytest.raises(ProvisioningError):
+        install_model(str(source), str(target))
+    assert not (target / "config.json").exists()
+    assert not check_stamp(str(target))
+
+
+def test_missing_source_fails(tmp_path):
+    with pytest.raises(ProvisioningError):
+        install_model(str(tmp_path / "missing"), str(tmp_path / "model"))
+
+
+def test_stamp_detects_changed_files(source, tmp_path):
+    target = tmp_path / "model"
+    install_model(str(source), str(target))
+    path = target / "spiece.model"
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert not check_stamp(str(target))
+    # 内容未变时完整校验通过并重写标记
+    assert ensure_model(str(target), "")
+    assert check_stamp(str(target))
+
+
+def test_ensure_model_reinstalls_corrupted_files(source, tmp_path):
+    target = tmp_path / "model"
+    install_model(str(source), str(target))
+    path = target / "spiece.model"
+    data = bytearray(path.read_bytes())
+    data[5] ^= 1
+    path.write_bytes(bytes(data))
+    assert not ensure_model(str(target), "")
+    assert ensure_model(str(target), str(source))
+    assert path.read_bytes() == (source / "spiece.model").read_bytes()
+    assert check_stamp(str(target))
+
+
+def test_ensure_model_adopts_legacy_install(source, tmp_path):
+    legacy = tmp_path / "legacy"
+    shutil.copytree(source, legacy)
+    os.remove(legacy / provisioning.MODEL_MANIFEST_FILE)
+    os.remove(legacy / provisioning.MODEL_STAMP_FILE)
+    assert ensure_model(str(legacy), "")
+    assert "model.safetensors" in read_manifest(str(legacy))["files"]
+    assert check_stamp(str(legacy))
+
+
+def test_ensure_model_rejects_truncated_legacy_weights(source, tmp_path):
+    legacy = tmp_path / "legacy"
+    shutil.copytree(source, legacy)
+    os.remove(legacy / provisioning.MODEL_MANIFEST_FILE)
+    os.remove(legacy / provisioning.MODEL_STAMP_FILE)
+    with open(legacy / "model.safetensors", "r+b") as f:
+        f.truncate(20)
+    assert not ensure_model(str(legacy), "")
+
+
+@pytest.mark.parametrize(
+    "name",
+    ["../x", "a/../../x", "..\\..\\x", "C:foo", "C:/Windows/x", "/etc/x", "a//b"],
+)
+def test_manifest_rejects_unsafe_paths(source, tmp_path, name):
+    manifest = read_manifest(str(source))
+    manifest["files"][name] = {"size": 1, "sha256": "0" * 64}
+    (source / provisioning.MODEL_MANIFEST_FILE).write_text(json.dumps(manifest))
+    target = tmp_path / "install" / "model"
+    with pytest.raises(ProvisioningError):
+        install_model(str(source), str(target))
+    assert not (tmp_path / "x").exists()
+    assert not (tmp_path / "install" / "x").exists()
+
+
+def test_resolve_path_stays_inside_root(tmp_path):
+    root = str(tmp_path / "model")
+    assert resolve_path(root, "sub/a.bin") == os.path.join(root, "sub", "a.bin")
+    for name in ("../x", "sub/../../x", "."):
+        with pytest.raises(ProvisioningError):
+            resolve_path(root, name)
+
+
+def test_archive_with_unsafe_prefix_is_rejected(source, tmp_path):
+    archive = tmp_path / "model.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        for path in source.rglob("*"):
+            if path.is_file():
+                zf.write(path, "../" + path.relative_to(source).as_posix())
+    with pytest.raises(ProvisioningError):
+        install_model(str(archive), str(tmp_path / "model"))
+
+
+def test_tar_created_with_dot_prefix(source, tmp_path):
+    archive = tmp_path / "model.tar"
+    with tarfile.open(archive, "w") as tf:
+        tf.add(source, arcname=".")
+    install_model(str(archive), str(tmp_path / "model"))
+    assert check_stamp(str(tmp_path / "model"))
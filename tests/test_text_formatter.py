@@ -0,0 +1,53 @@
+"""排版保持的测试：缩进、空行、行尾空白和换行符在译文中原样恢复"""
+
+import pytest
+
+from translator.text_formatter import TextFormatter
+
+
+def round_trip(text, translate=lambda line: line.upper()):
+    formatter = TextFormatter()
+    contents = formatter.extract_format(text)
+    return contents, formatter.restore_format([translate(c) for c in contents])
+
+
+def test_indentation_and_trailing_spaces():
+    contents, output = round_trip("  first line  \n\tsecond\n    - item")
+    assert contents == ["first line", "second", "- item"]
+    assert output == "  FIRST LINE  \n\tSECOND\n    - ITEM"
+
+
+def test_blank_lines_are_kept():
+    contents, output = round_trip("a\n\n\n  \nb")
+    assert contents == ["a", "b"]
+    assert output == "A\n\n\n  \nB"
+
+
+@pytest.mark.parametrize("text", ["line\n", "line\n\n", "line\r\n", "\nline"])
+def test_leading_and_trailing_newlines(text):
+    _, output = round_trip(text)
+    assert output == text.replace("line", "LINE")
+
+
+def test_mixed_line_breaks():
+    _, output = round_trip("a\r\nb\rc\nd")
+    assert output == "A\r\nB\rC\nD"
+
+
+def test_identity_translation_restores_original():
+    text = "  标题\n\n\t正文第一行\n正文第二行  \r\n\n"
+    _, output = round_trip(text, lambda line: line)
+    assert output == text
+
+
+def test_empty_text():
+    contents, output = round_trip("")
+    assert contents == []
+    assert output == ""
+
+
+def test_missing_lines_while_streaming():
+    formatter = TextFormatter()
+    formatter.extract_format("  a\n\n  b\n")
+    # 流式显示时后面的行尚未翻译
+    assert formatter.restore_format(["A"]) == "  A\n\n  \n"
@@ -0,0 +1,10 @@
+"""
+命令行入口：python -m translator
+"""
+
+import sys
+
+from translator.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
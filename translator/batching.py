@@ -0,0 +1,230 @@
+"""
+动态微批处理调度模块
+收集短时间窗口内到达的并发翻译请求，按token长度分桶后合并为填充批次生成，
+再把结果分发回各个请求
+"""
+
+import queue
+import sys
+import threading
+import time
+from typing import Callable, List, Optional
+
+from translator.config import (
+    BATCH_MAX_SIZE,
+    BATCH_MAX_WAIT_MS,
+    DEFAULT_DECODING_PRESET,
+    ENABLE_TRANSLATION_MEMORY,
+    SERVER_QUEUE_SIZE,
+)
+from translator.instrumentation import Trace
+from translator.model_manager import get_model_manager
+
+
+class QueueFullError(Exception):
+    """请求队列已满"""
+
+
+class TranslationJob:
+    """一次翻译请求，由调度线程完成后唤醒等待的请求线程"""
+
+    def __init__(
+        self, texts: List[str], target_lang: str, source_lang: Optional[str] = None
+    ):
+        self.texts = texts
+        self.target_lang = target_lang
+        self.source_lang = source_lang
+        self.result: Optional[List[str]] = None
+        self.error: Optional[Exception] = None
+        self.done = threading.Event()
+
+    def wait(self, timeout: Optional[float] = None) -> List[str]:
+        if not self.done.wait(timeout):
+            raise TimeoutError("翻译超时")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def load_default_pipeline(
+    batch_size: int = BATCH_MAX_SIZE, decoding_preset: str = DEFAULT_DECODING_PRESET
+):
+    """加载并预热共享的常驻模型，创建翻译流水线"""
+    from translator.pipeline import TranslationPipeline
+    from translator.translation_memory import get_translation_memory
+    from translator.worker_pool import get_worker_pool
+
+    manager = get_model_manager()
+    model, tokenizer = manager.load()
+    manager.warmup()
+    memory = get_translation_memory() if ENABLE_TRANSLATION_MEMORY else None
+    return TranslationPipeline(
+        model,
+        tokenizer,
+        batch_size=batch_size,
+        memory=memory,
+        decoding_preset=decoding_preset,
+        pool=get_worker_pool(),
+    )
+
+
+class MicroBatchScheduler:
+    """
+    动态微批处理调度器
+
+    调度线程取到第一个请求后，最多再等待max_wait_ms收集后续请求，
+    累计文本数达到max_batch_size时立即开始生成。同一目标语言的请求合并处理，
+    流水线按token长度排序分批，使同一批中的序列长度相近、填充最少
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait_ms: float = BATCH_MAX_WAIT_MS,
+        queue_size: int = SERVER_QUEUE_SIZE,
+        pipeline_factory: Optional[Callable[[], object]] = None,
+        decoding_preset: str = DEFAULT_DECODING_PRESET,
+    ):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.manager = get_model_manager()
+        self._pipeline_factory = pipeline_factory or (
+            lambda: load_default_pipeline(self.max_batch_size, decoding_preset)
+        )
+        self._pipeline = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._worker = threading.Thread(
+            target=self._run, name="batch-scheduler", daemon=True
+        )
+        self.stats = {
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "batches": 0,
+            "batched_texts": 0,
+        }
+
+    def start(self):
+        self._worker.start()
+
+    def stop(self):
+        """停止调度线程（已入队的请求处理完后退出）"""
+        self._queue.put(None)
+
+    @property
+    def ready(self) -> bool:
+        return self._pipeline is not None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(
+        self, texts: List[str], target_lang: str, source_lang: Optional[str] = None
+    ) -> TranslationJob:
+        """提交翻译请求，队列已满时抛出QueueFullError"""
+        job = TranslationJob(texts, target_lang, source_lang)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self.stats["rejected"] += 1
+            raise QueueFullError("请求队列已满，请稍后重试")
+        return job
+
+    def translate(
+        self, texts: List[str], target_lang: str, source_lang: Optional[str] = None
+    ) -> List[str]:
+        """提交请求并阻塞等待结果"""
+        return self.submit(texts, target_lang, source_lang).wait()
+
+    def _run(self):
+        try:
+            self._pipeline = self._pipeline_factory()
+        except Exception as e:
+            print(f"模型加载失败: {str(e)}", file=sys.stderr)
+            # 让排队中的请求尽快失败，而不是等到超时
+            while True:
+                job = self._queue.get()
+                if job is None:
+                    return
+                job.error = e
+                job.done.set()
+
+        while True:
+            jobs = self._collect_batch()
+            if not jobs:
+                return
+            self._process(jobs)
+            if jobs[-1] is None:
+                return
+
+    def _collect_batch(self) -> List[TranslationJob]:
+        """阻塞等待第一个请求，然后在时间窗口内继续收集，直到批次填满"""
+        first = self._queue.get()
+        if first is None:
+            return []
+
+        jobs = [first]
+        collected = len(first.texts)
+        deadline = time.monotonic() + self.max_wait
+        while collected < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if job is None:
+                # 收到停止信号，处理完当前批次后退出
+                jobs.append(None)
+                break
+            jobs.append(job)
+            collected += len(job.texts)
+        return jobs
+
+    def _refresh_pool(self):
+        """推理进程意外退出后，换用重新启动的共享推理进程池"""
+        pool = getattr(self._pipeline, "pool", None)
+        if pool is not None and not pool.usable:
+            from translator.worker_pool import get_worker_pool
+
+            self._pipeline.pool = get_worker_pool()
+
+    def _process(self, jobs: List[Optional[TranslationJob]]):
+        """按语言对分组，每组合并为一次批量翻译，再按请求切分结果"""
+        groups = {}
+        for job in jobs:
+            if job is not None:
+                key = (job.target_lang, job.source_lang)
+                groups.setdefault(key, []).append(job)
+
+        for (target_lang, source_lang), group in groups.items():
+            texts = [text for job in group for text in job.texts]
+            try:
+                self._refresh_pool()
+                with Trace(
+                    "server",
+                    target_lang=target_lang,
+                    source_lang=source_lang,
+                    requests=len(group),
+                    texts=len(texts),
+                ):
+                    translations = self._pipeline.translate_many(
+                        texts, target_lang, source_lang=source_lang
+                    )
+            except Exception as e:
+                for job in group:
+                    job.error = e
+                    job.done.set()
+                self.stats["failed"] += len(group)
+                continue
+
+            self.stats["batches"] += 1
+            self.stats["batched_texts"] += len(texts)
+            position = 0
+            for job in group:
+                job.result = translations[position : position + len(job.texts)]
+                position += len(job.texts)
+                job.done.set()
+            self.stats["completed"] += len(group)
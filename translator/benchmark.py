@@ -0,0 +1,516 @@
+"""
+性能基准测试模块
+离线测量模型加载、分词、首token延迟、按输入长度分桶的端到端延迟分位数、
+生成吞吐和峰值内存，本地模型还比较慢速与快速分词器的耗时，
+结果写为JSON以便在版本之间比较
+
+可使用本地模型，或使用随机初始化的微型T5（字节级分词器，无需下载任何文件）
+在没有模型的环境中快速运行
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from translator.config import (
+    BENCHMARK_BUCKETS,
+    BENCHMARK_REGRESSION_TOLERANCE,
+    BENCHMARK_SAMPLES,
+    DEFAULT_DECODING_PRESET,
+    MODEL_PATH,
+    MODEL_PRECISION,
+)
+from translator.decoding import build_generation_kwargs
+from translator.quantization import REFERENCE_CORPUS
+from translator.streaming import BatchTokenStreamer
+
+# 结果格式版本，字段含义变化时递增
+RESULT_FORMAT_VERSION = 1
+# 用于比较的关键指标：(路径, 数值越大越好)
+KEY_METRICS = [
+    (("load_seconds",), False),
+    (("throughput", "tokens_per_second"), True),
+    (("peak_rss_mb",), False),
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """线性插值的分位数，q取0-100"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(values: List[float]) -> dict:
+    """汇总一组耗时（秒）为毫秒分位数"""
+    return {
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "mean_ms": round(statistics.mean(values) * 1000, 2) if values else 0.0,
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    """进程峰值常驻内存（MB），无法获取时返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux上单位为KB，macOS上为字节
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def load_tiny_model(seed: int = 0):
+    """
+    创建随机初始化的微型T5和字节级分词器，完全离线
+
+    Returns:
+        tuple: (model, tokenizer)
+    """
+    import torch
+    from transformers import ByT5Tokenizer, T5Config, T5ForConditionalGeneration
+
+    torch.manual_seed(seed)
+    tokenizer = ByT5Tokenizer()
+    config = T5Config(
+        vocab_size=len(tokenizer),
+        d_model=64,
+        d_kv=16,
+        d_ff=128,
+        num_layers=2,
+        num_decoder_layers=2,
+        num_heads=4,
+        pad_token_id=tokenizer.pad_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+        decoder_start_token_id=tokenizer.pad_token_id,
+    )
+    model = T5ForConditionalGeneration(config)
+    model.eval()
+    return model, tokenizer
+
+
+def build_bucket_inputs(
+    count_tokens: Callable[[List[str]], List[int]], target_tokens: int, samples: int
+) -> List[tuple]:
+    """
+    从固定语料拼接出约target_tokens个token的输入，每个样本从不同的句子开始
+
+    Returns:
+        List[tuple]: (目标语言, 原文)
+    """
+    inputs = []
+    for sample in range(samples):
+        target_lang = REFERENCE_CORPUS[sample % len(REFERENCE_CORPUS)][0]
+        sentences = []
+        index = sample
+        while True:
+            sentences.append(REFERENCE_CORPUS[index % len(REFERENCE_CORPUS)][1])
+            index += 1
+            if count_tokens([" ".join(sentences)])[0] >= target_tokens:
+                break
+        inputs.append((target_lang, " ".join(sentences)))
+    return inputs
+
+
+def measure_tokenizer(
+    tokenizer, texts: List[str], batch_size: int = 8, repeats: int = 5
+) -> dict:
+    """测量按批分词和batch_decode的平均耗时（每条文本）"""
+    batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+    encoded = [tokenizer(batch, padding=True)["input_ids"] for batch in batches]
+
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for batch in batches:
+            tokenizer(batch, padding=True)
+    encode_seconds = (time.perf_counter() - started) / (repeats * len(texts))
+
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for ids in encoded:
+            tokenizer.batch_decode(ids, skip_special_tokens=True)
+    decode_seconds = (time.perf_counter() - started) / (repeats * len(texts))
+    return {
+        "encode_ms_per_text": round(encode_seconds * 1000, 4),
+        "decode_ms_per_text": round(decode_seconds * 1000, 4),
+    }
+
+
+def compare_tokenizers(
+    texts: List[str], source: str = MODEL_PATH, batch_size: int = 8
+) -> Optional[dict]:
+    """
+    比较慢速（SentencePiece）与快速分词器的分词和解码耗时
+
+    Returns:
+        dict: 两种分词器的耗时及加速比；快速分词器不可用时返回None
+    """
+    from translator.tokenization import load_slow_tokenizer, load_tokenizer
+
+    fast_tokenizer = load_tokenizer(source)
+    if not getattr(fast_tokenizer, "is_fast", False):
+        return None
+    slow = measure_tokenizer(load_slow_tokenizer(source), texts, batch_size)
+    fast = measure_tokenizer(fast_tokenizer, texts, batch_size)
+    return {
+        "slow": slow,
+        "fast": fast,
+        "encode_speedup": round(
+            slow["encode_ms_per_text"] / max(fast["encode_ms_per_text"], 1e-6), 2
+        ),
+        "decode_speedup": round(
+            slow["decode_ms_per_text"] / max(fast["decode_ms_per_text"], 1e-6), 2
+        ),
+    }
+
+
+class Benchmark:
+    """在已加载的模型上执行各项测量"""
+
+    def __init__(self, model, tokenizer, preset: str = DEFAULT_DECODING_PRESET):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.preset = preset
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        encoded = self.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def generate(self, items: List[tuple]) -> dict:
+        """
+        对一批(目标语言, 原文)执行一次端到端翻译：分词、生成和解码
+
+        Returns:
+            dict: seconds（含分词和解码的端到端耗时）、
+                first_token_seconds（从开始分词计时，无流式输出时为None）和generated_tokens
+        """
+        import torch
+
+        texts = [f"translate to {lang}: {text}" for lang, text in items]
+        first_token = []
+        started = time.perf_counter()
+        inputs = self.tokenizer(texts, return_tensors="pt", padding=True)
+        kwargs = build_generation_kwargs(
+            self.preset,
+            inputs["input_ids"].shape[-1],
+            [lang for lang, _ in items],
+        )
+
+        def on_update(streamer):
+            if not first_token and streamer.generated_tokens:
+                first_token.append(time.perf_counter() - started)
+
+        streamer = BatchTokenStreamer(self.tokenizer, on_update, min_interval=0.0)
+        if kwargs.get("num_beams", 1) == 1:
+            kwargs["streamer"] = streamer
+        with torch.no_grad():
+            generated = self.model.generate(**inputs, **kwargs)
+        self.tokenizer.batch_decode(generated, skip_special_tokens=True)
+        seconds = time.perf_counter() - started
+
+        if "streamer" in kwargs:
+            generated_tokens = streamer.generated_tokens
+        else:
+            special = {self.tokenizer.pad_token_id, self.tokenizer.eos_token_id}
+            generated_tokens = sum(
+                1 for row in generated.tolist() for token in row if token not in special
+            )
+        return {
+            "seconds": seconds,
+            "first_token_seconds": first_token[0] if first_token else None,
+            "generated_tokens": generated_tokens,
+        }
+
+    def measure_tokenization(self, items: List[tuple], repeats: int = 5) -> dict:
+        """测量单条文本分词的平均耗时"""
+        texts = [f"translate to {lang}: {text}" for lang, text in items]
+        started = time.perf_counter()
+        for _ in range(repeats):
+            for text in texts:
+                self.tokenizer(text, return_tensors="pt")
+        seconds = (time.perf_counter() - started) / (repeats * len(texts))
+        return {"ms_per_text": round(seconds * 1000, 4)}
+
+    def measure_bucket(self, items: List[tuple], warmup: int = 2) -> dict:
+        """逐条生成，统计端到端延迟和首token延迟的分位数"""
+        for item in items[:warmup]:
+            self.generate([item])
+
+        latencies = []
+        first_tokens = []
+        generated_tokens = 0
+        for item in items:
+            result = self.generate([item])
+            latencies.append(result["seconds"])
+            generated_tokens += result["generated_tokens"]
+            if result["first_token_seconds"] is not None:
+                first_tokens.append(result["first_token_seconds"])
+
+        total_seconds = sum(latencies)
+        return {
+            "samples": len(items),
+            "mean_input_tokens": round(
+                statistics.mean(self.count_tokens([text for _, text in items])), 1
+            ),
+            "latency": summarize(latencies),
+            "time_to_first_token": summarize(first_tokens) if first_tokens else None,
+            "tokens_per_second": (
+                round(generated_tokens / total_seconds, 2) if total_seconds else 0.0
+            ),
+        }
+
+    def measure_throughput(self, items: List[tuple], batch_size: int) -> dict:
+        """按批生成所有输入，统计总吞吐"""
+        self.generate(items[:batch_size])
+        generated_tokens = 0
+        started = time.perf_counter()
+        for start in range(0, len(items), batch_size):
+            result = self.generate(items[start : start + batch_size])
+            generated_tokens += result["generated_tokens"]
+        seconds = time.perf_counter() - started
+        return {
+            "batch_size": batch_size,
+            "segments": len(items),
+            "seconds": round(seconds, 4),
+            "tokens_per_second": (
+                round(generated_tokens / seconds, 2) if seconds else 0.0
+            ),
+            "segments_per_second": round(len(items) / seconds, 3) if seconds else 0.0,
+        }
+
+
+def _environment(model_kind: str, backend: Optional[str]) -> dict:
+    import torch
+
+    try:
+        import transformers
+
+        transformers_version = transformers.__version__
+    except ImportError:
+        transformers_version = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "transformers": transformers_version,
+        "model": model_kind,
+        "backend": backend,
+        "precision": MODEL_PRECISION if model_kind == "local" else "fp32",
+    }
+
+
+def run_benchmark(
+    model_kind: str = "tiny",
+    buckets: Dict[str, int] = BENCHMARK_BUCKETS,
+    samples: int = BENCHMARK_SAMPLES,
+    batch_size: int = 8,
+    preset: str = DEFAULT_DECODING_PRESET,
+    backend: Optional[str] = None,
+    seed: int = 0,
+    log: Callable[[str], None] = print,
+) -> dict:
+    """
+    执行完整的基准测试
+
+    Args:
+        model_kind: "local"使用本地模型，"tiny"使用随机初始化的微型T5
+        buckets: 输入长度分桶，桶名 -> 目标输入token数
+        samples: 每个分桶的样本数
+        batch_size: 吞吐测试的批大小
+        preset: 解码预设
+        backend: 本地模型使用的推理后端，None时使用配置中的后端
+        seed: 微型模型的随机种子
+        log: 输出进度的函数
+
+    Returns:
+        dict: 测试结果
+    """
+    started = time.perf_counter()
+    if model_kind == "tiny":
+        model, tokenizer = load_tiny_model(seed)
+        active_backend = "torch"
+    else:
+        from translator.model_manager import get_model_manager
+
+        manager = get_model_manager()
+        if backend:
+            manager.set_backend(backend)
+        model, tokenizer = manager.load()
+        active_backend = manager.active_backend
+    load_seconds = time.perf_counter() - started
+    log(f"模型加载: {load_seconds:.2f} 秒")
+
+    bench = Benchmark(model, tokenizer, preset)
+    results = {
+        "format": RESULT_FORMAT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": _environment(model_kind, active_backend),
+        "preset": preset,
+        "load_seconds": round(load_seconds, 4),
+        "tokenization": {},
+        "buckets": {},
+    }
+
+    all_items = []
+    for name, target_tokens in buckets.items():
+        items = build_bucket_inputs(bench.count_tokens, target_tokens, samples)
+        all_items.extend(items)
+        results["tokenization"][name] = bench.measure_tokenization(items)
+        results["buckets"][name] = bench.measure_bucket(items)
+        latency = results["buckets"][name]["latency"]
+        log(
+            f"{name}: p50 {latency['p50_ms']}ms, p95 {latency['p95_ms']}ms, "
+            f"p99 {latency['p99_ms']}ms"
+        )
+
+    if model_kind == "local":
+        # 微型模型使用字节级分词器，没有对应的快速版本
+        comparison = compare_tokenizers(
+            [f"translate to {lang}: {text}" for lang, text in all_items],
+            batch_size=batch_size,
+        )
+        if comparison is not None:
+            results["tokenizers"] = comparison
+            log(
+                f"快速分词器: 分词 {comparison['encode_speedup']}x, "
+                f"解码 {comparison['decode_speedup']}x"
+            )
+
+    # 吞吐测试按长度排序分批，与翻译流水线的分桶方式一致
+    all_items.sort(key=lambda item: bench.count_tokens([item[1]])[0])
+    results["throughput"] = bench.measure_throughput(all_items, batch_size)
+    log(f"吞吐: {results['throughput']['tokens_per_second']} token/秒")
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def _lookup(results: dict, path: tuple):
+    value = results
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def compare_results(
+    baseline: dict, current: dict, tolerance: float = BENCHMARK_REGRESSION_TOLERANCE
+) -> List[dict]:
+    """
+    比较两次结果的关键指标和各分桶p50/p95延迟，变差超过tolerance的指标标记为回退
+
+    Returns:
+        List[dict]: 每项指标的基准值、当前值、变化比例及是否变差
+    """
+    metrics = list(KEY_METRICS)
+    for name in current.get("buckets", {}):
+        for key in ("p50_ms", "p95_ms"):
+            metrics.append((("buckets", name, "latency", key), False))
+
+    rows = []
+    for path, higher_is_better in metrics:
+        before = _lookup(baseline, path)
+        after = _lookup(current, path)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        rows.append(
+            {
+                "metric": ".".join(path),
+                "baseline": before,
+                "current": after,
+                "change": round(change, 4),
+                "regressed": (
+                    change < -tolerance if higher_is_better else change > tolerance
+                ),
+            }
+        )
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from translator.config import DECODING_PRESETS
+
+    parser = argparse.ArgumentParser(
+        prog="python -m translator.benchmark", description="离线性能基准测试"
+    )
+    parser.add_argument(
+        "--model",
+        choices=["tiny", "local"],
+        default="tiny",
+        help="tiny为随机初始化的微型T5（无需下载），local为本地翻译模型",
+    )
+    parser.add_argument("--backend", help="local模型使用的推理后端（torch/onnx）")
+    parser.add_argument(
+        "--samples", type=int, default=BENCHMARK_SAMPLES, help="每个分桶的样本数"
+    )
+    parser.add_argument("--batch-size", type=int, default=8, help="吞吐测试的批大小")
+    parser.add_argument(
+        "--preset",
+        choices=list(DECODING_PRESETS),
+        default=DEFAULT_DECODING_PRESET,
+        help="解码预设",
+    )
+    parser.add_argument("--threads", type=int, default=0, help="torch线程数")
+    parser.add_argument("--seed", type=int, default=0, help="微型模型的随机种子")
+    parser.add_argument("-o", "--output", help="结果JSON文件，省略时输出到标准输出")
+    parser.add_argument("--compare", help="与之前的结果JSON比较关键指标")
+    args = parser.parse_args(argv)
+
+    if args.threads:
+        import torch
+
+        torch.set_num_threads(args.threads)
+
+    def log(message):
+        print(message, file=sys.stderr)
+
+    results = run_benchmark(
+        model_kind=args.model,
+        samples=max(1, args.samples),
+        batch_size=max(1, args.batch_size),
+        preset=args.preset,
+        backend=args.backend,
+        seed=args.seed,
+        log=log,
+    )
+    content = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(content)
+    else:
+        print(content)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressed = False
+        for row in compare_results(baseline, results):
+            regressed = regressed or row["regressed"]
+            marker = "变差" if row["regressed"] else ""
+            log(
+                f"{row['metric']}: {row['baseline']} -> {row['current']} "
+                f"({row['change']:+.1%}) {marker}"
+            )
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+翻译取消模块
+提供可跨线程设置的取消标记，以及在下一个解码步结束生成的停止条件
+"""
+
+import threading
+
+
+class TranslationCancelled(Exception):
+    """翻译已被取消"""
+
+
+class CancellationToken:
+    """取消标记，由界面线程设置，翻译线程在各阶段之间和每个解码步检查"""
+
+    def __init__(self, event=None):
+        """
+        Args:
+            event: 底层的事件对象，默认为threading.Event；
+                传入multiprocessing的Event时可由其他进程设置
+        """
+        self._event = event if event is not None else threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise TranslationCancelled("翻译已取消")
+
+
+class CancelStopper:
+    """
+    停止条件：取消标记被设置后，在下一个解码步结束所有行
+
+    实现transformers StoppingCriteria的调用接口
+    """
+
+    def __init__(self, token: CancellationToken):
+        self.token = token
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        return torch.full(
+            (input_ids.shape[0],),
+            self.token.cancelled,
+            dtype=torch.bool,
+            device=input_ids.device,
+        )
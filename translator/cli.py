@@ -0,0 +1,377 @@
+"""
+命令行批量翻译模块
+不依赖Qt，可在脚本或定时任务中批量翻译文件、目录或标准输入，
+支持纯文本和JSONL；同一文件中各单元的片段合并后批量生成，
+指定多个推理进程时各批次分发给共享内存映射权重的推理进程并行生成
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from typing import Iterable, List, Optional
+
+from translator.config import (
+    DECODING_PRESETS,
+    DEFAULT_DECODING_PRESET,
+    ENABLE_TRANSLATION_MEMORY,
+    INFERENCE_BACKEND,
+    LANGUAGES,
+    TRANSLATION_BATCH_SIZE,
+)
+from translator.model_manager import BACKENDS
+from translator.pipeline import split_paragraphs
+from translator.worker_pool import WorkerPool
+
+# 目录输入时收集的文件扩展名
+TEXT_EXTENSIONS = {".txt", ".md"}
+JSONL_EXTENSIONS = {".jsonl"}
+
+
+def create_pipeline(args, use_memory: bool, pool: Optional[WorkerPool] = None):
+    """
+    创建翻译流水线，分词、翻译记忆和重组在本进程完成
+
+    未给出推理进程池时在本进程生成：--threads-per-worker为0时使用本机性能配置文件中的
+    线程数和CPU绑定，否则按指定线程数运行；给出进程池时各批次的生成分发给推理进程，
+    本进程只加载分词器，负责分词和调度，不再额外占用一份模型权重的内存
+    """
+    from translator.model_manager import get_model_manager
+    from translator.pipeline import TranslationPipeline
+    from translator.translation_memory import get_translation_memory
+    from translator.tuning import apply_thread_settings
+
+    manager = get_model_manager()
+    manager.set_backend(args.backend)
+    manager.use_performance_profile = pool is None and not args.threads_per_worker
+    if pool is not None:
+        model = None
+        tokenizer = manager.load_tokenizer()
+    else:
+        model, tokenizer = manager.load()
+        if args.threads_per_worker:
+            apply_thread_settings(args.threads_per_worker)
+    return TranslationPipeline(
+        model,
+        tokenizer,
+        batch_size=args.batch_size or manager.batch_size,
+        memory=get_translation_memory() if use_memory else None,
+        decoding_preset=args.preset,
+        pool=pool,
+    )
+
+
+def batch_translate_units(pipeline, units: Iterable[str], args) -> List[str]:
+    """
+    翻译一个文件中的所有单元（段落或JSONL记录），各单元的片段合并后一起分批生成，
+    空白单元原样保留
+    """
+    units = list(units)
+    indices = [i for i, unit in enumerate(units) if unit.strip()]
+    results = list(units)
+    translations = pipeline.translate_many(
+        [units[i] for i in indices], args.target, source_lang=args.source
+    )
+    for i, translation in zip(indices, translations):
+        results[i] = translation
+    return results
+
+
+class FileJob:
+    """一个输入源及其输出位置"""
+
+    def __init__(self, source: str, fmt: str, output: Optional[str]):
+        self.source = source
+        self.format = fmt
+        self.output = output
+
+    @property
+    def is_stdin(self) -> bool:
+        return self.source == "-"
+
+
+def detect_format(path: str, requested: str) -> str:
+    if requested != "auto":
+        return requested
+    return "jsonl" if os.path.splitext(path)[1].lower() in JSONL_EXTENSIONS else "text"
+
+
+def collect_jobs(
+    inputs: List[str], fmt: str, output_dir: Optional[str], target_lang: str
+) -> List[FileJob]:
+    """展开文件、目录和标准输入为翻译任务列表"""
+    jobs = []
+    for item in inputs or ["-"]:
+        if item == "-":
+            jobs.append(FileJob("-", "jsonl" if fmt == "jsonl" else "text", None))
+            continue
+
+        if os.path.isdir(item):
+            for root, _dirs, files in os.walk(item):
+                for name in sorted(files):
+                    ext = os.path.splitext(name)[1].lower()
+                    if ext not in TEXT_EXTENSIONS | JSONL_EXTENSIONS:
+                        continue
+                    path = os.path.join(root, name)
+                    # 跳过之前写在原文件旁边的译文
+                    if not output_dir and _is_translation_output(path, target_lang):
+                        continue
+                    relative = os.path.relpath(path, item)
+                    jobs.append(
+                        FileJob(
+                            path,
+                            detect_format(path, fmt),
+                            _output_path(path, relative, output_dir, target_lang),
+                        )
+                    )
+        elif os.path.isfile(item):
+            jobs.append(
+                FileJob(
+                    item,
+                    detect_format(item, fmt),
+                    _output_path(item, os.path.basename(item), output_dir, target_lang),
+                )
+            )
+        else:
+            raise FileNotFoundError(f"输入不存在: {item}")
+    return jobs
+
+
+def _is_translation_output(path: str, target_lang: str) -> bool:
+    stem = os.path.splitext(path)[0]
+    return stem.endswith(f".{target_lang}")
+
+
+def _output_path(
+    path: str, relative: str, output_dir: Optional[str], target_lang: str
+) -> str:
+    if output_dir:
+        return os.path.join(output_dir, relative)
+    # 未指定输出目录时写在原文件旁边，如 paper.txt -> paper.zh.txt
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{target_lang}{ext}"
+
+
+def _read_source(job: FileJob) -> str:
+    if job.is_stdin:
+        return sys.stdin.read()
+    with open(job.source, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _write_result(job: FileJob, content: str):
+    if job.output is None:
+        sys.stdout.write(content)
+        sys.stdout.flush()
+        return
+    directory = os.path.dirname(job.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(job.output, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def _parse_record(line: str, field: str):
+    """
+    解析一行JSONL记录
+
+    Returns:
+        tuple: (记录, None)；记录无法翻译时为(None, 原因)
+    """
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        return None, f"不是有效的JSON（{str(e)}）"
+    if not isinstance(record, dict):
+        return None, "不是JSON对象"
+    if not isinstance(record.get(field), str):
+        return None, f"字段 {field} 缺失或不是字符串"
+    return record, None
+
+
+def translate_job(job: FileJob, translate_units, args) -> dict:
+    """
+    翻译一个输入源并写出结果
+
+    Args:
+        job: 翻译任务
+        translate_units: 按顺序翻译单元列表的函数
+        args: 命令行参数
+
+    Returns:
+        dict: 该文件的吞吐统计
+    """
+    started = time.perf_counter()
+    content = _read_source(job)
+
+    skipped = 0
+    if job.format == "jsonl":
+        # 无法翻译的行给出提示后原样输出，不中断整个文件，输出行与输入行一一对应
+        lines = []
+        records = []
+        for number, line in enumerate(content.splitlines(), 1):
+            if not line.strip():
+                continue
+            record, problem = _parse_record(line, args.field)
+            if record is None:
+                print(f"{job.source}:{number}: {problem}，已原样输出", file=sys.stderr)
+                skipped += 1
+            else:
+                records.append((len(lines), record))
+            lines.append(line)
+        units = [record[args.field] for _, record in records]
+        translations = translate_units(units)
+        for (position, record), translation in zip(records, translations):
+            record[args.output_field] = translation
+            lines[position] = json.dumps(record, ensure_ascii=False)
+        result = "\n".join(lines) + ("\n" if lines else "")
+    else:
+        # 纯文本按段落切分，各段落的片段合并后批量翻译，译文段落之间以空行分隔
+        units = split_paragraphs(content)
+        translations = translate_units(units)
+        result = "\n\n".join(translations) + ("\n" if translations else "")
+
+    _write_result(job, result)
+    elapsed = time.perf_counter() - started
+    input_chars = sum(len(unit) for unit in units)
+    return {
+        "source": job.source,
+        "output": job.output or "-",
+        "units": len(units),
+        "skipped": skipped,
+        "input_chars": input_chars,
+        "output_chars": sum(len(t) for t in translations),
+        "seconds": round(elapsed, 3),
+        "chars_per_second": round(input_chars / elapsed, 1) if elapsed else 0.0,
+        "units_per_second": round(len(units) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m translator",
+        description="本地翻译器命令行批量翻译（不依赖图形界面）",
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="*",
+        help="输入文件或目录，省略或为 - 时从标准输入读取",
+    )
+    parser.add_argument(
+        "-t",
+        "--target",
+        required=True,
+        choices=sorted(LANGUAGES.values()),
+        help="目标语言代码",
+    )
+    parser.add_argument(
+        "-s",
+        "--source",
+        choices=sorted(LANGUAGES.values()),
+        help="源语言代码，用于确定输出长度上限，省略时按最宽松的比例",
+    )
+    parser.add_argument("-o", "--output", help="输出目录，默认写在输入文件旁边")
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=["auto", "text", "jsonl"],
+        default="auto",
+        help="输入格式，auto按扩展名判断（标准输入默认为text）",
+    )
+    parser.add_argument("--field", default="text", help="JSONL中待翻译的字段名")
+    parser.add_argument(
+        "--output-field", default="translation", help="JSONL中写入译文的字段名"
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=1,
+        help="推理进程数，各进程共享内存映射的权重，批次由空闲的进程处理",
+    )
+    parser.add_argument(
+        "--threads-per-worker",
+        type=int,
+        default=0,
+        help="每个推理进程的torch线程数，默认单进程时使用性能配置，多进程时平分CPU核心",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=INFERENCE_BACKEND,
+        help="推理后端，onnx需要先导出模型，缺失时回退到torch",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=0,
+        help=f"每次批量生成的片段数，默认使用性能配置或 {TRANSLATION_BATCH_SIZE}",
+    )
+    parser.add_argument(
+        "--preset",
+        choices=list(DECODING_PRESETS),
+        default=DEFAULT_DECODING_PRESET,
+        help="解码预设：fast为贪心解码，balanced/quality使用束搜索",
+    )
+    parser.add_argument("--no-memory", action="store_true", help="不使用翻译记忆缓存")
+    parser.add_argument("--stats", help="将每个文件的吞吐统计写入该JSON文件")
+    return parser
+
+
+def _print_stats(stats: dict):
+    print(
+        f"{stats['source']} -> {stats['output']}: "
+        f"{stats['units']} 个单元, {stats['input_chars']} 字符, "
+        f"{stats['seconds']:.2f} 秒, {stats['chars_per_second']:.1f} 字符/秒",
+        file=sys.stderr,
+    )
+
+
+def run(args) -> List[dict]:
+    jobs = collect_jobs(args.inputs, args.format, args.output, args.target)
+    workers = max(1, args.workers)
+    use_memory = ENABLE_TRANSLATION_MEMORY and not args.no_memory
+
+    all_stats = []
+    pool = (
+        WorkerPool(workers, args.threads_per_worker, args.backend)
+        if workers > 1
+        else None
+    )
+    try:
+        # 主进程先确认本地模型可用（必要时完成安装或下载），推理进程启动后只需做快速校验
+        pipeline = create_pipeline(args, use_memory, pool)
+        if pool is not None:
+            pool.start()
+        for job in jobs:
+            stats = translate_job(
+                job, lambda units: batch_translate_units(pipeline, units, args), args
+            )
+            _print_stats(stats)
+            all_stats.append(stats)
+    finally:
+        if pool is not None:
+            pool.close()
+
+    if args.stats:
+        with open(args.stats, "w", encoding="utf-8") as f:
+            json.dump(all_stats, f, ensure_ascii=False, indent=2)
+    return all_stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    # 模型加载、安装等库代码的提示通过logging输出到标准错误
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    try:
+        run(args)
+    except (OSError, ValueError) as e:
+        print(f"翻译出错: {str(e)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
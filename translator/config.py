@@ -16,9 +16,186 @@ APP_MIN_HEIGHT = 450
 MODEL_NAME = "utrobinmv/t5_translate_en_ru_zh_small_1024"
 # 本地模型路径
 MODEL_PATH = "./models"
-USE_LOCAL_MODEL = os.path.exists(MODEL_PATH)
-# 输入文本长度限制
+# 优先使用本地模型：MODEL_PATH按完整性清单校验通过（或可从安装源安装）时从本地加载，
+# 否则从在线模型库下载并保存到MODEL_PATH
+USE_LOCAL_MODEL = True
+# 完整性清单：MODEL_PATH下各文件的大小和sha256，由download_models.py或安装时写入
+MODEL_MANIFEST_FILE = "manifest.json"
+# 完整校验通过后记录各文件大小和修改时间的标记，启动时只比较这些信息而不重新计算哈希
+MODEL_STAMP_FILE = ".verified"
+# 本地安装源：包含清单的模型压缩包（.zip/.tar/.tar.gz）或镜像目录，
+# 本地模型缺失或不完整时从这里续传安装，可通过环境变量 LOCAL_TRANSLATOR_MODEL_SOURCE 指定
+MODEL_INSTALL_SOURCE = os.environ.get("LOCAL_TRANSLATOR_MODEL_SOURCE", "")
+# 推理后端："torch"（PyTorch）或 "onnx"（ONNX Runtime，需先导出，缺失时回退到PyTorch），
+# 可通过环境变量 LOCAL_TRANSLATOR_BACKEND 覆盖
+INFERENCE_BACKEND = os.environ.get("LOCAL_TRANSLATOR_BACKEND", "torch")
+# ONNX导出文件目录
+ONNX_MODEL_DIR = os.path.join(MODEL_PATH, "onnx")
+ONNX_OPSET = 14
+# 推理精度："fp32" 或 "int8"（线性层int8动态量化，CPU上更快、更省内存）
+MODEL_PRECISION = "fp32"
+# 是否将量化后的权重缓存在MODEL_PATH下，避免每次启动重新量化
+USE_QUANTIZED_CACHE = True
+QUANTIZED_MODEL_FILE = "model_int8.pt"
+# 以内存映射方式加载MODEL_PATH下的safetensors权重：权重不复制到进程私有内存，
+# 同一台机器上的多个进程共享同一份物理页；缺少该文件时首次加载后自动生成
+USE_MMAP_WEIGHTS = True
+MODEL_WEIGHTS_FILE = "model.safetensors"
+# 使用Rust实现的快速分词器：首次加载时由SentencePiece模型转换，
+# 保存为MODEL_PATH下的tokenizer.json；转换不可用时回退到慢速分词器
+USE_FAST_TOKENIZER = True
+FAST_TOKENIZER_FILE = "tokenizer.json"
+# 输入文本长度提示阈值，超过后按段落和句子分段翻译
 MAX_INPUT_LENGTH = 500
+# 模型输入窗口（token数）
+MODEL_MAX_TOKENS = 512
+# 长文档切分时每个片段的最大token数
+MAX_CHUNK_TOKENS = 200
+# 每次批量生成的片段数
+TRANSLATION_BATCH_SIZE = 8
+# 流式显示译文（逐token刷新输出区域）
+ENABLE_STREAMING = True
+# 流式刷新的最小间隔（秒）
+STREAM_UPDATE_INTERVAL = 0.05
+# 估算输出token数时相对输入token数的比例，用于计算进度
+OUTPUT_TOKEN_RATIO = 1.3
+# 图形界面中保持排版：每个非空行作为独立段落翻译，缩进、空行和换行符原样保留
+ENABLE_LAYOUT_PRESERVATION = True
+# 语言识别：按文字类别统计字符，用于自动填写源语言和跳过已是目标语言的片段
+# 跳过与目标语言相同的片段，原文直接作为译文，不经过模型
+SKIP_TARGET_LANGUAGE_SEGMENTS = True
+# 图形界面中根据输入自动选择源语言，手动选择后不再自动切换
+AUTO_DETECT_SOURCE_LANG = True
+# 只统计开头的字符数
+LANGUAGE_DETECTION_SAMPLE_CHARS = 1000
+# 字母和汉字少于该数量时不做判断
+LANGUAGE_DETECTION_MIN_CHARS = 4
+# 占比最高的文字达到该比例才认定为该语言，否则视为混合语言
+LANGUAGE_DETECTION_THRESHOLD = 0.55
+# 一个汉字相当于的字母数
+LANGUAGE_DETECTION_CJK_WEIGHT = 3.0
+# 实时翻译：停止输入该时长（毫秒）后自动翻译，只重新翻译新增或修改过的句子
+LIVE_TRANSLATION_DEBOUNCE_MS = 600
+# 关闭窗口时等待后台模型加载结束的时长（毫秒），超时后先隐藏窗口，加载结束后再退出
+CLOSE_WARMUP_WAIT_MS = 500
+
+# 解码预设：fast为贪心解码（支持流式显示），balanced和quality使用束搜索
+DECODING_PRESETS = {
+    "fast": {"num_beams": 1},
+    "balanced": {"num_beams": 2, "no_repeat_ngram_size": 4},
+    "quality": {"num_beams": 4, "no_repeat_ngram_size": 3, "length_penalty": 1.0},
+}
+DECODING_PRESET_NAMES = {"fast": "快速", "balanced": "均衡", "quality": "高质量"}
+DEFAULT_DECODING_PRESET = "fast"
+# 输出token上限 = 输入token数 * 语言对比例 + MIN_OUTPUT_TOKENS，且不超过MODEL_MAX_TOKENS
+OUTPUT_LENGTH_RATIOS = {
+    ("en", "zh"): 1.2,
+    ("ru", "zh"): 1.1,
+    ("zh", "en"): 2.0,
+    ("zh", "ru"): 2.5,
+    ("en", "ru"): 1.6,
+    ("ru", "en"): 1.3,
+}
+# 源语言未知或语言对未列出时使用的比例
+DEFAULT_OUTPUT_LENGTH_RATIO = 2.5
+MIN_OUTPUT_TOKENS = 16
+# 重复检测：末尾n-gram（n不超过REPETITION_MAX_NGRAM）连续重复达到次数时提前结束解码
+REPETITION_MAX_NGRAM = 8
+REPETITION_MIN_REPEATS = 4
+
+# 占位符保护：匹配以下模式的片段在生成前替换为简短的占位符，解码后原样还原，
+# 既避免网址、DOI等被模型改写，也减少输入和输出token数。按顺序匹配，可增删
+PROTECTED_PATTERNS = {
+    # 行内代码
+    "code": r"`[^`\n]+`",
+    # 网址，不含末尾的标点
+    "url": (
+        r"(?:https?://|ftp://|www\.)[^\s<>\"'，。；！？）】]*"
+        r"[^\s<>\"'，。；！？）】.,;:!?)\]]"
+    ),
+    "email": r"[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)+",
+    "doi": r"(?<![0-9A-Za-z_.])10\.\d{4,9}/[^\s<>\"'，。；]*[^\s<>\"'，。；.,;:!?)\]]",
+    # 带小数点或分隔符的数字（日期、版本号、编号等）和长数字。
+    # 不用\b：Python把汉字也当作单词字符，汉字与数字之间没有\b，紧挨汉字的数字会漏掉
+    "number": r"(?<![0-9A-Za-z_.])(?:\d+(?:[.,:/-]\d+)+|\d{5,})(?![0-9A-Za-z_])",
+}
+# 占位符格式，{}处为序号
+PLACEHOLDER_TEMPLATE = "[{}]"
+
+# 用户数据目录（翻译记忆等）
+APP_DATA_DIR = os.path.join(os.path.expanduser("~"), ".local_translator")
+# 按名称在线加载模型时（没有本地模型目录），int8量化缓存存放的目录
+MODEL_CACHE_DIR = os.path.join(APP_DATA_DIR, "cache")
+
+# 翻译记忆配置
+ENABLE_TRANSLATION_MEMORY = True
+TRANSLATION_MEMORY_PATH = os.path.join(APP_DATA_DIR, "translation_memory.db")
+# 内存LRU缓存的最大条目数
+TRANSLATION_MEMORY_SIZE = 10000
+
+# 术语表：制表符分隔的文本文件，首行为语言代码（如 en<TAB>zh<TAB>ru），
+# 之后每行为同一术语在各语言中的写法。原文中出现的术语在翻译时受到保护，
+# 译文中替换为目标语言规定的写法；可通过环境变量 LOCAL_TRANSLATOR_GLOSSARY 指定
+ENABLE_GLOSSARY = True
+GLOSSARY_PATH = os.environ.get(
+    "LOCAL_TRANSLATOR_GLOSSARY", os.path.join(APP_DATA_DIR, "glossary.tsv")
+)
+# 预编译的匹配索引缓存目录，术语表文件未变化时直接加载索引
+GLOSSARY_CACHE_DIR = os.path.join(APP_DATA_DIR, "cache")
+
+# 多进程推理：大于1时启动该数量的推理进程，各自独占一部分CPU核心，
+# 片段按批分发给空闲的进程生成。fp32的PyTorch后端下权重通过内存映射共享，不会占用多份内存；
+# MODEL_PRECISION为int8或使用ONNX后端时，每个推理进程各自持有一份权重
+TRANSLATION_WORKERS = 1
+# 推理进程的启动方式：spawn在子进程中重新导入并内存映射权重；
+# fork直接继承父进程已加载的模型，但父进程执行过推理后再fork，子进程可能因OpenMP线程池卡死
+WORKER_START_METHOD = "spawn"
+
+# 性能配置文件：由 python -m translator.tuning 在本机测得的最佳线程数、批大小和CPU绑定，
+# 模型加载时自动应用；机器或模型变化后配置失效，需要重新调优
+ENABLE_PERFORMANCE_PROFILE = True
+PERFORMANCE_PROFILE_PATH = os.path.join(APP_DATA_DIR, "performance_profile.json")
+# 调优时候选的批大小
+TUNING_BATCH_SIZES = (1, 4, 8, 16)
+# 吞吐达到最佳值的该比例时优先选择更少的线程，为界面和分词留出核心
+TUNING_THREAD_TOLERANCE = 0.95
+
+# 耗时记录：每次翻译各阶段的耗时和token数写入滚动的JSON Lines日志
+ENABLE_TRACE_LOG = True
+TRACE_LOG_PATH = os.path.join(APP_DATA_DIR, "logs", "translations.jsonl")
+TRACE_LOG_MAX_BYTES = 2 * 1024 * 1024
+TRACE_LOG_BACKUP_COUNT = 3
+# 状态栏耗时明细中各阶段的显示名称（按此顺序显示）
+TRACE_STAGE_NAMES = {
+    "model": "模型",
+    "preprocess": "预处理",
+    "detect": "语言识别",
+    "memory": "翻译记忆",
+    "tokenize": "分词",
+    "generate": "生成",
+    "decode": "解码",
+}
+
+# 基准测试：输入长度分桶（桶名 -> 目标输入token数）、每桶样本数，
+# 以及与基准结果比较时视为变差的变化比例
+BENCHMARK_BUCKETS = {"short": 16, "medium": 64, "long": 192}
+BENCHMARK_SAMPLES = 20
+BENCHMARK_REGRESSION_TOLERANCE = 0.10
+
+# 本地HTTP翻译服务配置
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+# 等待处理的请求上限，超出后返回503
+SERVER_QUEUE_SIZE = 64
+# 单个请求等待翻译结果的最长时间（秒）
+SERVER_REQUEST_TIMEOUT = 120
+# 单次批量请求的最大文本条数和请求体大小
+SERVER_MAX_BATCH_TEXTS = 256
+SERVER_MAX_BODY_BYTES = 4 * 1024 * 1024
+
+# 动态微批处理：合并为一批的最大文本数，以及收到第一个请求后的最长等待时间（毫秒）
+BATCH_MAX_SIZE = 16
+BATCH_MAX_WAIT_MS = 10
 
 # 支持的语言
 LANGUAGES = {"中文": "zh", "英文": "en", "俄文": "ru"}
@@ -33,6 +210,10 @@ TEXT_TRANSLATING = "正在翻译..."
 TEXT_TRANSLATION_COMPLETE = "翻译完成"
 TEXT_TRANSLATION_FAILED = "翻译失败"
 TEXT_PREPARING = "准备翻译..."
+TEXT_MODEL_LOADING = "正在加载模型..."
+TEXT_MODEL_WARMING_UP = "正在预热模型..."
+TEXT_MODEL_READY = "模型已就绪"
+TEXT_MODEL_LOAD_FAILED = "模型加载失败，将在翻译时重试"
 TEXT_INPUT_PLACEHOLDER = "请在此输入要翻译的文本..."
 TEXT_OUTPUT_PLACEHOLDER = "翻译结果将显示在这里..."
 TEXT_WARNING = "警告"
@@ -40,14 +221,29 @@ TEXT_EMPTY_INPUT = "请输入要翻译的文本!"
 TEXT_PROGRESS = "翻译进度:"
 TEXT_TRANSLATE = "翻译"
 TEXT_CLEAR = "清除"
+TEXT_CANCEL = "取消"
+TEXT_TRANSLATION_CANCELLED = "翻译已取消"
 TEXT_INPUT = "输入"
 TEXT_OUTPUT = "翻译结果"
 TEXT_SOURCE_LANG = "源语言:"
 TEXT_TARGET_LANG = "目标语言:"
+TEXT_SOURCE_LANG_TOOLTIP = "输入文本时自动识别源语言，手动选择后不再自动切换"
+TEXT_ALL_TARGETS = "全部语言"
+TEXT_ALL_TARGETS_TOOLTIP = "一次批量生成，同时翻译为除源语言外的所有语言"
+TEXT_LIVE_TRANSLATION = "实时翻译"
+TEXT_LIVE_TRANSLATION_TOOLTIP = "停止输入后自动翻译，未修改的句子直接沿用之前的译文"
+# 多目标翻译结果中每种语言的标题
+TEXT_TARGET_SECTION = "【{}】"
+TEXT_DECODING_PRESET = "解码:"
+TEXT_DECODING_PRESET_TOOLTIP = (
+    "快速：贪心解码，流式显示\n均衡/高质量：束搜索，更慢但更准确"
+)
 TEXT_THEME_TOOLTIP = "切换主题"
 TEXT_COPY = "复制"
 TEXT_COPY_TOOLTIP = "复制到剪贴板"
 TEXT_COPIED = "已复制到剪贴板"
 TEXT_INPUT_TOO_LONG = "输入文本过长"
-TEXT_INPUT_LENGTH_WARNING = f"输入文本超过{MAX_INPUT_LENGTH}字符限制，将自动截断"
+TEXT_INPUT_LENGTH_WARNING = (
+    f"输入文本超过{MAX_INPUT_LENGTH}字符，将分段翻译，耗时会更长"
+)
 TEXT_INPUT_LENGTH_INFO = f"当前字符数: {{}} / {MAX_INPUT_LENGTH}"
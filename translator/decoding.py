@@ -0,0 +1,130 @@
+"""
+解码策略模块
+提供速度/质量预设、按输入长度和语言对计算的输出长度上限，
+以及检测重复输出并提前结束解码的停止条件
+"""
+
+import math
+from typing import Iterable, List, Optional
+
+from translator.config import (
+    DECODING_PRESETS,
+    DEFAULT_DECODING_PRESET,
+    DEFAULT_OUTPUT_LENGTH_RATIO,
+    MIN_OUTPUT_TOKENS,
+    MODEL_MAX_TOKENS,
+    OUTPUT_LENGTH_RATIOS,
+    REPETITION_MAX_NGRAM,
+    REPETITION_MIN_REPEATS,
+)
+
+
+def get_preset(name: Optional[str]) -> dict:
+    """获取解码预设参数，未知名称时使用默认预设"""
+    return dict(DECODING_PRESETS.get(name) or DECODING_PRESETS[DEFAULT_DECODING_PRESET])
+
+
+def max_output_tokens(
+    input_tokens: int, target_lang: str, source_lang: Optional[str] = None
+) -> int:
+    """
+    根据输入token数和语言对计算输出token上限
+
+    Args:
+        input_tokens: 输入token数（不含任务前缀）
+        target_lang: 目标语言代码
+        source_lang: 源语言代码，未知时使用默认比例
+
+    Returns:
+        int: max_new_tokens
+    """
+    ratio = OUTPUT_LENGTH_RATIOS.get(
+        (source_lang, target_lang), DEFAULT_OUTPUT_LENGTH_RATIO
+    )
+    return min(MODEL_MAX_TOKENS, math.ceil(input_tokens * ratio) + MIN_OUTPUT_TOKENS)
+
+
+def _repeated_tail_length(tokens: List[int]) -> int:
+    """
+    末尾连续重复的n-gram所占的多余token数（保留一次出现），没有退化重复时返回0
+
+    单个token需要重复2*REPETITION_MIN_REPEATS次才视为退化，避免误伤正常的叠字
+    """
+    length = len(tokens)
+    for n in range(1, REPETITION_MAX_NGRAM + 1):
+        repeats = REPETITION_MIN_REPEATS * (2 if n == 1 else 1)
+        if length < n * repeats:
+            break
+        gram = tokens[length - n :]
+        count = 1
+        position = length - 2 * n
+        while position >= 0 and tokens[position : position + n] == gram:
+            count += 1
+            position -= n
+        if count >= repeats:
+            return (count - 1) * n
+    return 0
+
+
+def trim_repetition(tokens: List[int], end_token_ids: Iterable[int] = ()) -> List[int]:
+    """
+    去掉末尾退化重复的部分，只保留一次
+
+    Args:
+        tokens: 生成的token序列
+        end_token_ids: 结尾处不参与重复检测的token（如eos和填充）
+    """
+    end_token_ids = set(end_token_ids)
+    end = len(tokens)
+    while end > 0 and tokens[end - 1] in end_token_ids:
+        end -= 1
+    extra = _repeated_tail_length(tokens[:end])
+    return tokens[: end - extra] if extra else tokens
+
+
+class RepetitionStopper:
+    """
+    停止条件：某一行末尾出现退化重复时结束该行的解码
+
+    实现transformers StoppingCriteria的调用接口，
+    返回形状为(batch,)的布尔张量
+    """
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        stop = [_repeated_tail_length(row) > 0 for row in input_ids.tolist()]
+        return torch.tensor(stop, dtype=torch.bool, device=input_ids.device)
+
+
+def build_generation_kwargs(
+    preset: Optional[str],
+    input_tokens: int,
+    target_langs: Iterable[str],
+    source_lang: Optional[str] = None,
+    extra_criteria: Iterable = (),
+) -> dict:
+    """
+    组合解码预设、输出长度上限和重复停止条件，得到传给generate的参数
+
+    Args:
+        preset: 预设名称（fast/balanced/quality）
+        input_tokens: 本批次最长输入的token数
+        target_langs: 本批次包含的目标语言代码，输出上限取其中最大值
+        source_lang: 源语言代码
+        extra_criteria: 附加的停止条件（如取消）
+
+    Returns:
+        dict: generate关键字参数
+    """
+    from transformers import StoppingCriteriaList
+
+    kwargs = get_preset(preset)
+    kwargs["max_new_tokens"] = max(
+        max_output_tokens(input_tokens, target_lang, source_lang)
+        for target_lang in set(target_langs)
+    )
+    kwargs["stopping_criteria"] = StoppingCriteriaList(
+        [RepetitionStopper(), *extra_criteria]
+    )
+    return kwargs
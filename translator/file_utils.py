@@ -0,0 +1,46 @@
+"""
+文件工具模块
+缓存、清单等文件都先写到同目录的临时文件再整体替换：替换是原子操作，
+写入中断不会留下不完整的文件，并发读取的进程也只会看到旧文件或新文件
+"""
+
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_output(path: str):
+    """
+    原子地生成文件：在with块中向返回的临时路径写入，正常退出后替换目标文件，
+    出错时删除临时文件、保留原文件
+
+    Args:
+        path: 目标文件路径，所在目录不存在时自动创建
+
+    Yields:
+        str: 临时文件路径，与目标文件在同一目录（保证替换不跨文件系统）
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_atomic(path: str, data: bytes):
+    """
+    原子地写入文件内容
+
+    Args:
+        path: 目标文件路径
+        data: 文件内容
+    """
+    with atomic_output(path) as temp_path:
+        with open(temp_path, "wb") as f:
+            f.write(data)
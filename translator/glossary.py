@@ -0,0 +1,281 @@
+"""
+术语表模块
+将术语表编译为Aho-Corasick自动机，一次线性扫描即可找出文本中的所有术语，
+翻译时以占位符保护术语，译文中替换为目标语言规定的写法
+
+编译好的自动机以pickle缓存，术语表文件未变化时直接加载，无需重新构建
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from translator.config import ENABLE_GLOSSARY, GLOSSARY_CACHE_DIR, GLOSSARY_PATH
+from translator.file_utils import atomic_output
+
+logger = logging.getLogger(__name__)
+
+# 索引格式版本，结构变化时递增使旧缓存失效
+INDEX_VERSION = 3
+
+
+def _fold(text: str) -> str:
+    """匹配时忽略大小写；小写后长度变化的字符保持原样，使下标与原文一致"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+def _is_word_char(char: str) -> bool:
+    """拼音文字的字母和数字，这类术语需要在词边界处匹配；汉字等不需要"""
+    return char == "_" or (char.isalnum() and ord(char) < 0x2E80)
+
+
+class Glossary:
+    """
+    多语言术语表
+
+    每个条目是 语言代码 -> 术语 的映射。原文中出现任一语言的写法都会被识别，
+    目标语言有规定写法时替换为该写法
+    """
+
+    def __init__(self, languages: List[str], entries: List[Dict[str, str]]):
+        self.languages = languages
+        self.entries = entries
+        # 术语表内容的指纹，写入翻译记忆的键，术语变化后不再命中按旧术语生成的译文
+        self.fingerprint = hashlib.sha1(
+            json.dumps([languages, entries], ensure_ascii=False, sort_keys=True).encode(
+                "utf-8"
+            )
+        ).hexdigest()[:12]
+        self._build()
+
+    @classmethod
+    def from_file(cls, path: str) -> "Glossary":
+        """
+        读取制表符分隔的术语表：首行为语言代码，之后每行为同一术语在各语言中的写法，
+        空白单元格表示该语言没有规定写法，以#开头的行为注释
+
+        Args:
+            path: 术语表文件路径
+
+        Returns:
+            Glossary: 编译好的术语表
+        """
+        languages = None
+        entries = []
+        with open(path, "r", encoding="utf-8-sig") as f:
+            for line in f:
+                line = line.rstrip("\r\n")
+                if not line.strip() or line.lstrip().startswith("#"):
+                    continue
+                cells = [cell.strip() for cell in line.split("\t")]
+                if languages is None:
+                    languages = cells
+                    continue
+                entry = {lang: term for lang, term in zip(languages, cells) if term}
+                if entry:
+                    entries.append(entry)
+        return cls(languages or [], entries)
+
+    @classmethod
+    def load(cls, path: str, cache_dir: Optional[str] = GLOSSARY_CACHE_DIR):
+        """
+        加载术语表，优先使用与文件大小和修改时间一致的预编译索引缓存
+
+        Args:
+            path: 术语表文件路径
+            cache_dir: 索引缓存目录，为None时不使用缓存
+
+        Returns:
+            Glossary: 编译好的术语表
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        header = {
+            "version": INDEX_VERSION,
+            "path": path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+        cache_path = None
+        if cache_dir:
+            digest = hashlib.sha1(path.encode("utf-8")).hexdigest()[:12]
+            cache_path = os.path.join(cache_dir, f"glossary-{digest}.idx")
+            try:
+                with open(cache_path, "rb") as f:
+                    if pickle.load(f) == header:
+                        glossary = cls.__new__(cls)
+                        glossary.__dict__.update(pickle.load(f))
+                        return glossary
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+
+        glossary = cls.from_file(path)
+        if cache_path is not None:
+            glossary._save_index(cache_path, header)
+        return glossary
+
+    def _save_index(self, cache_path: str, header: dict):
+        """写入索引缓存"""
+        try:
+            with atomic_output(cache_path) as temp_path:
+                with open(temp_path, "wb") as f:
+                    pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as e:
+            logger.warning("术语表索引缓存写入失败: %s", e)
+
+    def _build(self):
+        """构建Aho-Corasick自动机：字典树、失败链接和输出链接"""
+        goto: List[Dict[str, int]] = [{}]
+        # 在该节点结束的术语对应的条目下标（多个条目可能有相同的写法）和术语长度
+        output: List[List[int]] = [[]]
+        lengths = [0]
+        for index, entry in enumerate(self.entries):
+            for term in entry.values():
+                node = 0
+                for char in _fold(term):
+                    next_node = goto[node].get(char)
+                    if next_node is None:
+                        next_node = len(goto)
+                        goto[node][char] = next_node
+                        goto.append({})
+                        output.append([])
+                        lengths.append(0)
+                    node = next_node
+                if index not in output[node]:
+                    output[node].append(index)
+                    lengths[node] = len(term)
+
+        # 按层广度优先计算失败链接，记录遍历顺序供生成输出链接使用
+        fail = [0] * len(goto)
+        order = []
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for char, child in goto[node].items():
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                target = goto[state].get(char, 0)
+                fail[child] = target if target != child else 0
+                queue.append(child)
+
+        self._goto = goto
+        self._fail = fail
+        self._output = output
+        self._lengths = lengths
+        self._order = order
+        # 目标语言 -> (各节点选用的条目下标, 输出链接)，首次查找该语言时生成
+        self._tables: Dict[Optional[str], Tuple[List[int], List[int]]] = {}
+
+    def _lang_tables(self, target_lang: Optional[str]) -> Tuple[List[int], List[int]]:
+        """
+        生成某个目标语言的查找表
+
+        Returns:
+            Tuple[List[int], List[int]]: 各节点选用的条目下标（-1表示没有可用条目），
+                以及沿失败链接最近的有可用条目的节点
+        """
+        tables = self._tables.get(target_lang)
+        if tables is not None:
+            return tables
+        selected = [-1] * len(self._output)
+        for node, indices in enumerate(self._output):
+            for index in indices:
+                # 写法相同的多个条目中，取第一个在目标语言中有规定写法的条目
+                if target_lang is None or target_lang in self.entries[index]:
+                    selected[node] = index
+                    break
+        fail = self._fail
+        dict_link = [0] * len(selected)
+        for node in self._order:
+            link = fail[node]
+            dict_link[node] = link if selected[link] != -1 else dict_link[link]
+        tables = (selected, dict_link)
+        self._tables[target_lang] = tables
+        return tables
+
+    def find(
+        self, text: str, target_lang: Optional[str] = None
+    ) -> List[Tuple[int, int, int]]:
+        """
+        在文本中查找术语，重叠时取最靠前、最长的匹配
+
+        Args:
+            text: 待查找的文本
+            target_lang: 只返回该目标语言有规定写法的术语，为None时返回全部
+
+        Returns:
+            List[Tuple[int, int, int]]: 按位置排列、互不重叠的(起始, 结束, 条目下标)
+        """
+        goto = self._goto
+        fail = self._fail
+        selected, dict_link = self._lang_tables(target_lang)
+        lengths = self._lengths
+        matches = []
+        node = 0
+        for position, char in enumerate(_fold(text)):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            hit = node if selected[node] != -1 else dict_link[node]
+            while hit:
+                end = position + 1
+                matches.append((end - lengths[hit], end, selected[hit]))
+                hit = dict_link[hit]
+        if not matches:
+            return []
+
+        matches.sort(key=lambda match: (match[0], -match[1]))
+        result = []
+        last_end = 0
+        for start, end, index in matches:
+            if start < last_end:
+                continue
+            # 拼音文字的术语不能匹配在单词中间
+            if (
+                start > 0
+                and _is_word_char(text[start])
+                and _is_word_char(text[start - 1])
+            ) or (
+                end < len(text)
+                and _is_word_char(text[end - 1])
+                and _is_word_char(text[end])
+            ):
+                continue
+            result.append((start, end, index))
+            last_end = end
+        return result
+
+    def target_term(self, index: int, target_lang: str) -> Optional[str]:
+        """条目在目标语言中规定的写法"""
+        return self.entries[index].get(target_lang)
+
+
+_shared_glossary = None
+_shared_glossary_loaded = False
+_shared_glossary_lock = threading.Lock()
+
+
+def get_glossary() -> Optional[Glossary]:
+    """获取进程内共享的术语表，未启用、文件不存在或加载失败时返回None"""
+    global _shared_glossary, _shared_glossary_loaded
+    if not _shared_glossary_loaded:
+        with _shared_glossary_lock:
+            if not _shared_glossary_loaded:
+                if ENABLE_GLOSSARY and os.path.exists(GLOSSARY_PATH):
+                    try:
+                        _shared_glossary = Glossary.load(GLOSSARY_PATH)
+                    except Exception as e:
+                        logger.warning("术语表加载失败: %s", e)
+                _shared_glossary_loaded = True
+    return _shared_glossary
@@ -0,0 +1,95 @@
+"""
+语言识别模块
+按文字类别统计字符（汉字、西里尔字母、拉丁字母）识别中文、俄文和英文，
+只需对文本做几次正则扫描，短文本耗时在微秒级，可以对每个片段单独识别：
+用于自动填写源语言，以及跳过已经是目标语言的片段
+"""
+
+import re
+from typing import Dict, Optional
+
+from translator.config import (
+    LANGUAGE_DETECTION_CJK_WEIGHT,
+    LANGUAGE_DETECTION_MIN_CHARS,
+    LANGUAGE_DETECTION_SAMPLE_CHARS,
+    LANGUAGE_DETECTION_THRESHOLD,
+)
+
+# 语言代码 -> 该语言使用的文字
+SCRIPT_PATTERNS = {
+    # CJK统一汉字、扩展A区和兼容汉字
+    "zh": re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]"),
+    "ru": re.compile(r"[\u0400-\u04ff]"),
+    # 基本拉丁字母和带变音符号的拉丁字母
+    "en": re.compile(r"[A-Za-z\u00c0-\u024f]"),
+}
+
+# 非拉丁文字（汉字、西里尔字母）
+NON_LATIN_PATTERN = re.compile(
+    r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u0400-\u04ff]"
+)
+
+# 中文、俄文中夹杂的纯拉丁字母词：网址、邮箱，以及含数字或非首字母大写的缩写、
+# 型号、产品名（GPU、RTX4090、GPT-4、iPhone），不代表文本的语言
+LATIN_TERM_PATTERN = re.compile(
+    r"(?:https?://|www\.)[^\s\u3400-\u9fff，。；：！？、）】」》]+"
+    r"|[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+"
+    r"|(?<![A-Za-z0-9])(?=[A-Za-z0-9_.+-]*(?:\d|[A-Za-z][A-Z]))"
+    r"[A-Za-z0-9][A-Za-z0-9_.+-]*"
+)
+
+
+def script_counts(text: str) -> Dict[str, float]:
+    """
+    统计文本中各语言文字的加权字符数
+
+    一个汉字承载的信息量约相当于几个字母，按LANGUAGE_DETECTION_CJK_WEIGHT加权，
+    避免中文句子中夹杂的少量英文单词压过汉字
+
+    Args:
+        text: 待统计的文本
+
+    Returns:
+        Dict[str, float]: 语言代码 -> 加权字符数
+    """
+    counts = {
+        lang: float(len(pattern.findall(text)))
+        for lang, pattern in SCRIPT_PATTERNS.items()
+    }
+    counts["zh"] *= LANGUAGE_DETECTION_CJK_WEIGHT
+    return counts
+
+
+def detect_language(
+    text: str,
+    ignore_pattern: Optional[re.Pattern] = None,
+    sample_chars: int = LANGUAGE_DETECTION_SAMPLE_CHARS,
+) -> Optional[str]:
+    """
+    识别文本的语言
+
+    Args:
+        text: 待识别的文本
+        ignore_pattern: 统计前去掉的内容（如网址、代码等受保护的片段），为None时不处理
+        sample_chars: 只统计开头的这么多字符，长文档无需全文扫描
+
+    文本中有汉字或西里尔字母时，夹杂的缩写、型号和网址等纯拉丁字母词不参与统计，
+    再按加权字符数取占比最高的文字
+
+    Returns:
+        Optional[str]: 语言代码；文字太少或几种文字比例接近（混合语言）时返回None
+    """
+    if sample_chars and len(text) > sample_chars:
+        text = text[:sample_chars]
+    if ignore_pattern is not None:
+        text = ignore_pattern.sub(" ", text)
+    if NON_LATIN_PATTERN.search(text):
+        text = LATIN_TERM_PATTERN.sub(" ", text)
+    counts = script_counts(text)
+    total = sum(counts.values())
+    if total < LANGUAGE_DETECTION_MIN_CHARS:
+        return None
+    lang = max(counts, key=counts.get)
+    if counts[lang] < total * LANGUAGE_DETECTION_THRESHOLD:
+        return None
+    return lang
@@ -0,0 +1,102 @@
+"""
+实时翻译模块
+边输入边翻译时按句切分文档，与上一次的结果逐句比较，
+只有新增或修改过的句子才送入模型，未变化的句子直接复用之前的译文
+"""
+
+import threading
+from typing import Callable, Dict, List, Optional
+
+from translator.instrumentation import add_count, span
+
+
+class IncrementalTranslator:
+    """
+    按句增量翻译的会话状态，在多次翻译之间保留逐句译文
+
+    缓存只保留最近一次文档中出现的句子，编辑过程中内存不会持续增长；
+    源语言或解码预设变化时缓存失效
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache: Dict[tuple, str] = {}
+        self._settings = None
+
+    def reset(self):
+        with self._lock:
+            self._cache = {}
+            self._settings = None
+
+    def translate(
+        self,
+        pipeline,
+        text: str,
+        target_langs: List[str],
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        partial_callback: Optional[Callable[[Dict[str, str]], None]] = None,
+        source_lang: Optional[str] = None,
+    ) -> Dict[str, str]:
+        """
+        翻译文档，只把上一次之后新增或修改的句子交给模型
+
+        Args:
+            pipeline: 翻译流水线
+            text: 当前完整的原文
+            target_langs: 目标语言代码列表
+            progress_callback: 进度回调，参数为(已解码token数, 估算的总token数)
+            partial_callback: 流式回调，参数为 目标语言 -> 当前（部分）整篇译文
+            source_lang: 源语言代码，未知时为None
+
+        Returns:
+            Dict[str, str]: 目标语言 -> 重组后的译文
+        """
+        settings = (source_lang, pipeline.decoding_preset)
+        with self._lock:
+            if settings != self._settings:
+                self._cache = {}
+                self._settings = settings
+            cache = dict(self._cache)
+
+        formatter = pipeline.new_formatter()
+        with span("preprocess"):
+            paragraphs = pipeline.split_document(text, pack=False, formatter=formatter)
+        segments = [chunk for chunks in paragraphs for chunk in chunks]
+        pairs = [
+            (segment, target_lang)
+            for segment in dict.fromkeys(segments)
+            for target_lang in target_langs
+        ]
+        pending = [pair for pair in pairs if pair not in cache]
+        add_count("reused_segments", len(pairs) - len(pending))
+
+        def assemble_all(current):
+            return {
+                target_lang: pipeline.assemble(
+                    paragraphs,
+                    [current.get((s, target_lang), "") for s in segments],
+                    target_lang,
+                    formatter,
+                )
+                for target_lang in target_langs
+            }
+
+        def on_partial(partials):
+            partial_callback(assemble_all({**cache, **partials}))
+
+        if pending:
+            # 取消时抛出异常，未完成的句子不会进入缓存
+            cache.update(
+                pipeline.translate_pairs(
+                    pending,
+                    progress_callback,
+                    on_partial if partial_callback is not None else None,
+                    source_lang,
+                )
+            )
+
+        with self._lock:
+            if settings == self._settings:
+                # 只保留当前文档中的句子
+                self._cache = {pair: cache[pair] for pair in pairs}
+        return assemble_all(cache)
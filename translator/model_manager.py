@@ -0,0 +1,290 @@
+"""
+模型管理模块
+在进程内常驻加载翻译模型和分词器，供所有翻译任务共享
+"""
+
+import logging
+import os
+import threading
+
+from translator.config import (
+    ENABLE_PERFORMANCE_PROFILE,
+    INFERENCE_BACKEND,
+    MODEL_NAME,
+    MODEL_PATH,
+    MODEL_PRECISION,
+    TRANSLATION_BATCH_SIZE,
+    USE_LOCAL_MODEL,
+    USE_MMAP_WEIGHTS,
+    USE_QUANTIZED_CACHE,
+)
+from translator.model_store import (
+    has_model_store,
+    load_mapped_model,
+    save_model_store,
+    save_weights,
+)
+from translator.onnx_backend import load_onnx_model
+from translator.provisioning import ensure_model, write_manifest
+from translator.quantization import load_quantized_model
+from translator.tokenization import load_tokenizer
+from translator.tuning import apply_profile
+
+logger = logging.getLogger(__name__)
+
+# 模型加载状态
+STATE_NOT_LOADED = "not_loaded"
+STATE_LOADING = "loading"
+STATE_LOADED = "loaded"
+STATE_FAILED = "failed"
+
+# 推理后端
+BACKEND_TORCH = "torch"
+BACKEND_ONNX = "onnx"
+BACKENDS = (BACKEND_TORCH, BACKEND_ONNX)
+
+
+class ModelManager:
+    """进程级模型管理器，模型和分词器只加载一次并在所有翻译之间共享"""
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._model = None
+        self._tokenizer = None
+        self._state = STATE_NOT_LOADED
+        self._error = None
+        self._warmed_up = False
+        self._backend = (
+            INFERENCE_BACKEND if INFERENCE_BACKEND in BACKENDS else BACKEND_TORCH
+        )
+        self._active_backend = None
+        # 是否在加载时应用本机的性能配置文件（线程数、CPU绑定）
+        self.use_performance_profile = ENABLE_PERFORMANCE_PROFILE
+        self._profile = None
+
+    @classmethod
+    def instance(cls):
+        """获取进程内唯一的模型管理器实例"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    @property
+    def state(self) -> str:
+        """当前加载状态"""
+        return self._state
+
+    @property
+    def error(self):
+        """最近一次加载失败的异常，未失败时为None"""
+        return self._error
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._state == STATE_LOADED
+
+    @property
+    def backend(self) -> str:
+        """请求使用的推理后端"""
+        return self._backend
+
+    @property
+    def active_backend(self):
+        """实际加载的推理后端（ONNX导出缺失时回退为torch），未加载时为None"""
+        return self._active_backend
+
+    @property
+    def performance_profile(self):
+        """加载时应用的性能配置，没有可用配置时为None"""
+        return self._profile
+
+    @property
+    def batch_size(self) -> int:
+        """推荐的批大小：优先使用性能配置中测得的值"""
+        if self._profile is not None:
+            return self._profile["batch_size"]
+        return TRANSLATION_BATCH_SIZE
+
+    def set_backend(self, backend: str):
+        """切换推理后端，已加载的模型会被释放，下次使用时按新后端加载"""
+        if backend not in BACKENDS:
+            raise ValueError(f"不支持的推理后端: {backend}")
+        if backend != self._backend:
+            self._backend = backend
+            self.unload()
+
+    @property
+    def is_warmed_up(self) -> bool:
+        """是否已完成预热推理"""
+        return self._warmed_up
+
+    @property
+    def model(self):
+        return self.load()[0]
+
+    @property
+    def tokenizer(self):
+        return self.load()[1]
+
+    def load(self):
+        """
+        加载模型和分词器，已加载时直接返回缓存的实例
+
+        Returns:
+            tuple: (model, tokenizer)
+        """
+        if self._state == STATE_LOADED:
+            return self._model, self._tokenizer
+
+        with self._lock:
+            # 其他线程可能已在等待锁期间完成加载
+            if self._state == STATE_LOADED:
+                return self._model, self._tokenizer
+
+            self._state = STATE_LOADING
+            self._error = None
+            try:
+                model, tokenizer = self._load_from_disk_or_hub()
+            except Exception as e:
+                self._state = STATE_FAILED
+                self._error = e
+                raise
+
+            self._model = model
+            self._tokenizer = tokenizer
+            self._state = STATE_LOADED
+            return model, tokenizer
+
+    def load_tokenizer(self):
+        """
+        只加载分词器，模型由推理进程各自加载时使用
+
+        本地模型不可用时先在本进程完整加载一次（下载并保存到本地），随即释放，
+        避免多个推理进程同时下载和写入模型目录
+
+        Returns:
+            分词器
+        """
+        if self._state == STATE_LOADED:
+            return self._tokenizer
+        if USE_LOCAL_MODEL and ensure_model(MODEL_PATH):
+            return load_tokenizer(MODEL_PATH)
+        tokenizer = self.load()[1]
+        self.unload()
+        return tokenizer
+
+    def warmup(self, target_lang: str = "zh"):
+        """
+        加载模型并执行一次极短的推理，提前完成内核初始化和内存分配，
+        使首次真正的翻译不再承担冷启动开销
+        """
+        model, tokenizer = self.load()
+        if self._warmed_up:
+            return
+
+        import torch
+
+        inputs = tokenizer(f"translate to {target_lang}: Hello", return_tensors="pt")
+        with torch.no_grad():
+            model.generate(**inputs, max_new_tokens=4)
+        self._warmed_up = True
+
+    def unload(self):
+        """释放已加载的模型，下次使用时重新加载"""
+        with self._lock:
+            self._model = None
+            self._tokenizer = None
+            self._state = STATE_NOT_LOADED
+            self._error = None
+            self._warmed_up = False
+            self._active_backend = None
+            self._profile = None
+
+    def _load_from_disk_or_hub(self):
+        # transformers/torch 导入耗时较长，推迟到真正加载模型时才导入
+        from transformers import T5ForConditionalGeneration
+
+        # 按完整性清单确认本地模型可用，缺失或不完整时从配置的安装源续传安装
+        use_local = USE_LOCAL_MODEL and ensure_model(MODEL_PATH)
+
+        if self._backend == BACKEND_ONNX:
+            # 线程数需要在创建ONNX Runtime会话之前确定
+            self._apply_performance_profile(BACKEND_ONNX)
+            threads = self._profile["intra_op_threads"] if self._profile else 0
+            model = load_onnx_model(num_threads=threads)
+            if model is not None:
+                self._active_backend = BACKEND_ONNX
+                tokenizer = load_tokenizer(MODEL_PATH if use_local else MODEL_NAME)
+                return model, tokenizer
+            logger.warning("未找到ONNX导出文件，回退到PyTorch后端")
+
+        self._active_backend = BACKEND_TORCH
+        self._apply_performance_profile(BACKEND_TORCH)
+        # 加载模型和分词器 - 优先使用本地模型
+        if use_local:
+            if MODEL_PRECISION == "int8":
+                # 命中量化缓存时无需读入fp32权重
+                model = load_quantized_model(MODEL_PATH, USE_QUANTIZED_CACHE)
+            else:
+                model = self._load_fp32_local()
+            tokenizer = load_tokenizer(MODEL_PATH)
+        else:
+            # 如果本地模型不存在，则从在线加载
+            model = T5ForConditionalGeneration.from_pretrained(MODEL_NAME)
+            tokenizer = load_tokenizer(MODEL_NAME)
+
+            # 保存模型到本地以便下次使用，全部写完后生成清单，中断时不会被当作完整
+            try:
+                os.makedirs(MODEL_PATH, exist_ok=True)
+                save_model_store(model, MODEL_PATH)
+                tokenizer.save_pretrained(MODEL_PATH)
+                write_manifest(MODEL_PATH)
+            except Exception as e:
+                logger.warning("保存模型到本地时出错: %s", e)
+
+            if MODEL_PRECISION == "int8":
+                model = load_quantized_model(
+                    MODEL_NAME, USE_QUANTIZED_CACHE, fp32_model=model
+                )
+
+        # 推理模式，关闭dropout
+        model.eval()
+        return model, tokenizer
+
+    def _load_fp32_local(self):
+        """
+        加载本地fp32模型：优先内存映射safetensors权重，多个进程共享同一份物理页；
+        本地只有其他格式的权重时常规加载一次，并另存为safetensors供之后映射，
+        随后重新生成清单和完成标记，使新增的权重文件也受校验
+        """
+        from transformers import T5ForConditionalGeneration
+
+        if USE_MMAP_WEIGHTS:
+            model = load_mapped_model(MODEL_PATH)
+            if model is not None:
+                return model
+
+        model = T5ForConditionalGeneration.from_pretrained(MODEL_PATH)
+        if USE_MMAP_WEIGHTS and not has_model_store(MODEL_PATH):
+            try:
+                save_weights(model, MODEL_PATH)
+                write_manifest(MODEL_PATH)
+            except Exception as e:
+                logger.warning("保存safetensors权重时出错: %s", e)
+        return model
+
+    def _apply_performance_profile(self, backend: str):
+        """应用本机针对该后端调优得到的线程数和CPU绑定"""
+        self._profile = None
+        if self.use_performance_profile:
+            self._profile = apply_profile(backend)
+
+
+def get_model_manager() -> ModelManager:
+    """获取共享的模型管理器"""
+    return ModelManager.instance()
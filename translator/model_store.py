@@ -0,0 +1,159 @@
+"""
+模型存储模块
+以safetensors格式保存模型权重，加载时直接内存映射文件，而不是把权重复制到进程私有内存：
+启动耗时主要是按需缺页，同一台机器上的多个进程（界面、命令行工作进程等）
+共享同一份页缓存中的物理页
+"""
+
+import json
+import logging
+import os
+import struct
+from typing import Dict
+
+from translator.config import MODEL_PATH, MODEL_WEIGHTS_FILE
+from translator.file_utils import atomic_output
+
+logger = logging.getLogger(__name__)
+
+# safetensors的数据类型名 -> torch数据类型名
+SAFETENSORS_DTYPES = {
+    "F64": "float64",
+    "F32": "float32",
+    "F16": "float16",
+    "BF16": "bfloat16",
+    "I64": "int64",
+    "I32": "int32",
+    "I16": "int16",
+    "I8": "int8",
+    "U8": "uint8",
+    "BOOL": "bool",
+}
+
+
+def weights_path(model_path: str = MODEL_PATH) -> str:
+    return os.path.join(model_path, MODEL_WEIGHTS_FILE)
+
+
+def has_model_store(model_path: str = MODEL_PATH) -> bool:
+    return os.path.exists(weights_path(model_path))
+
+
+def is_complete_store(path: str) -> bool:
+    """safetensors文件是否完整：文件头可解析，且数据区长度与文件大小一致"""
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            (header_size,) = struct.unpack("<Q", f.read(8))
+            if 8 + header_size > size:
+                return False
+            header = json.loads(f.read(header_size))
+    except (OSError, ValueError, struct.error):
+        return False
+    header.pop("__metadata__", None)
+    data_size = max((info["data_offsets"][1] for info in header.values()), default=0)
+    return 8 + header_size + data_size == size
+
+
+def save_model_store(model, model_path: str = MODEL_PATH):
+    """以safetensors格式保存模型（与save_pretrained的目录结构一致）"""
+    os.makedirs(model_path, exist_ok=True)
+    model.save_pretrained(model_path, safe_serialization=True)
+
+
+def save_weights(model, model_path: str = MODEL_PATH):
+    """
+    只把模型权重另存为safetensors文件，不改动目录中的配置、分词器等其他文件
+
+    共享的权重（词嵌入、输出层）只保存一份，加载时由tie_weights重新绑定
+
+    Args:
+        model: 已加载的模型
+        model_path: 模型目录
+    """
+    from safetensors.torch import save_model
+
+    with atomic_output(weights_path(model_path)) as temp_path:
+        save_model(model, temp_path, metadata={"format": "pt"})
+
+
+def map_safetensors(path: str) -> Dict[str, "torch.Tensor"]:
+    """
+    内存映射safetensors文件，返回直接引用映射页的张量
+
+    映射为写时复制的私有映射：只读使用时与其他进程共享页缓存，
+    即使张量被原地修改也不会写回文件
+
+    Args:
+        path: safetensors文件路径
+
+    Returns:
+        Dict[str, torch.Tensor]: 参数名 -> 张量
+    """
+    import torch
+
+    with open(path, "rb") as f:
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_size))
+    header.pop("__metadata__", None)
+    data_start = 8 + header_size
+
+    storage = torch.UntypedStorage.from_file(path, False, os.path.getsize(path))
+    tensors = {}
+    for name, info in header.items():
+        dtype = getattr(torch, SAFETENSORS_DTYPES[info["dtype"]])
+        shape = list(info["shape"])
+        begin, end = (offset + data_start for offset in info["data_offsets"])
+        itemsize = torch.empty((), dtype=dtype).element_size()
+        if begin % itemsize == 0:
+            tensor = torch.empty(0, dtype=dtype)
+            tensor.set_(storage, begin // itemsize, shape)
+        else:
+            # 未按元素大小对齐的张量无法直接引用映射，读出一份副本
+            with open(path, "rb") as f:
+                f.seek(begin)
+                data = bytearray(f.read(end - begin))
+            tensor = torch.frombuffer(data, dtype=dtype).reshape(shape)
+        tensors[name] = tensor
+    return tensors
+
+
+def load_mapped_model(model_path: str = MODEL_PATH):
+    """
+    在不分配权重内存的情况下构建模型结构，再把参数指向内存映射的权重
+
+    Args:
+        model_path: 包含config.json和safetensors权重的模型目录
+
+    Returns:
+        加载好的模型；权重文件不存在、与模型结构不匹配或当前torch版本不支持时返回None
+    """
+    path = weights_path(model_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        import torch
+        from transformers import (
+            GenerationConfig,
+            T5Config,
+            T5ForConditionalGeneration,
+        )
+
+        config = T5Config.from_pretrained(model_path)
+        # 在meta设备上构建，只有结构没有数据，避免先初始化一份随机权重
+        with torch.device("meta"):
+            model = T5ForConditionalGeneration(config)
+        if os.path.exists(os.path.join(model_path, "generation_config.json")):
+            model.generation_config = GenerationConfig.from_pretrained(model_path)
+        state_dict = map_safetensors(path)
+        model.load_state_dict(state_dict, strict=False, assign=True)
+        # 保存时省略的共享权重（词嵌入、输出层）重新指向同一个张量
+        model.tie_weights()
+        if any(t.is_meta for t in list(model.parameters()) + list(model.buffers())):
+            logger.warning("内存映射的权重与模型结构不匹配，改为常规加载")
+            return None
+        model.eval()
+        return model
+    except Exception as e:
+        logger.warning("内存映射加载模型失败，改为常规加载: %s", e)
+        return None
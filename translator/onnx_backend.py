@@ -0,0 +1,590 @@
+"""
+ONNX Runtime推理后端模块
+将T5的编码器和带KV缓存的解码器导出为ONNX，缓存在MODEL_PATH下，
+推理时用ONNX Runtime在CPU上执行贪心或束搜索解码
+
+导出的文件:
+    encoder.onnx             input_ids, attention_mask -> encoder_hidden_states
+    decoder_init.onnx        首步解码，输出logits以及自注意力和交叉注意力的KV缓存
+    decoder_with_past.onnx   后续步解码，输入上一步的KV缓存，只输出新的自注意力KV缓存
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import List, Optional
+
+from translator.config import MODEL_MAX_TOKENS, MODEL_PATH, ONNX_MODEL_DIR, ONNX_OPSET
+
+ENCODER_FILE = "encoder.onnx"
+DECODER_INIT_FILE = "decoder_init.onnx"
+DECODER_WITH_PAST_FILE = "decoder_with_past.onnx"
+CONFIG_FILE = "onnx_config.json"
+ONNX_FILES = (ENCODER_FILE, DECODER_INIT_FILE, DECODER_WITH_PAST_FILE, CONFIG_FILE)
+# generate支持的解码参数（max_new_tokens等显式参数之外），其余参数被忽略并记录警告
+SUPPORTED_GENERATION_KWARGS = {"no_repeat_ngram_size", "length_penalty"}
+
+logger = logging.getLogger(__name__)
+
+
+def is_exported(onnx_dir: str = ONNX_MODEL_DIR) -> bool:
+    """导出的ONNX文件是否齐全"""
+    return all(os.path.exists(os.path.join(onnx_dir, name)) for name in ONNX_FILES)
+
+
+def _past_names(prefix: str, num_layers: int, with_cross: bool) -> List[str]:
+    names = []
+    for layer in range(num_layers):
+        names += [f"{prefix}.{layer}.self.key", f"{prefix}.{layer}.self.value"]
+        if with_cross:
+            names += [f"{prefix}.{layer}.cross.key", f"{prefix}.{layer}.cross.value"]
+    return names
+
+
+def _banned_ngram_tokens(sequence, ngram_size: int) -> List[int]:
+    """
+    与transformers的no_repeat_ngram_size一致：若序列末尾的n-1个token之前出现过，
+    其后接过的token都不能再作为下一个token
+
+    Args:
+        sequence: 当前的解码序列（含解码器起始token）
+        ngram_size: 不允许重复的n-gram长度
+
+    Returns:
+        List[int]: 下一步禁止的token
+    """
+    length = len(sequence)
+    if length + 1 < ngram_size:
+        return []
+    prefix = list(sequence[length - ngram_size + 1 :])
+    return [
+        int(sequence[i + ngram_size - 1])
+        for i in range(length - ngram_size + 1)
+        if list(sequence[i : i + ngram_size - 1]) == prefix
+    ]
+
+
+def _block_repeated_ngrams(scores, sequences, ngram_size: int, skip=None):
+    """把会重复已有n-gram的token的分数置为负无穷（原地修改）"""
+    import numpy as np
+
+    if not ngram_size:
+        return
+    for row, sequence in enumerate(sequences):
+        if skip is not None and skip[row]:
+            continue
+        banned = _banned_ngram_tokens(sequence, ngram_size)
+        if banned:
+            scores[row, banned] = -np.inf
+
+
+def _to_legacy_cache(past_key_values):
+    if hasattr(past_key_values, "to_legacy_cache"):
+        return past_key_values.to_legacy_cache()
+    return past_key_values
+
+
+def _from_legacy_cache(past_key_values):
+    try:
+        from transformers.cache_utils import EncoderDecoderCache
+    except ImportError:
+        return past_key_values
+    return EncoderDecoderCache.from_legacy_cache(past_key_values)
+
+
+def export_onnx(model_source: str = MODEL_PATH, onnx_dir: str = ONNX_MODEL_DIR):
+    """
+    将T5模型导出为编码器、首步解码器和带缓存解码器三个ONNX文件
+
+    Args:
+        model_source: 模型目录或名称
+        onnx_dir: 导出目录
+    """
+    import torch
+    from transformers import T5ForConditionalGeneration
+
+    model = T5ForConditionalGeneration.from_pretrained(model_source).eval()
+    config = model.config
+    num_layers = config.num_decoder_layers
+    # 共享词嵌入时，lm_head之前需要按d_model缩放
+    scale = (
+        config.d_model**-0.5 if getattr(config, "tie_word_embeddings", True) else 1.0
+    )
+
+    class EncoderWrapper(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.encoder = model.get_encoder()
+
+        def forward(self, input_ids, attention_mask):
+            return self.encoder(
+                input_ids=input_ids, attention_mask=attention_mask, return_dict=False
+            )[0]
+
+    class DecoderWrapper(torch.nn.Module):
+        def __init__(self, with_past: bool):
+            super().__init__()
+            self.decoder = model.get_decoder()
+            self.lm_head = model.lm_head
+            self.with_past = with_past
+
+        def forward(
+            self, input_ids, encoder_attention_mask, encoder_hidden_states, *past
+        ):
+            past_key_values = None
+            if self.with_past:
+                legacy = tuple(
+                    tuple(past[4 * i : 4 * i + 4]) for i in range(num_layers)
+                )
+                past_key_values = _from_legacy_cache(legacy)
+            outputs = self.decoder(
+                input_ids=input_ids,
+                encoder_hidden_states=encoder_hidden_states,
+                encoder_attention_mask=encoder_attention_mask,
+                past_key_values=past_key_values,
+                use_cache=True,
+                return_dict=True,
+            )
+            logits = self.lm_head(outputs.last_hidden_state * scale)
+            present = _to_legacy_cache(outputs.past_key_values)
+            flat = []
+            for layer in present:
+                # 交叉注意力缓存在首步之后不再变化，带缓存解码器只输出自注意力缓存
+                flat += list(layer[:2]) if self.with_past else list(layer[:4])
+            return (logits, *flat)
+
+    os.makedirs(onnx_dir, exist_ok=True)
+    batch, seq = 2, 8
+    input_ids = torch.ones((batch, seq), dtype=torch.long)
+    attention_mask = torch.ones((batch, seq), dtype=torch.long)
+    decoder_ids = torch.full((batch, 1), config.decoder_start_token_id)
+    dynamic_batch_seq = {0: "batch", 1: "encoder_sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            EncoderWrapper(),
+            (input_ids, attention_mask),
+            os.path.join(onnx_dir, ENCODER_FILE),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["encoder_hidden_states"],
+            dynamic_axes={
+                "input_ids": dynamic_batch_seq,
+                "attention_mask": dynamic_batch_seq,
+                "encoder_hidden_states": dynamic_batch_seq,
+            },
+            opset_version=ONNX_OPSET,
+            do_constant_folding=True,
+        )
+
+        encoder_hidden_states = EncoderWrapper()(input_ids, attention_mask)
+        present_names = _past_names("present", num_layers, with_cross=True)
+        kv_axes = {0: "batch", 2: "past_sequence"}
+        cross_axes = {0: "batch", 2: "encoder_sequence"}
+        init_outputs = DecoderWrapper(False)(
+            decoder_ids, attention_mask, encoder_hidden_states
+        )
+        common_axes = {
+            "input_ids": {0: "batch", 1: "decoder_sequence"},
+            "encoder_attention_mask": dynamic_batch_seq,
+            "encoder_hidden_states": dynamic_batch_seq,
+            "logits": {0: "batch", 1: "decoder_sequence"},
+        }
+        torch.onnx.export(
+            DecoderWrapper(False),
+            (decoder_ids, attention_mask, encoder_hidden_states),
+            os.path.join(onnx_dir, DECODER_INIT_FILE),
+            input_names=[
+                "input_ids",
+                "encoder_attention_mask",
+                "encoder_hidden_states",
+            ],
+            output_names=["logits"] + present_names,
+            dynamic_axes={
+                **common_axes,
+                **{
+                    name: cross_axes if ".cross." in name else kv_axes
+                    for name in present_names
+                },
+            },
+            opset_version=ONNX_OPSET,
+            do_constant_folding=True,
+        )
+
+        past_names = _past_names("past", num_layers, with_cross=True)
+        with_past_outputs = _past_names("present", num_layers, with_cross=False)
+        torch.onnx.export(
+            DecoderWrapper(True),
+            (decoder_ids, attention_mask, encoder_hidden_states, *init_outputs[1:]),
+            os.path.join(onnx_dir, DECODER_WITH_PAST_FILE),
+            input_names=[
+                "input_ids",
+                "encoder_attention_mask",
+                "encoder_hidden_states",
+            ]
+            + past_names,
+            output_names=["logits"] + with_past_outputs,
+            dynamic_axes={
+                **common_axes,
+                **{
+                    name: cross_axes if ".cross." in name else kv_axes
+                    for name in past_names + with_past_outputs
+                },
+            },
+            opset_version=ONNX_OPSET,
+            do_constant_folding=True,
+        )
+
+    generation_config = getattr(model, "generation_config", None)
+    metadata = {
+        "num_layers": num_layers,
+        "decoder_start_token_id": config.decoder_start_token_id,
+        "eos_token_id": config.eos_token_id,
+        "pad_token_id": config.pad_token_id,
+        "max_length": getattr(generation_config, "max_length", None)
+        or MODEL_MAX_TOKENS,
+    }
+    # 配置文件最后写入，作为导出完成的标志
+    with open(os.path.join(onnx_dir, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+
+
+class OnnxT5Model:
+    """
+    基于ONNX Runtime的T5推理模型
+
+    提供与T5ForConditionalGeneration.generate兼容的常用参数，
+    可直接替换PyTorch模型用于翻译流水线
+    """
+
+    def __init__(self, onnx_dir: str = ONNX_MODEL_DIR, num_threads: int = 0):
+        import onnxruntime as ort
+
+        with open(os.path.join(onnx_dir, CONFIG_FILE), encoding="utf-8") as f:
+            self.metadata = json.load(f)
+        self.num_layers = self.metadata["num_layers"]
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        providers = ["CPUExecutionProvider"]
+
+        def session(name):
+            return ort.InferenceSession(
+                os.path.join(onnx_dir, name), options, providers=providers
+            )
+
+        self.encoder = session(ENCODER_FILE)
+        self.decoder_init = session(DECODER_INIT_FILE)
+        self.decoder_with_past = session(DECODER_WITH_PAST_FILE)
+        # 导出时未被使用的输入可能被裁剪，只传入会话实际声明的输入
+        self._init_inputs = {i.name for i in self.decoder_init.get_inputs()}
+        self._past_inputs = {i.name for i in self.decoder_with_past.get_inputs()}
+
+    def eval(self):
+        return self
+
+    @staticmethod
+    def _as_numpy(value):
+        import numpy as np
+
+        if hasattr(value, "detach"):
+            value = value.detach().cpu().numpy()
+        return np.asarray(value, dtype=np.int64)
+
+    def _encode(self, input_ids, attention_mask):
+        return self.encoder.run(
+            None, {"input_ids": input_ids, "attention_mask": attention_mask}
+        )[0]
+
+    def _decode_step(self, tokens, attention_mask, hidden, self_past, cross_past):
+        """
+        执行一步解码
+
+        Returns:
+            tuple: (最后位置的logits, 新的自注意力缓存, 交叉注意力缓存)
+        """
+        if self_past is None:
+            feed = {
+                "input_ids": tokens,
+                "encoder_attention_mask": attention_mask,
+                "encoder_hidden_states": hidden,
+            }
+            outputs = self.decoder_init.run(
+                None, {k: v for k, v in feed.items() if k in self._init_inputs}
+            )
+            present = outputs[1:]
+            self_past = [
+                t for i in range(self.num_layers) for t in present[4 * i : 4 * i + 2]
+            ]
+            cross_past = [
+                t
+                for i in range(self.num_layers)
+                for t in present[4 * i + 2 : 4 * i + 4]
+            ]
+            return outputs[0][:, -1, :], self_past, cross_past
+
+        feed = {
+            "input_ids": tokens,
+            "encoder_attention_mask": attention_mask,
+            "encoder_hidden_states": hidden,
+        }
+        names = _past_names("past", self.num_layers, with_cross=True)
+        values = []
+        for i in range(self.num_layers):
+            values += self_past[2 * i : 2 * i + 2] + cross_past[2 * i : 2 * i + 2]
+        feed.update(zip(names, values))
+        outputs = self.decoder_with_past.run(
+            None, {k: v for k, v in feed.items() if k in self._past_inputs}
+        )
+        return outputs[0][:, -1, :], list(outputs[1:]), cross_past
+
+    def generate(
+        self,
+        input_ids=None,
+        attention_mask=None,
+        max_new_tokens: Optional[int] = None,
+        max_length: Optional[int] = None,
+        num_beams: int = 1,
+        streamer=None,
+        stopping_criteria=None,
+        **kwargs,
+    ):
+        """
+        生成译文token，返回形状为(batch, seq)、以解码器起始token开头的LongTensor
+
+        支持no_repeat_ngram_size和length_penalty，与PyTorch后端的解码结果一致；
+        其他解码参数不受支持，记录警告后忽略
+        """
+        import numpy as np
+        import torch
+
+        unsupported = sorted(set(kwargs) - SUPPORTED_GENERATION_KWARGS)
+        if unsupported:
+            logger.warning("ONNX后端不支持以下解码参数，已忽略: %s", unsupported)
+        ngram_size = kwargs.get("no_repeat_ngram_size") or 0
+
+        input_ids = self._as_numpy(input_ids)
+        if attention_mask is None:
+            attention_mask = np.ones_like(input_ids)
+        attention_mask = self._as_numpy(attention_mask)
+        if max_new_tokens is None:
+            max_new_tokens = (max_length or self.metadata["max_length"]) - 1
+
+        if num_beams > 1:
+            sequences = self._beam_search(
+                input_ids,
+                attention_mask,
+                max_new_tokens,
+                num_beams,
+                stopping_criteria,
+                kwargs,
+            )
+        else:
+            sequences = self._greedy(
+                input_ids,
+                attention_mask,
+                max_new_tokens,
+                streamer,
+                stopping_criteria,
+                ngram_size,
+            )
+        return torch.from_numpy(sequences)
+
+    def _greedy(
+        self,
+        input_ids,
+        attention_mask,
+        max_new_tokens,
+        streamer,
+        criteria,
+        ngram_size: int = 0,
+    ):
+        import numpy as np
+        import torch
+
+        batch = input_ids.shape[0]
+        start = self.metadata["decoder_start_token_id"]
+        eos = self.metadata["eos_token_id"]
+        pad = self.metadata["pad_token_id"]
+
+        hidden = self._encode(input_ids, attention_mask)
+        sequences = np.full((batch, 1), start, dtype=np.int64)
+        if streamer is not None:
+            streamer.put(torch.from_numpy(sequences))
+        finished = np.zeros(batch, dtype=bool)
+        self_past = cross_past = None
+        tokens = sequences
+
+        for _ in range(max_new_tokens):
+            logits, self_past, cross_past = self._decode_step(
+                tokens, attention_mask, hidden, self_past, cross_past
+            )
+            _block_repeated_ngrams(logits, sequences, ngram_size, skip=finished)
+            next_tokens = np.where(finished, pad, logits.argmax(axis=-1)).astype(
+                np.int64
+            )
+            sequences = np.concatenate([sequences, next_tokens[:, None]], axis=1)
+            if streamer is not None:
+                streamer.put(torch.from_numpy(next_tokens))
+            finished |= next_tokens == eos
+            if criteria is not None:
+                stop = criteria(torch.from_numpy(sequences), None)
+                finished |= np.asarray(stop, dtype=bool).reshape(-1)
+            if finished.all():
+                break
+            tokens = next_tokens[:, None]
+
+        if streamer is not None:
+            streamer.end()
+        return sequences
+
+    def _beam_search(
+        self, input_ids, attention_mask, max_new_tokens, num_beams, criteria, kwargs
+    ):
+        import numpy as np
+        import torch
+
+        batch = input_ids.shape[0]
+        start = self.metadata["decoder_start_token_id"]
+        eos = self.metadata["eos_token_id"]
+        pad = self.metadata["pad_token_id"]
+        length_penalty = kwargs.get("length_penalty", 1.0)
+        ngram_size = kwargs.get("no_repeat_ngram_size") or 0
+
+        hidden = self._encode(input_ids, attention_mask)
+        # 每条输入复制num_beams份
+        hidden = np.repeat(hidden, num_beams, axis=0)
+        attention_mask = np.repeat(attention_mask, num_beams, axis=0)
+
+        beams = np.full((batch * num_beams, 1), start, dtype=np.int64)
+        beam_scores = np.zeros((batch, num_beams), dtype=np.float32)
+        # 初始时各束相同，只保留第一束避免重复候选
+        beam_scores[:, 1:] = -1e9
+        beam_scores = beam_scores.reshape(-1)
+        hypotheses = [[] for _ in range(batch)]
+        done = np.zeros(batch, dtype=bool)
+        self_past = cross_past = None
+        tokens = beams
+
+        for step in range(max_new_tokens):
+            logits, self_past, cross_past = self._decode_step(
+                tokens, attention_mask, hidden, self_past, cross_past
+            )
+            logits = logits - logits.max(axis=-1, keepdims=True)
+            log_probs = logits - np.log(np.exp(logits).sum(axis=-1, keepdims=True))
+            _block_repeated_ngrams(log_probs, beams, ngram_size)
+            vocab = log_probs.shape[-1]
+            scores = (beam_scores[:, None] + log_probs).reshape(batch, -1)
+            top = np.argsort(-scores, axis=-1)[:, : 2 * num_beams]
+
+            # 未填满的位置指向同一输入的第一束（分数为-1e9，不参与比较），
+            # 不能指向其他输入的束，否则会复制其KV缓存
+            next_beam_index = np.repeat(
+                np.arange(batch, dtype=np.int64) * num_beams, num_beams
+            )
+            next_tokens = np.full(batch * num_beams, pad, dtype=np.int64)
+            next_scores = np.full(batch * num_beams, -1e9, dtype=np.float32)
+            length = beams.shape[1]
+            for b in range(batch):
+                slot = 0
+                for rank, flat in enumerate(top[b]):
+                    if done[b] or slot == num_beams:
+                        break
+                    source = b * num_beams + flat // vocab
+                    token = int(flat % vocab)
+                    score = float(scores[b, flat])
+                    if token == eos:
+                        # 只有排在前num_beams的结束候选才作为完整假设，最多保留num_beams个
+                        if rank < num_beams:
+                            hypotheses[b].append(
+                                (score / length**length_penalty, beams[source])
+                            )
+                            hypotheses[b].sort(key=lambda h: h[0], reverse=True)
+                            del hypotheses[b][num_beams:]
+                        continue
+                    target = b * num_beams + slot
+                    next_beam_index[target] = source
+                    next_tokens[target] = token
+                    next_scores[target] = score
+                    slot += 1
+                if done[b] or slot == 0:
+                    # 已完成的输入保持原样（填充）
+                    for s in range(num_beams):
+                        next_beam_index[b * num_beams + s] = b * num_beams + s
+                    done[b] = True
+                    continue
+                if len(hypotheses[b]) >= num_beams:
+                    # 最好的未完成束也无法超过已保留的最差假设时结束
+                    best_running = next_scores[b * num_beams] / length**length_penalty
+                    done[b] = best_running <= hypotheses[b][-1][0]
+
+            if done.all():
+                break
+            beams = np.concatenate(
+                [beams[next_beam_index], next_tokens[:, None]], axis=1
+            )
+            beam_scores = next_scores
+            self_past = [p[next_beam_index] for p in self_past]
+            tokens = next_tokens[:, None]
+            # 与transformers一致：所有束都满足停止条件时才提前结束
+            if criteria is not None and bool(
+                np.asarray(criteria(torch.from_numpy(beams), None), dtype=bool).all()
+            ):
+                break
+
+        results = []
+        length = beams.shape[1]
+        for b in range(batch):
+            candidates = [
+                (score, np.append(tokens, eos)) for score, tokens in hypotheses[b]
+            ]
+            if not done[b]:
+                # 达到长度上限仍未结束的束也参与比较
+                for s in range(num_beams):
+                    index = b * num_beams + s
+                    if beam_scores[index] > -1e8:
+                        candidates.append(
+                            (beam_scores[index] / length**length_penalty, beams[index])
+                        )
+            results.append(max(candidates, key=lambda h: h[0])[1])
+
+        width = max(len(r) for r in results)
+        sequences = np.full((batch, width), pad, dtype=np.int64)
+        for b, sequence in enumerate(results):
+            sequences[b, : len(sequence)] = sequence
+        return sequences
+
+
+def load_onnx_model(onnx_dir: str = ONNX_MODEL_DIR, num_threads: int = 0):
+    """加载ONNX模型，导出文件不存在或onnxruntime不可用时返回None"""
+    if not is_exported(onnx_dir):
+        return None
+    try:
+        return OnnxT5Model(onnx_dir, num_threads)
+    except ImportError:
+        logger.warning("未安装onnxruntime，无法使用ONNX后端")
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m translator.onnx_backend", description="导出ONNX推理模型"
+    )
+    parser.add_argument(
+        "--model", default=MODEL_PATH, help=f"模型目录或名称（默认 {MODEL_PATH}）"
+    )
+    parser.add_argument(
+        "--output", default=ONNX_MODEL_DIR, help=f"导出目录（默认 {ONNX_MODEL_DIR}）"
+    )
+    args = parser.parse_args(argv)
+
+    export_onnx(args.model, args.output)
+    print(f"ONNX模型已导出到 {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,734 @@
+"""
+文档翻译流水线模块
+将长文本按段落和句子切分为适合模型窗口的片段，批量翻译后按原顺序重组
+"""
+
+import math
+import re
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from translator.cancellation import CancellationToken, CancelStopper
+from translator.config import (
+    DEFAULT_DECODING_PRESET,
+    MAX_CHUNK_TOKENS,
+    MODEL_MAX_TOKENS,
+    OUTPUT_TOKEN_RATIO,
+    SKIP_TARGET_LANGUAGE_SEGMENTS,
+    TRANSLATION_BATCH_SIZE,
+)
+from translator.decoding import build_generation_kwargs, trim_repetition
+from translator.glossary import get_glossary
+from translator.instrumentation import add_count, span
+from translator.language_detection import detect_language
+from translator.placeholders import PlaceholderProtector, ProtectedText
+from translator.streaming import BatchTokenStreamer
+from translator.text_formatter import TextFormatter
+
+# 段落分隔：一个或多个空行
+PARAGRAPH_SPLIT_PATTERN = re.compile(r"\n[ \t]*\n\s*")
+# 句子边界：西文句末标点后跟空白，或中文句末标点之后
+SENTENCE_SPLIT_PATTERN = re.compile(r"(?<=[.!?…])\s+|(?<=[。！？；])\s*")
+# 句点后不结束句子的常见缩写（小写，不含末尾句点）；e.g.、т.е.这类带点的缩写
+# 和单个字母的姓名首字母另行识别
+SENTENCE_ABBREVIATIONS = frozenset(
+    "mr mrs ms dr prof sr jr st vs cf fig no vol pp approx напр см им ул гг".split()
+)
+# 带点的缩写：e.g、i.e、U.S、т.е
+DOTTED_ABBREVIATION_PATTERN = re.compile(r"(?:[^\W\d_]\.)+[^\W\d_]")
+# 识别缩写时向前查看的字符数，缩写都很短，避免长段落中反复扫描
+ABBREVIATION_LOOKBACK = 16
+# 子句边界：用于切分超长句子
+CLAUSE_SPLIT_PATTERN = re.compile(r"(?<=[,;:，；：、])\s*")
+# 以空格分词的目标语言
+SPACE_SEPARATED_LANGS = {"en", "ru"}
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """按空行切分段落，忽略空段落"""
+    return [p.strip() for p in PARAGRAPH_SPLIT_PATTERN.split(text) if p.strip()]
+
+
+def split_sentences(paragraph: str) -> List[str]:
+    """按句末标点切分句子，缩写（Dr.、e.g.、т.е.）和姓名首字母后的句点不算句子边界"""
+    sentences = []
+    start = 0
+    for match in SENTENCE_SPLIT_PATTERN.finditer(paragraph):
+        if _is_abbreviation(paragraph, match.start(), match.end()):
+            continue
+        sentences.append(paragraph[start : match.start()])
+        start = match.end()
+    sentences.append(paragraph[start:])
+    return [s.strip() for s in sentences if s.strip()]
+
+
+def _is_abbreviation(paragraph: str, end: int, following: int) -> bool:
+    """判断paragraph[end - 1]处的句点是否属于缩写，following为之后下一个非空白字符的位置"""
+    if paragraph[end - 1] != ".":
+        return False
+    # 句点后接小写字母时句子还没有结束
+    if paragraph[following : following + 1].islower():
+        return True
+    window = paragraph[max(0, end - ABBREVIATION_LOOKBACK) : end - 1].split()
+    if not window:
+        return False
+    word = window[-1].lstrip("([\"'«“").lower()
+    return (
+        word in SENTENCE_ABBREVIATIONS
+        or (len(word) == 1 and word.isalpha())
+        or DOTTED_ABBREVIATION_PATTERN.fullmatch(word) is not None
+    )
+
+
+def pack_chunks(
+    sentences: List[str],
+    count_tokens: Callable[[List[str]], List[int]],
+    max_tokens: int,
+) -> List[str]:
+    """
+    将句子贪心地合并为不超过max_tokens的片段，超长句子按子句、单词或字符继续切分
+
+    Args:
+        sentences: 按顺序排列的句子
+        count_tokens: 批量计算文本token数的函数
+        max_tokens: 每个片段的最大token数
+
+    Returns:
+        List[str]: 按顺序排列的片段
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for sentence, tokens in zip(sentences, count_tokens(sentences)):
+        if tokens > max_tokens:
+            # 超长句子单独切分，先结束当前片段
+            if current:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_split_long_sentence(sentence, count_tokens, max_tokens))
+            continue
+
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += tokens
+
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def _split_long_sentence(
+    sentence: str, count_tokens: Callable[[List[str]], List[int]], max_tokens: int
+) -> List[str]:
+    """将超过窗口的句子依次按子句、空格、字符切分"""
+    clauses = [c for c in CLAUSE_SPLIT_PATTERN.split(sentence) if c.strip()]
+    if len(clauses) > 1:
+        return pack_chunks(clauses, count_tokens, max_tokens)
+
+    words = sentence.split()
+    if len(words) > 1:
+        return pack_chunks(words, count_tokens, max_tokens)
+
+    # 没有空格的长文本（如中文）按字符数折半切分，直到每段都放得下
+    tokens = count_tokens([sentence])[0]
+    if tokens <= max_tokens or len(sentence) < 2:
+        return [sentence]
+    middle = len(sentence) // 2
+    return _split_long_sentence(
+        sentence[:middle], count_tokens, max_tokens
+    ) + _split_long_sentence(sentence[middle:], count_tokens, max_tokens)
+
+
+def join_chunks(parts: List[str], target_lang: str) -> str:
+    """按目标语言的习惯拼接同一段落中的译文片段"""
+    separator = " " if target_lang in SPACE_SEPARATED_LANGS else ""
+    return separator.join(part for part in parts if part)
+
+
+class TranslationPipeline:
+    """文档翻译流水线：切分、批量生成、按顺序重组"""
+
+    def __init__(
+        self,
+        model,
+        tokenizer,
+        max_chunk_tokens: int = MAX_CHUNK_TOKENS,
+        batch_size: int = TRANSLATION_BATCH_SIZE,
+        memory=None,
+        decoding_preset: str = DEFAULT_DECODING_PRESET,
+        cancel_token: Optional[CancellationToken] = None,
+        preserve_layout: bool = False,
+        protector: Optional[PlaceholderProtector] = None,
+        pool=None,
+        skip_target_language: bool = SKIP_TARGET_LANGUAGE_SEGMENTS,
+    ):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_chunk_tokens = max_chunk_tokens
+        self.batch_size = max(1, batch_size)
+        # 可选的翻译记忆（TranslationMemory），命中的片段不再经过模型
+        self.memory = memory
+        # 解码预设名称，见config.DECODING_PRESETS
+        self.decoding_preset = decoding_preset
+        # 可选的取消标记，取消后在下一个解码步停止并抛出TranslationCancelled，
+        # 已取消批次的结果不会写入翻译记忆
+        self.cancel_token = cancel_token
+        self._stopping_criteria = (
+            [CancelStopper(cancel_token)] if cancel_token is not None else []
+        )
+        # 保持排版：每个非空行作为独立段落翻译，译文按原来的缩进、空行和换行符重组
+        self.preserve_layout = preserve_layout
+        # 生成前把网址、DOI、数字、代码等替换为占位符，解码后还原
+        # 术语表中的术语同样受保护，译文中替换为目标语言规定的写法
+        self.protector = (
+            protector
+            if protector is not None
+            else PlaceholderProtector(glossary=get_glossary())
+        )
+        # 可选的推理进程池（WorkerPool），给出时各批次分发给多个进程并行生成
+        self.pool = pool
+        # 逐片段识别语言，已经是目标语言的片段原样保留，不经过模型
+        self.skip_target_language = skip_target_language
+
+    @property
+    def memory_variant(self) -> str:
+        """
+        翻译记忆中区分生成设置的标识：不同解码预设的译文互不复用，
+        启用术语表时包含其指纹，术语增删或修改后按旧术语生成的译文不再命中
+        """
+        glossary = self.protector.glossary
+        if glossary is None:
+            return self.decoding_preset
+        return f"{self.decoding_preset}+glossary:{glossary.fingerprint}"
+
+    def _check_cancelled(self):
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+
+    @staticmethod
+    def build_prefix(target_lang: str) -> str:
+        return f"translate to {target_lang}: "
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """批量计算文本的token数（不含特殊token）"""
+        if not texts:
+            return []
+        encoded = self.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def new_formatter(self) -> Optional[TextFormatter]:
+        """保持排版时为一篇文档创建格式保持器，否则返回None"""
+        return TextFormatter() if self.preserve_layout else None
+
+    def split_document(
+        self,
+        text: str,
+        pack: bool = True,
+        formatter: Optional[TextFormatter] = None,
+    ) -> List[List[str]]:
+        """
+        将文档切分为段落，每个段落再切分为适合模型窗口的片段
+
+        Args:
+            text: 原始文本
+            pack: 是否把相邻句子合并为尽量长的片段；为False时每句单独成为片段
+                （超长句子仍会切分），用于按句增量翻译
+            formatter: 格式保持器，给出时以每个非空行作为段落并记录排版，
+                重组时需传给assemble
+
+        Returns:
+            List[List[str]]: 每个段落对应的片段列表
+        """
+        blocks = (
+            formatter.extract_format(text)
+            if formatter is not None
+            else split_paragraphs(text)
+        )
+        paragraphs = [split_sentences(p) for p in blocks]
+        if pack:
+            return [
+                pack_chunks(sentences, self.count_tokens, self.max_chunk_tokens)
+                for sentences in paragraphs
+            ]
+
+        tokens = iter(
+            self.count_tokens([s for sentences in paragraphs for s in sentences])
+        )
+        result = []
+        for sentences in paragraphs:
+            chunks = []
+            for sentence in sentences:
+                if next(tokens) > self.max_chunk_tokens:
+                    chunks.extend(
+                        _split_long_sentence(
+                            sentence, self.count_tokens, self.max_chunk_tokens
+                        )
+                    )
+                else:
+                    chunks.append(sentence)
+            result.append(chunks)
+        return result
+
+    def preprocess(self, segment: str, target_lang: str) -> ProtectedText:
+        """将不应翻译的片段和术语替换为占位符，并对特殊组合词进行处理，避免被拆分"""
+        return self.protector.protect(segment, target_lang)
+
+    def detect_language(self, segment: str) -> Optional[str]:
+        """识别片段的语言，网址、代码等受保护的内容不参与统计"""
+        return detect_language(segment, self.protector.pattern)
+
+    def estimate_output_tokens(self, segments: List[str]) -> List[int]:
+        """根据输入token数估算每个片段的输出token数，用于计算进度"""
+        return [
+            max(1, math.ceil(tokens * OUTPUT_TOKEN_RATIO))
+            for tokens in self.count_tokens(segments)
+        ]
+
+    def translate_segments(
+        self,
+        segments: List[str],
+        target_lang: str,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        partial_callback: Optional[Callable[[Dict[str, str]], None]] = None,
+        source_lang: Optional[str] = None,
+    ) -> List[str]:
+        """
+        翻译片段列表，重复片段和翻译记忆命中的片段不再经过模型
+
+        Args:
+            segments: 待翻译片段
+            target_lang: 目标语言代码
+            progress_callback: 进度回调，参数为(已解码token数, 估算的总token数)
+            partial_callback: 流式回调，参数为 原文片段 -> 当前（部分）译文
+            source_lang: 源语言代码，用于确定输出长度上限，未知时为None
+
+        Returns:
+            List[str]: 与输入一一对应的译文
+        """
+
+        def on_partial(current):
+            partial_callback({segment: text for (segment, _), text in current.items()})
+
+        translations = self.translate_pairs(
+            [(segment, target_lang) for segment in dict.fromkeys(segments)],
+            progress_callback,
+            on_partial if partial_callback is not None else None,
+            source_lang,
+        )
+        return [translations[(segment, target_lang)] for segment in segments]
+
+    def translate_pairs(
+        self,
+        pairs: List[Tuple[str, str]],
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        partial_callback: Optional[Callable[[Dict[Tuple[str, str], str]], None]] = None,
+        source_lang: Optional[str] = None,
+    ) -> Dict[Tuple[str, str], str]:
+        """
+        翻译(片段, 目标语言)组合，不同目标语言的提示在同一轮批量生成中处理，
+        已经是目标语言的片段和翻译记忆命中的组合不再经过模型
+
+        Args:
+            pairs: 不重复的(原文片段, 目标语言代码)列表
+            progress_callback: 进度回调，参数为(已解码token数, 估算的总token数)
+            partial_callback: 流式回调，参数为 (原文片段, 目标语言) -> 当前（部分）译文
+            source_lang: 源语言代码，用于确定输出长度上限，未知时为None
+
+        Returns:
+            Dict[Tuple[str, str], str]: (原文片段, 目标语言) -> 译文
+        """
+        translations = {}
+        if self.skip_target_language:
+            with span("detect"):
+                languages = {
+                    segment: self.detect_language(segment)
+                    for segment in dict.fromkeys(segment for segment, _ in pairs)
+                }
+            translations.update(
+                (pair, pair[0]) for pair in pairs if languages[pair[0]] == pair[1]
+            )
+        skipped = len(translations)
+        if self.memory is not None:
+            by_lang = {}
+            for pair in pairs:
+                if pair not in translations:
+                    by_lang.setdefault(pair[1], []).append(pair[0])
+            with span("memory"):
+                for target_lang, lang_segments in by_lang.items():
+                    hits = self.memory.get_many(
+                        target_lang, lang_segments, self.memory_variant
+                    )
+                    translations.update(
+                        ((segment, target_lang), text) for segment, text in hits.items()
+                    )
+        add_count("segments", len(pairs))
+        add_count("skipped_segments", skipped)
+        add_count("memory_hits", len(translations) - skipped)
+
+        pending = [pair for pair in pairs if pair not in translations]
+        unique_segments = list(dict.fromkeys(segment for segment, _ in pairs))
+        segment_estimates = dict(
+            zip(unique_segments, self.estimate_output_tokens(unique_segments))
+        )
+        estimates = {pair: segment_estimates[pair[0]] for pair in pairs}
+        total_tokens = sum(estimates.values())
+        cached_tokens = total_tokens - sum(estimates[pair] for pair in pending)
+        if progress_callback is not None and cached_tokens:
+            progress_callback(cached_tokens, total_tokens)
+        if partial_callback is not None and translations:
+            partial_callback(dict(translations))
+
+        def on_progress(done_tokens, _pending_tokens):
+            progress_callback(cached_tokens + done_tokens, total_tokens)
+
+        # 流式模式下累积各批次的（部分）译文
+        streamed = dict(translations)
+
+        def on_partial(partials):
+            streamed.update((pending[i], text) for i, text in partials.items())
+            partial_callback(dict(streamed))
+
+        if self.pool is not None and pending:
+            add_count("batches", math.ceil(len(pending) / self.batch_size))
+            with span("generate"):
+                generated = self.pool.generate(
+                    [segment for segment, _ in pending],
+                    [target_lang for _, target_lang in pending],
+                    self.batch_size,
+                    self.decoding_preset,
+                    source_lang,
+                    [estimates[pair] for pair in pending],
+                    on_progress if progress_callback is not None else None,
+                    on_partial if partial_callback is not None else None,
+                    self.cancel_token,
+                )
+        else:
+            generated = self.generate_batched(
+                [segment for segment, _ in pending],
+                [target_lang for _, target_lang in pending],
+                on_progress if progress_callback is not None else None,
+                on_partial if partial_callback is not None else None,
+                [estimates[pair] for pair in pending],
+                source_lang,
+            )
+        new_translations = dict(zip(pending, generated))
+        if self.memory is not None and new_translations:
+            by_lang = {}
+            for (segment, target_lang), text in new_translations.items():
+                by_lang.setdefault(target_lang, {})[segment] = text
+            with span("memory"):
+                for target_lang, lang_translations in by_lang.items():
+                    self.memory.put_many(
+                        target_lang, lang_translations, self.memory_variant
+                    )
+        translations.update(new_translations)
+        return translations
+
+    def generate_batched(
+        self,
+        segments: List[str],
+        target_lang: Union[str, List[str]],
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        partial_callback: Optional[Callable[[Dict[int, str]], None]] = None,
+        estimates: Optional[List[int]] = None,
+        source_lang: Optional[str] = None,
+    ) -> List[str]:
+        """
+        批量生成译文，结果按输入顺序返回
+
+        非流式时按长度排序分批以减少填充；流式时按文档顺序分批，
+        使译文从上到下逐步出现。每批的输出长度上限按该批最长输入和语言对计算，
+        末尾出现退化重复的行会提前结束并去掉重复部分
+
+        Args:
+            segments: 待翻译片段
+            target_lang: 目标语言代码，或与segments一一对应的目标语言列表
+            progress_callback: 进度回调，参数为(已解码token数, 估算的总token数)
+            partial_callback: 流式回调，参数为 片段下标 -> 当前（部分）译文
+            estimates: 每个片段估算的输出token数，默认按输入长度估算
+            source_lang: 源语言代码
+
+        Returns:
+            List[str]: 与输入一一对应的译文
+        """
+        if not segments:
+            return []
+
+        import torch
+
+        total = len(segments)
+        if isinstance(target_lang, str):
+            target_langs = [target_lang] * total
+        else:
+            target_langs = list(target_lang)
+        prefixes = {lang: self.build_prefix(lang) for lang in set(target_langs)}
+        prefix_tokens = dict(zip(prefixes, self.count_tokens(list(prefixes.values()))))
+        special_ids = (self.tokenizer.eos_token_id, self.tokenizer.pad_token_id)
+        results = [""] * total
+        if estimates is None:
+            estimates = self.estimate_output_tokens(segments)
+        total_tokens = sum(estimates)
+
+        if partial_callback is None:
+            # 按token长度分桶，长度相近的片段放在同一批，减少填充token
+            order = sorted(range(total), key=lambda i: estimates[i])
+        else:
+            order = list(range(total))
+
+        finished_tokens = 0
+        for start in range(0, total, self.batch_size):
+            self._check_cancelled()
+            batch_indices = order[start : start + self.batch_size]
+            batch_langs = [target_langs[i] for i in batch_indices]
+            with span("preprocess"):
+                protected = [
+                    self.preprocess(segments[i], lang)
+                    for i, lang in zip(batch_indices, batch_langs)
+                ]
+                batch_texts = [
+                    prefixes[lang] + item.text
+                    for item, lang in zip(protected, batch_langs)
+                ]
+            batch_tokens = sum(estimates[i] for i in batch_indices)
+
+            def on_update(streamer):
+                # 已解码token数不超过估算值，避免进度倒退或提前到达100%
+                in_flight = min(streamer.generated_tokens, batch_tokens)
+                if progress_callback is not None:
+                    progress_callback(finished_tokens + in_flight, total_tokens)
+                if partial_callback is not None:
+                    partial_callback(
+                        {
+                            index: item.restore(text, partial=True)
+                            for index, item, text in zip(
+                                batch_indices, protected, streamer.texts()
+                            )
+                        }
+                    )
+
+            with span("tokenize"):
+                inputs = self.tokenizer(
+                    batch_texts,
+                    return_tensors="pt",
+                    padding=True,
+                    max_length=MODEL_MAX_TOKENS,
+                    truncation=True,
+                )
+            add_count("input_tokens", int(inputs["attention_mask"].sum()))
+            add_count("batches")
+            input_tokens = inputs["input_ids"].shape[-1] - min(
+                prefix_tokens[lang] for lang in batch_langs
+            )
+            generation_kwargs = build_generation_kwargs(
+                self.decoding_preset,
+                input_tokens,
+                batch_langs,
+                source_lang,
+                self._stopping_criteria,
+            )
+            # transformers的流式输出只支持贪心解码，束搜索时只在每批结束后更新
+            if generation_kwargs.get("num_beams", 1) == 1:
+                generation_kwargs["streamer"] = BatchTokenStreamer(
+                    self.tokenizer, on_update
+                )
+            with span("generate"), torch.no_grad():
+                generated_tokens = self.model.generate(**inputs, **generation_kwargs)
+            self._check_cancelled()
+            with span("decode"):
+                rows = [
+                    trim_repetition(row, special_ids)
+                    for row in generated_tokens.tolist()
+                ]
+                decoded = self.tokenizer.batch_decode(rows, skip_special_tokens=True)
+            add_count(
+                "output_tokens",
+                sum(1 for row in rows for token in row if token not in special_ids),
+            )
+
+            for index, lang, item, translated in zip(
+                batch_indices, batch_langs, protected, decoded
+            ):
+                # 移除输入前缀（如果存在）
+                if translated.startswith(prefixes[lang]):
+                    translated = translated[len(prefixes[lang]) :]
+                results[index] = item.restore(translated.strip())
+
+            finished_tokens += batch_tokens
+            if progress_callback is not None:
+                progress_callback(finished_tokens, total_tokens)
+            if partial_callback is not None:
+                partial_callback({i: results[i] for i in batch_indices})
+
+        return results
+
+    def translate(
+        self,
+        text: str,
+        target_lang: str,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        partial_callback: Optional[Callable[[str], None]] = None,
+        source_lang: Optional[str] = None,
+    ) -> str:
+        """
+        翻译整篇文档，段落之间以空行分隔
+
+        Args:
+            text: 原始文本
+            target_lang: 目标语言代码
+            progress_callback: 进度回调，参数为(已解码token数, 估算的总token数)
+            partial_callback: 流式回调，参数为当前已得到的（部分）整篇译文
+            source_lang: 源语言代码，未知时为None
+
+        Returns:
+            str: 重组后的译文
+        """
+        formatter = self.new_formatter()
+        with span("preprocess"):
+            paragraphs = self.split_document(text, formatter=formatter)
+        segments = [chunk for chunks in paragraphs for chunk in chunks]
+
+        def on_partial(current):
+            partial_callback(
+                self.assemble(
+                    paragraphs,
+                    [current.get(s, "") for s in segments],
+                    target_lang,
+                    formatter,
+                )
+            )
+
+        translations = self.translate_segments(
+            segments,
+            target_lang,
+            progress_callback,
+            on_partial if partial_callback is not None else None,
+            source_lang,
+        )
+        return self.assemble(paragraphs, translations, target_lang, formatter)
+
+    def translate_many(
+        self,
+        texts: List[str],
+        target_lang: str,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        source_lang: Optional[str] = None,
+    ) -> List[str]:
+        """
+        翻译多篇文档，所有文档的片段合并后一起分批生成
+
+        Args:
+            texts: 原始文本列表
+            target_lang: 目标语言代码
+            progress_callback: 进度回调，参数为(已解码token数, 估算的总token数)
+            source_lang: 源语言代码，未知时为None
+
+        Returns:
+            List[str]: 与输入一一对应的译文
+        """
+        formatters = [self.new_formatter() for _ in texts]
+        with span("preprocess"):
+            documents = [
+                self.split_document(text, formatter=formatter)
+                for text, formatter in zip(texts, formatters)
+            ]
+        segments = [
+            chunk
+            for paragraphs in documents
+            for chunks in paragraphs
+            for chunk in chunks
+        ]
+        translations = self.translate_segments(
+            segments, target_lang, progress_callback, source_lang=source_lang
+        )
+
+        results = []
+        position = 0
+        for paragraphs, formatter in zip(documents, formatters):
+            count = sum(len(chunks) for chunks in paragraphs)
+            results.append(
+                self.assemble(
+                    paragraphs,
+                    translations[position : position + count],
+                    target_lang,
+                    formatter,
+                )
+            )
+            position += count
+        return results
+
+    def translate_multi(
+        self,
+        text: str,
+        target_langs: List[str],
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        partial_callback: Optional[Callable[[Dict[str, str]], None]] = None,
+        source_lang: Optional[str] = None,
+    ) -> Dict[str, str]:
+        """
+        将同一文档翻译为多种目标语言
+
+        每个片段为每种目标语言各生成一条提示，全部提示在同一轮批量生成中处理，
+        而不是每种语言各跑一遍；同一片段的各语言提示长度相近，会被分在同一批
+
+        Args:
+            text: 原始文本
+            target_langs: 目标语言代码列表
+            progress_callback: 进度回调，参数为(已解码token数, 估算的总token数)
+            partial_callback: 流式回调，参数为 目标语言 -> 当前（部分）整篇译文
+            source_lang: 源语言代码，未知时为None
+
+        Returns:
+            Dict[str, str]: 目标语言 -> 重组后的译文
+        """
+        formatter = self.new_formatter()
+        with span("preprocess"):
+            paragraphs = self.split_document(text, formatter=formatter)
+        segments = [chunk for chunks in paragraphs for chunk in chunks]
+        pairs = [
+            (segment, target_lang)
+            for segment in dict.fromkeys(segments)
+            for target_lang in target_langs
+        ]
+
+        def assemble_all(current):
+            return {
+                target_lang: self.assemble(
+                    paragraphs,
+                    [current.get((s, target_lang), "") for s in segments],
+                    target_lang,
+                    formatter,
+                )
+                for target_lang in target_langs
+            }
+
+        translations = self.translate_pairs(
+            pairs,
+            progress_callback,
+            (
+                (lambda current: partial_callback(assemble_all(current)))
+                if partial_callback is not None
+                else None
+            ),
+            source_lang,
+        )
+        return assemble_all(translations)
+
+    @staticmethod
+    def assemble(
+        paragraphs: List[List[str]],
+        translations: List[str],
+        target_lang: str,
+        formatter: Optional[TextFormatter] = None,
+    ) -> str:
+        """按段落重组译文，给出格式保持器时按原始排版逐行填回"""
+        translated_paragraphs = []
+        position = 0
+        for chunks in paragraphs:
+            parts = translations[position : position + len(chunks)]
+            position += len(chunks)
+            translated_paragraphs.append(join_chunks(parts, target_lang))
+        if formatter is not None:
+            return formatter.restore_format(translated_paragraphs)
+        return "\n\n".join(p for p in translated_paragraphs if p)
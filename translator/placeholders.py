@@ -0,0 +1,162 @@
+"""
+占位符保护模块
+生成前将网址、DOI、数字、代码等不应翻译的片段替换为简短的占位符，
+解码后再把占位符还原为原文，既避免这些片段被模型改写，也减少输入和输出token数；
+术语表中的术语同样以占位符保护，还原为目标语言规定的写法
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from translator.config import PLACEHOLDER_TEMPLATE, PROTECTED_PATTERNS
+from translator.glossary import Glossary
+
+# 连字符组合词，加引号避免被模型拆分
+HYPHEN_WORD_PATTERN = re.compile(r"(\w+)-(\w+)")
+
+
+class ProtectedText:
+    """替换了占位符的文本，以及还原译文所需的占位符 -> 原文对应关系"""
+
+    def __init__(
+        self, text: str, spans: List[Optional[str]], restore_pattern: re.Pattern
+    ):
+        self.text = text
+        # 第i个占位符对应的原文，原文中本来就有的标记为None
+        self.spans = spans
+        self._restore_pattern = restore_pattern
+
+    def restore(self, translated: str, partial: bool = False) -> str:
+        """
+        将译文中的占位符还原为原文
+
+        Args:
+            translated: 模型输出的译文
+            partial: 是否为流式显示中尚未完成的译文，此时不补回缺失的片段
+
+        Returns:
+            str: 还原后的译文
+        """
+        if not self.spans:
+            return translated
+        seen = set()
+
+        def replace(match):
+            index = int(match.group(1))
+            if index >= len(self.spans) or self.spans[index] is None:
+                return match.group()
+            seen.add(index)
+            return self.spans[index]
+
+        restored = self._restore_pattern.sub(replace, translated)
+        if partial:
+            return restored
+        # 模型漏掉的占位符，把原文补在译文末尾，保证受保护的内容不丢失
+        missing = [
+            span
+            for i, span in enumerate(self.spans)
+            if span is not None and i not in seen
+        ]
+        return " ".join([restored] + missing) if missing else restored
+
+
+class PlaceholderProtector:
+    """
+    将匹配保护模式的片段替换为占位符
+
+    所有模式合并为一个正则表达式，每个片段只扫描一次；
+    原文中已经出现的占位符序号会被跳过，避免与原有内容（如引用标记[1]）混淆
+    """
+
+    def __init__(
+        self,
+        patterns: Optional[Dict[str, str]] = None,
+        template: str = PLACEHOLDER_TEMPLATE,
+        quote_hyphenated: bool = True,
+        glossary: Optional[Glossary] = None,
+    ):
+        """
+        Args:
+            patterns: 模式名 -> 正则表达式，按顺序匹配，默认使用config.PROTECTED_PATTERNS
+            template: 占位符格式，{}处为序号
+            quote_hyphenated: 是否给连字符组合词加引号，避免被模型拆分
+            glossary: 术语表，原文中的术语同样替换为占位符，
+                还原时换成目标语言规定的写法
+        """
+        if patterns is None:
+            patterns = PROTECTED_PATTERNS
+        self.pattern = (
+            re.compile("|".join(f"(?:{pattern})" for pattern in patterns.values()))
+            if patterns
+            else None
+        )
+        self.template = template
+        prefix, suffix = template.split("{}")
+        self.restore_pattern = re.compile(
+            re.escape(prefix.strip()) + r"\s*(\d+)\s*" + re.escape(suffix.strip())
+        )
+        self.quote_hyphenated = quote_hyphenated
+        self.glossary = glossary
+
+    def protect(self, text: str, target_lang: Optional[str] = None) -> ProtectedText:
+        """
+        将受保护的片段替换为占位符
+
+        Args:
+            text: 原文片段
+            target_lang: 目标语言代码，用于确定术语的译法，为None时不匹配术语
+
+        Returns:
+            ProtectedText: 替换后的文本及还原所需的信息
+        """
+        # (起始, 结束, 还原后的内容)，模式匹配优先于术语
+        replacements = []
+        if self.pattern is not None:
+            replacements = [
+                (match.start(), match.end(), match.group())
+                for match in self.pattern.finditer(text)
+            ]
+        if self.glossary is not None and target_lang is not None:
+            terms = [
+                (start, end, self.glossary.target_term(index, target_lang))
+                for start, end, index in self.glossary.find(text, target_lang)
+            ]
+            if terms:
+                replacements = _merge_spans(replacements, terms)
+        if not replacements:
+            masked = text
+            spans = []
+        else:
+            existing = {int(i) for i in self.restore_pattern.findall(text)}
+            spans = []
+            pieces = []
+            position = 0
+            for start, end, replacement in replacements:
+                while len(spans) in existing:
+                    # 原文中已有同样的标记，保持不变，改用下一个序号
+                    spans.append(None)
+                pieces.append(text[position:start])
+                pieces.append(self.template.format(len(spans)))
+                spans.append(replacement)
+                position = end
+            pieces.append(text[position:])
+            masked = "".join(pieces)
+
+        if self.quote_hyphenated:
+            masked = HYPHEN_WORD_PATTERN.sub(r'"\1-\2"', masked)
+        return ProtectedText(masked, spans, self.restore_pattern)
+
+
+def _merge_spans(primary: List[tuple], secondary: List[tuple]) -> List[tuple]:
+    """合并两组按位置排列的区间，secondary中与primary重叠的区间被丢弃"""
+    merged = []
+    i = 0
+    for span in secondary:
+        while i < len(primary) and primary[i][1] <= span[0]:
+            merged.append(primary[i])
+            i += 1
+        if i < len(primary) and primary[i][0] < span[1]:
+            continue
+        merged.append(span)
+    merged.extend(primary[i:])
+    return merged
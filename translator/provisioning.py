@@ -0,0 +1,487 @@
+"""
+模型安装与校验模块
+MODEL_PATH下的完整性清单（manifest.json）记录每个模型文件的大小和sha256：
+
+- 安装：从包含清单的模型压缩包或镜像目录复制文件，逐个校验哈希，
+  中断后再次安装时已校验的文件跳过，未完成的文件从断点续传
+- 启动检查：完整校验通过后写入标记文件，记录各文件的大小和修改时间，
+  之后启动只比较这些信息，无需每次计算上GB权重的哈希；标记不符时才重新完整校验
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import tarfile
+import zipfile
+from typing import Callable, Dict, List, Optional
+
+from translator.config import (
+    FAST_TOKENIZER_FILE,
+    MODEL_INSTALL_SOURCE,
+    MODEL_MANIFEST_FILE,
+    MODEL_NAME,
+    MODEL_PATH,
+    MODEL_STAMP_FILE,
+    ONNX_MODEL_DIR,
+    QUANTIZED_MODEL_FILE,
+)
+from translator.file_utils import write_atomic
+from translator.model_store import is_complete_store, weights_path
+
+logger = logging.getLogger(__name__)
+
+# 清单格式版本，结构变化时递增
+MANIFEST_VERSION = 1
+# 复制和计算哈希时每次读取的字节数
+CHUNK_SIZE = 4 * 1024 * 1024
+# 可由模型重新生成的缓存，可能在运行中被改写，不写入清单
+GENERATED_FILES = {
+    MODEL_MANIFEST_FILE,
+    MODEL_STAMP_FILE,
+    FAST_TOKENIZER_FILE,
+    QUANTIZED_MODEL_FILE,
+}
+GENERATED_DIRS = {os.path.relpath(ONNX_MODEL_DIR, MODEL_PATH)}
+# 没有清单的旧版本安装目录中必须存在的文件（每组至少一个）
+REQUIRED_FILES = [
+    ("config.json",),
+    ("model.safetensors", "pytorch_model.bin"),
+    ("spiece.model", "tokenizer.json"),
+]
+
+
+class ProvisioningError(RuntimeError):
+    """安装源不可用、清单无效或文件校验失败"""
+
+
+def manifest_path(model_path: str = MODEL_PATH) -> str:
+    return os.path.join(model_path, MODEL_MANIFEST_FILE)
+
+
+def stamp_path(model_path: str = MODEL_PATH) -> str:
+    return os.path.join(model_path, MODEL_STAMP_FILE)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _check_relative_path(name: str):
+    """
+    检查清单中的相对路径：只允许以/分隔的普通路径，
+    拒绝绝对路径、..、反斜杠和盘符（Windows上C:foo、..\\x等也会越出安装目录）
+    """
+    parts = name.split("/")
+    if (
+        not name
+        or "\\" in name
+        or ":" in name
+        or name.startswith("/")
+        or any(part in ("", ".", "..") for part in parts)
+    ):
+        raise ValueError(f"非法的文件路径: {name}")
+
+
+def resolve_path(root: str, name: str) -> str:
+    """
+    将清单中的相对路径拼接到root下，结果不在root之内时抛出ProvisioningError
+
+    Args:
+        root: 模型目录或安装源目录
+        name: 清单中的相对路径
+
+    Returns:
+        str: 文件的绝对路径
+    """
+    root = os.path.abspath(root)
+    path = os.path.abspath(os.path.join(root, os.path.normpath(name)))
+    if path == root or os.path.commonpath([root, path]) != root:
+        raise ProvisioningError(f"非法的文件路径: {name}")
+    return path
+
+
+def parse_manifest(data: bytes) -> dict:
+    """解析并检查清单内容，格式不符时抛出ProvisioningError"""
+    try:
+        manifest = json.loads(data)
+        files = manifest["files"]
+        for name, info in files.items():
+            _check_relative_path(name)
+            int(info["size"])
+            str(info["sha256"])
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise ProvisioningError(f"模型清单无效: {str(e)}")
+    if manifest.get("version", MANIFEST_VERSION) > MANIFEST_VERSION:
+        raise ProvisioningError("模型清单版本过新，请升级程序")
+    return manifest
+
+
+def read_manifest(model_path: str = MODEL_PATH) -> Optional[dict]:
+    """读取模型目录中的清单，不存在时返回None"""
+    try:
+        with open(manifest_path(model_path), "rb") as f:
+            return parse_manifest(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def build_manifest(model_path: str = MODEL_PATH) -> dict:
+    """
+    计算模型目录中各文件的大小和sha256，可重新生成的缓存不计入
+
+    Args:
+        model_path: 模型目录
+
+    Returns:
+        dict: 清单内容
+    """
+    files = {}
+    for root, dirs, names in os.walk(model_path):
+        relative_root = os.path.relpath(root, model_path)
+        dirs[:] = sorted(
+            d
+            for d in dirs
+            if os.path.normpath(os.path.join(relative_root, d)) not in GENERATED_DIRS
+        )
+        for name in sorted(names):
+            relative = os.path.normpath(os.path.join(relative_root, name))
+            if (
+                relative in GENERATED_FILES
+                or name.endswith(".part")
+                or name.endswith(".tmp")
+            ):
+                continue
+            path = os.path.join(root, name)
+            files[relative.replace(os.sep, "/")] = {
+                "size": os.path.getsize(path),
+                "sha256": file_sha256(path),
+            }
+    return {"version": MANIFEST_VERSION, "model": MODEL_NAME, "files": files}
+
+
+def write_manifest(model_path: str = MODEL_PATH) -> dict:
+    """为已保存好的模型目录生成清单并写入完成标记"""
+    manifest = build_manifest(model_path)
+    data = json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
+    write_atomic(manifest_path(model_path), data)
+    write_stamp(model_path, manifest)
+    return manifest
+
+
+def _file_states(model_path: str, manifest: dict) -> Dict[str, list]:
+    states = {}
+    for name in manifest["files"]:
+        stat = os.stat(resolve_path(model_path, name))
+        states[name] = [stat.st_size, stat.st_mtime_ns]
+    return states
+
+
+def write_stamp(model_path: str, manifest: dict):
+    """记录校验通过时各文件的大小和修改时间"""
+    stamp = {
+        "manifest_sha256": hashlib.sha256(
+            json.dumps(manifest, sort_keys=True).encode("utf-8")
+        ).hexdigest(),
+        "files": _file_states(model_path, manifest),
+    }
+    write_atomic(stamp_path(model_path), json.dumps(stamp).encode("utf-8"))
+
+
+def check_stamp(model_path: str = MODEL_PATH) -> bool:
+    """
+    快速检查：清单和各文件的大小、修改时间与上次完整校验时一致
+
+    只读取清单和标记文件并stat各文件，不计算哈希
+    """
+    try:
+        manifest = read_manifest(model_path)
+        if manifest is None:
+            return False
+        with open(stamp_path(model_path), "r", encoding="utf-8") as f:
+            stamp = json.load(f)
+        expected_sha = hashlib.sha256(
+            json.dumps(manifest, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        return stamp.get("manifest_sha256") == expected_sha and stamp.get(
+            "files"
+        ) == _file_states(model_path, manifest)
+    except (OSError, ValueError, ProvisioningError):
+        return False
+
+
+def verify_files(model_path: str, manifest: dict) -> List[str]:
+    """
+    完整校验：按清单检查每个文件的大小和sha256
+
+    Returns:
+        List[str]: 发现的问题，为空表示全部通过
+    """
+    problems = []
+    for name, info in manifest["files"].items():
+        path = resolve_path(model_path, name)
+        if not os.path.isfile(path):
+            problems.append(f"缺少文件: {name}")
+        elif os.path.getsize(path) != info["size"]:
+            problems.append(f"文件大小不符: {name}")
+        elif file_sha256(path) != info["sha256"]:
+            problems.append(f"文件哈希不符: {name}")
+    return problems
+
+
+def _is_legacy_install(model_path: str) -> bool:
+    """没有清单的旧版本安装目录是否完整：必要文件齐全且safetensors权重未被截断"""
+    for candidates in REQUIRED_FILES:
+        if not any(os.path.isfile(os.path.join(model_path, n)) for n in candidates):
+            return False
+    path = weights_path(model_path)
+    return not os.path.exists(path) or is_complete_store(path)
+
+
+class _InstallSource:
+    """安装源：镜像目录或压缩包，文件按清单中的相对路径读取"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self._archive = None
+        self._prefix = ""
+        if not os.path.exists(source):
+            raise ProvisioningError(f"模型安装源不存在: {source}")
+        if os.path.isdir(source):
+            self._names = None
+        elif zipfile.is_zipfile(source):
+            self._archive = zipfile.ZipFile(source)
+            self._names = self._archive.namelist()
+        elif tarfile.is_tarfile(source):
+            self._archive = tarfile.open(source, "r:*")
+            self._names = self._archive.getnames()
+        else:
+            raise ProvisioningError(f"无法识别的模型安装源: {source}")
+        if self._names is not None:
+            # 压缩包中的文件可能位于一个顶层目录下，以清单所在目录为准
+            found = [
+                n
+                for n in self._names
+                if n.rstrip("/").split("/")[-1] == MODEL_MANIFEST_FILE
+            ]
+            if not found:
+                raise ProvisioningError(f"安装源中没有模型清单: {source}")
+            self._prefix = min(found, key=len)[: -len(MODEL_MANIFEST_FILE)]
+            # 成员名为前缀加清单中的路径，清单路径在解析时检查，这里检查前缀
+            # （tar命令打包的成员名常以./开头）
+            prefix = self._prefix[2:] if self._prefix.startswith("./") else self._prefix
+            try:
+                _check_relative_path(prefix + MODEL_MANIFEST_FILE)
+            except ValueError as e:
+                raise ProvisioningError(f"安装源无效: {str(e)}")
+
+    def open(self, name: str):
+        """打开安装源中的文件，返回二进制文件对象"""
+        try:
+            if self._archive is None:
+                return open(resolve_path(self.source, name), "rb")
+            if isinstance(self._archive, zipfile.ZipFile):
+                return self._archive.open(self._prefix + name)
+            reader = self._archive.extractfile(self._prefix + name)
+            if reader is None:
+                raise KeyError(name)
+            return reader
+        except (OSError, KeyError) as e:
+            raise ProvisioningError(f"安装源中缺少文件 {name}: {str(e)}")
+
+    def read_manifest(self) -> bytes:
+        with self.open(MODEL_MANIFEST_FILE) as f:
+            return f.read()
+
+    def close(self):
+        if self._archive is not None:
+            self._archive.close()
+
+
+def _copy_resumable(reader, target: str, size: int, sha256: str):
+    """
+    将文件复制到target，先写入target.part，校验通过后再替换为正式文件
+
+    target.part已存在时视为上次中断的进度：已写入的部分计入哈希，
+    只从安装源读取剩余部分
+    """
+    part = f"{target}.part"
+    digest = hashlib.sha256()
+    offset = 0
+    if os.path.exists(part):
+        if os.path.getsize(part) <= size:
+            with open(part, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    offset += len(chunk)
+        else:
+            os.remove(part)
+
+    if offset:
+        if reader.seekable():
+            reader.seek(offset)
+        else:
+            remaining = offset
+            while remaining:
+                skipped = len(reader.read(min(CHUNK_SIZE, remaining)))
+                if not skipped:
+                    break
+                remaining -= skipped
+    with open(part, "ab") as f:
+        for chunk in iter(lambda: reader.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            f.write(chunk)
+
+    if os.path.getsize(part) != size or digest.hexdigest() != sha256:
+        os.remove(part)
+        raise ProvisioningError(
+            f"文件校验失败: {os.path.basename(target)}，请检查安装源后重试"
+        )
+    os.replace(part, target)
+
+
+def install_model(
+    source: str,
+    model_path: str = MODEL_PATH,
+    progress_callback: Optional[Callable[[str, int, int], None]] = None,
+) -> dict:
+    """
+    从模型压缩包或镜像目录安装模型，可在中断后重新执行以续传
+
+    Args:
+        source: 包含manifest.json的压缩包（.zip/.tar/.tar.gz）或目录
+        model_path: 安装目录
+        progress_callback: 进度回调，参数为(文件名, 已完成文件数, 文件总数)
+
+    Returns:
+        dict: 安装的清单
+    """
+    install_source = _InstallSource(source)
+    try:
+        manifest_data = install_source.read_manifest()
+        manifest = parse_manifest(manifest_data)
+        os.makedirs(model_path, exist_ok=True)
+        # 先删除标记，安装中断时目录不会被当作完整
+        if os.path.exists(stamp_path(model_path)):
+            os.remove(stamp_path(model_path))
+
+        files = manifest["files"]
+        for done, (name, info) in enumerate(sorted(files.items())):
+            target = resolve_path(model_path, name)
+            if progress_callback is not None:
+                progress_callback(name, done, len(files))
+            if (
+                os.path.isfile(target)
+                and os.path.getsize(target) == info["size"]
+                and file_sha256(target) == info["sha256"]
+            ):
+                continue
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            with install_source.open(name) as reader:
+                _copy_resumable(reader, target, info["size"], info["sha256"])
+    finally:
+        install_source.close()
+
+    write_atomic(manifest_path(model_path), manifest_data)
+    write_stamp(model_path, manifest)
+    return manifest
+
+
+def ensure_model(
+    model_path: str = MODEL_PATH, source: str = MODEL_INSTALL_SOURCE
+) -> bool:
+    """
+    启动时确认本地模型可用，依次尝试：
+
+    1. 标记与清单一致：只做stat比较，不计算哈希
+    2. 有清单但标记不符：完整校验一次，通过后重写标记
+    3. 没有清单的旧版本安装目录：检查必要文件后生成清单
+    4. 配置了安装源：从安装源续传安装，失败时抛出ProvisioningError
+
+    Args:
+        model_path: 模型目录
+        source: 安装源，为空时不安装
+
+    Returns:
+        bool: 本地模型是否可用；为False时需要从在线模型库下载
+    """
+    if check_stamp(model_path):
+        return True
+    manifest = read_manifest(model_path) if os.path.isdir(model_path) else None
+    if manifest is not None:
+        problems = verify_files(model_path, manifest)
+        if not problems:
+            write_stamp(model_path, manifest)
+            return True
+        logger.warning("本地模型不完整: %s", "；".join(problems))
+    elif os.path.isdir(model_path) and _is_legacy_install(model_path):
+        write_manifest(model_path)
+        return True
+    if source:
+        logger.info("从 %s 安装模型", source)
+        install_model(source, model_path)
+        return True
+    return False
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m translator.provisioning", description="安装和校验本地模型"
+    )
+    parser.add_argument(
+        "--model-path", default=MODEL_PATH, help=f"模型目录（默认 {MODEL_PATH}）"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    install_parser = subparsers.add_parser(
+        "install", help="从模型压缩包或镜像目录安装，中断后重新执行即可续传"
+    )
+    install_parser.add_argument("source", help="包含manifest.json的压缩包或目录")
+    verify_parser = subparsers.add_parser("verify", help="校验本地模型")
+    verify_parser.add_argument(
+        "--full", action="store_true", help="重新计算所有文件的哈希，而不只比较标记"
+    )
+    subparsers.add_parser("manifest", help="为已保存好的模型目录生成清单")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "install":
+            manifest = install_model(
+                args.source,
+                args.model_path,
+                lambda name, done, total: print(
+                    f"[{done}/{total}] {name}", file=sys.stderr
+                ),
+            )
+            print(f"已安装 {len(manifest['files'])} 个文件", file=sys.stderr)
+        elif args.command == "manifest":
+            manifest = write_manifest(args.model_path)
+            print(f"已写入 {len(manifest['files'])} 个文件的清单", file=sys.stderr)
+        else:
+            manifest = read_manifest(args.model_path)
+            if manifest is None:
+                print("模型目录中没有清单", file=sys.stderr)
+                return 1
+            if not args.full and check_stamp(args.model_path):
+                print("校验通过（标记一致）", file=sys.stderr)
+                return 0
+            problems = verify_files(args.model_path, manifest)
+            for problem in problems:
+                print(problem, file=sys.stderr)
+            if problems:
+                return 1
+            write_stamp(args.model_path, manifest)
+            print("校验通过", file=sys.stderr)
+    except (OSError, ProvisioningError) as e:
+        print(f"出错: {str(e)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
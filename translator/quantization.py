@@ -0,0 +1,418 @@
+"""
+模型量化模块
+对T5模型的线性层做int8动态量化以降低CPU推理延迟和内存占用，
+量化后的权重可缓存在模型目录下，并可生成与fp32对比的评估报告
+"""
+
+import argparse
+import difflib
+import gc
+import io
+import json
+import logging
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from translator.config import (
+    MODEL_CACHE_DIR,
+    MODEL_NAME,
+    MODEL_PATH,
+    QUANTIZED_MODEL_FILE,
+)
+from translator.file_utils import atomic_output
+from translator.tokenization import load_tokenizer
+
+logger = logging.getLogger(__name__)
+
+# 缓存文件格式版本，格式变化时递增使旧缓存失效
+CACHE_FORMAT_VERSION = 2
+
+# 固定评估语料：(目标语言, 原文)
+REFERENCE_CORPUS: List[Tuple[str, str]] = [
+    ("zh", "The weather is nice today, so we decided to go for a walk in the park."),
+    (
+        "zh",
+        "To assess the economic aspects of PBs, the current literature employed"
+        " various methods such as LCC, cost-benefit method, and total cost calculation.",
+    ),
+    ("zh", "Error: a lot of typos"),
+    ("ru", "Machine translation models can run entirely offline on a laptop."),
+    ("ru", "我们明天上午十点在会议室讨论项目进度。"),
+    ("en", "人工智能正在改变我们的工作方式。"),
+    ("en", "Сегодня хорошая погода, и мы решили прогуляться по парку."),
+    ("zh", "Сегодня хорошая погода, и мы решили прогуляться по парку."),
+]
+
+
+def quantized_cache_path(model_source: str = MODEL_PATH) -> str:
+    """
+    量化缓存的路径：模型目录时放在该目录下，模型名称时放在MODEL_CACHE_DIR下，
+    与缓存元数据记录的来源一致，不同来源的缓存不会互相覆盖
+    """
+    if os.path.isdir(model_source):
+        return os.path.join(model_source, QUANTIZED_MODEL_FILE)
+    name = model_source.replace("/", "--").replace("\\", "--")
+    return os.path.join(MODEL_CACHE_DIR, f"{name}-{QUANTIZED_MODEL_FILE}")
+
+
+def _dynamic_linear_class():
+    import torch
+
+    quantized = getattr(torch.ao.nn.quantized, "dynamic", None)
+    if quantized is None:
+        quantized = torch.nn.quantized.dynamic
+    return quantized.Linear
+
+
+def quantize_model(model, inplace: bool = False):
+    """对模型中的所有nn.Linear做int8动态量化，inplace为True时直接替换原模型的层"""
+    import torch
+
+    quantize_dynamic = getattr(torch.ao.quantization, "quantize_dynamic", None)
+    if quantize_dynamic is None:
+        quantize_dynamic = torch.quantization.quantize_dynamic
+    model.eval()
+    return quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8, inplace=inplace
+    )
+
+
+def _cache_metadata(model_source: str) -> dict:
+    import torch
+
+    return {
+        "format": CACHE_FORMAT_VERSION,
+        "torch": str(torch.__version__),
+        "source": (
+            os.path.abspath(model_source)
+            if os.path.isdir(model_source)
+            else model_source
+        ),
+    }
+
+
+def save_quantized(model, model_source: str, path: Optional[str] = None):
+    """
+    保存量化模型的权重及用于校验缓存的元数据
+
+    量化线性层保存为int8整数张量加缩放系数和零点，其余参数原样保存，
+    文件中只有普通张量，可以用weights_only=True安全加载
+    """
+    import torch
+
+    linear_class = _dynamic_linear_class()
+    tensors = {}
+    quantized_prefixes = []
+    for name, module in model.named_modules():
+        if not isinstance(module, linear_class):
+            continue
+        weight, bias = module.weight(), module.bias()
+        if weight.qscheme() != torch.per_tensor_affine:
+            raise ValueError(f"不支持的量化方式: {weight.qscheme()}")
+        tensors[f"{name}.weight"] = weight.int_repr()
+        tensors[f"{name}.weight_scale"] = torch.tensor(weight.q_scale())
+        tensors[f"{name}.weight_zero_point"] = torch.tensor(weight.q_zero_point())
+        if bias is not None:
+            tensors[f"{name}.bias"] = bias.detach()
+        quantized_prefixes.append(f"{name}.")
+    for key, value in model.state_dict().items():
+        if isinstance(value, torch.Tensor) and not key.startswith(
+            tuple(quantized_prefixes)
+        ):
+            tensors[key] = value
+
+    with atomic_output(path or quantized_cache_path(model_source)) as temp_path:
+        torch.save(
+            {"metadata": _cache_metadata(model_source), "tensors": tensors}, temp_path
+        )
+
+
+def _load_cached(model_source: str, path: str):
+    """
+    从缓存加载量化模型，缓存不存在或不匹配时返回None
+
+    模型结构在meta设备上构建，不分配也不随机初始化fp32权重，
+    线性层直接替换为由缓存的int8权重构建的量化层
+    """
+    import torch
+    from transformers import T5Config, T5ForConditionalGeneration
+
+    if not os.path.exists(path):
+        return None
+    try:
+        checkpoint = torch.load(path, map_location="cpu", weights_only=True)
+        if checkpoint.get("metadata") != _cache_metadata(model_source):
+            return None
+        tensors = checkpoint["tensors"]
+        config = T5Config.from_pretrained(model_source)
+        with torch.device("meta"):
+            model = T5ForConditionalGeneration(config)
+
+        # 先赋值线性层以外的参数，量化层的load_state_dict要求额外的键
+        linear_names = {
+            name
+            for name, module in model.named_modules()
+            if isinstance(module, torch.nn.Linear)
+        }
+        model.load_state_dict(
+            {
+                key: value
+                for key, value in tensors.items()
+                if key.rsplit(".", 1)[0] not in linear_names
+            },
+            strict=False,
+            assign=True,
+        )
+
+        linear_class = _dynamic_linear_class()
+        for parent_name, parent in list(model.named_modules()):
+            for child_name, child in list(parent.named_children()):
+                if not isinstance(child, torch.nn.Linear):
+                    continue
+                name = f"{parent_name}.{child_name}" if parent_name else child_name
+                layer = linear_class(
+                    child.in_features,
+                    child.out_features,
+                    bias_=child.bias is not None,
+                    dtype=torch.qint8,
+                )
+                weight = torch._make_per_tensor_quantized_tensor(
+                    tensors.pop(f"{name}.weight"),
+                    float(tensors.pop(f"{name}.weight_scale")),
+                    int(tensors.pop(f"{name}.weight_zero_point")),
+                )
+                layer.set_weight_bias(weight, tensors.pop(f"{name}.bias", None))
+                setattr(parent, child_name, layer)
+
+        if any(t.is_meta for t in list(model.parameters()) + list(model.buffers())):
+            raise ValueError("缓存的权重与模型结构不匹配")
+        model.eval()
+        return model
+    except Exception as e:
+        logger.warning("加载量化模型缓存失败，将重新量化: %s", e)
+        return None
+
+
+def load_quantized_model(model_source: str, use_cache: bool = True, fp32_model=None):
+    """
+    获取int8动态量化模型，优先使用磁盘缓存
+
+    Args:
+        model_source: 模型目录或名称
+        use_cache: 是否读取和写入量化缓存
+        fp32_model: 已加载的fp32模型，缓存未命中时直接量化它
+
+    Returns:
+        量化后的模型
+    """
+    from transformers import T5ForConditionalGeneration
+
+    path = quantized_cache_path(model_source)
+    if use_cache:
+        model = _load_cached(model_source, path)
+        if model is not None:
+            return model
+
+    if fp32_model is None:
+        fp32_model = T5ForConditionalGeneration.from_pretrained(model_source)
+    # 原地量化，避免同时保留fp32和int8两份权重
+    model = quantize_model(fp32_model, inplace=True)
+
+    if use_cache:
+        try:
+            save_quantized(model, model_source, path)
+        except Exception as e:
+            logger.warning("保存量化模型缓存时出错: %s", e)
+    return model
+
+
+def _serialized_size_mb(model) -> float:
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+
+def _rss_mb() -> Optional[float]:
+    """当前进程常驻内存（MB），无法获取时返回None"""
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _load_rss_delta(model_source: str, precision: str) -> Optional[float]:
+    """加载模型（int8时原地量化）前后当前进程常驻内存的差值（MB）"""
+    import torch  # noqa: F401  先导入torch，其自身的内存不计入模型
+    from transformers import T5ForConditionalGeneration
+
+    before = _rss_mb()
+    model = T5ForConditionalGeneration.from_pretrained(model_source).eval()
+    if precision == "int8":
+        model = quantize_model(model, inplace=True)
+        # 释放被替换掉的fp32线性层权重
+        gc.collect()
+    after = _rss_mb()
+    if before is None or after is None:
+        return None
+    return after - before
+
+
+def measure_load_rss(model_source: str, precision: str) -> Optional[float]:
+    """
+    在新启动的子进程中加载模型并测量常驻内存增量，fp32和int8各用一个进程，
+    测量结果互不影响，可以直接比较
+
+    Returns:
+        Optional[float]: 常驻内存增量（MB），无法获取时为None
+    """
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(_load_rss_delta, model_source, precision).result()
+
+
+def _run_corpus(model, tokenizer, corpus, repeats: int):
+    import torch
+
+    outputs = []
+    latencies = []
+    for target_lang, text in corpus:
+        inputs = tokenizer(f"translate to {target_lang}: {text}", return_tensors="pt")
+        timings = []
+        with torch.no_grad():
+            for _ in range(repeats):
+                started = time.perf_counter()
+                generated = model.generate(**inputs)
+                timings.append(time.perf_counter() - started)
+        outputs.append(tokenizer.decode(generated[0], skip_special_tokens=True))
+        latencies.append(statistics.median(timings))
+    return outputs, latencies
+
+
+def compare_precisions(
+    model_source: str = MODEL_PATH,
+    corpus: List[Tuple[str, str]] = REFERENCE_CORPUS,
+    repeats: int = 3,
+) -> dict:
+    """
+    在固定语料上比较fp32与int8模型的延迟、内存占用和输出一致性；
+    两种精度的常驻内存增量分别在新启动的子进程中测量
+
+    Returns:
+        dict: 评估报告
+    """
+    from transformers import T5ForConditionalGeneration
+
+    tokenizer = load_tokenizer(model_source)
+
+    fp32_rss = measure_load_rss(model_source, "fp32")
+    int8_rss = measure_load_rss(model_source, "int8")
+
+    fp32_model = T5ForConditionalGeneration.from_pretrained(model_source).eval()
+    fp32_outputs, fp32_latencies = _run_corpus(fp32_model, tokenizer, corpus, repeats)
+    fp32_size = _serialized_size_mb(fp32_model)
+
+    int8_model = quantize_model(fp32_model)
+    del fp32_model
+    int8_outputs, int8_latencies = _run_corpus(int8_model, tokenizer, corpus, repeats)
+    int8_size = _serialized_size_mb(int8_model)
+
+    samples = []
+    for (target_lang, text), fp32_out, int8_out, fp32_t, int8_t in zip(
+        corpus, fp32_outputs, int8_outputs, fp32_latencies, int8_latencies
+    ):
+        samples.append(
+            {
+                "target_lang": target_lang,
+                "source": text,
+                "fp32": fp32_out,
+                "int8": int8_out,
+                "exact_match": fp32_out == int8_out,
+                "similarity": round(
+                    difflib.SequenceMatcher(None, fp32_out, int8_out).ratio(), 4
+                ),
+                "fp32_seconds": round(fp32_t, 4),
+                "int8_seconds": round(int8_t, 4),
+            }
+        )
+
+    fp32_total = sum(fp32_latencies)
+    int8_total = sum(int8_latencies)
+    return {
+        "model": model_source,
+        "repeats": repeats,
+        "fp32": {
+            "total_seconds": round(fp32_total, 4),
+            "weights_mb": round(fp32_size, 1),
+            "load_rss_delta_mb": round(fp32_rss, 1) if fp32_rss is not None else None,
+        },
+        "int8": {
+            "total_seconds": round(int8_total, 4),
+            "weights_mb": round(int8_size, 1),
+            "load_rss_delta_mb": round(int8_rss, 1) if int8_rss is not None else None,
+        },
+        "speedup": round(fp32_total / int8_total, 2) if int8_total else None,
+        "exact_match_rate": round(
+            sum(s["exact_match"] for s in samples) / len(samples), 4
+        ),
+        "mean_similarity": round(statistics.mean(s["similarity"] for s in samples), 4),
+        "samples": samples,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m translator.quantization", description="int8动态量化工具"
+    )
+    parser.add_argument(
+        "--model", default=MODEL_PATH, help=f"模型目录或名称（默认 {MODEL_PATH}）"
+    )
+    parser.add_argument("--build", action="store_true", help="生成量化模型缓存")
+    parser.add_argument("--report", action="store_true", help="与fp32对比评估")
+    parser.add_argument("--repeats", type=int, default=3, help="每条语料的重复次数")
+    parser.add_argument("-o", "--output", help="评估报告输出的JSON文件")
+    args = parser.parse_args(argv)
+
+    if not args.build and not args.report:
+        parser.error("请指定 --build 或 --report")
+
+    if args.build:
+        load_quantized_model(args.model)
+        print(f"量化模型已缓存到 {quantized_cache_path(args.model)}", file=sys.stderr)
+
+    if args.report:
+        report = compare_precisions(args.model, repeats=args.repeats)
+        content = json.dumps(report, ensure_ascii=False, indent=2)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(content)
+        else:
+            print(content)
+        print(
+            f"{MODEL_NAME}: int8 加速 {report['speedup']}x, "
+            f"权重 {report['fp32']['weights_mb']}MB -> {report['int8']['weights_mb']}MB, "
+            f"常驻内存 {report['fp32']['load_rss_delta_mb']}MB -> "
+            f"{report['int8']['load_rss_delta_mb']}MB, "
+            f"完全一致 {report['exact_match_rate']:.0%}, "
+            f"平均相似度 {report['mean_similarity']:.3f}",
+            file=sys.stderr,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
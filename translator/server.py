@@ -0,0 +1,216 @@
+"""
+本地HTTP翻译服务模块
+在本机提供JSON接口，多个客户端共享同一份常驻模型，
+并发请求由微批处理调度器合并为批量生成
+
+接口:
+    GET  /health            存活检查
+    GET  /ready             就绪检查，模型加载完成前返回503
+    POST /translate         {"text": "...", "target_lang": "zh"}
+    POST /translate/batch   {"texts": ["...", ...], "target_lang": "zh"}
+
+POST请求可附带可选的"source_lang"，用于确定输出长度上限
+"""
+
+import argparse
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+from translator.batching import MicroBatchScheduler, QueueFullError
+from translator.config import (
+    BATCH_MAX_SIZE,
+    BATCH_MAX_WAIT_MS,
+    DECODING_PRESETS,
+    DEFAULT_DECODING_PRESET,
+    INFERENCE_BACKEND,
+    LANGUAGES,
+    SERVER_HOST,
+    SERVER_MAX_BATCH_TEXTS,
+    SERVER_MAX_BODY_BYTES,
+    SERVER_PORT,
+    SERVER_QUEUE_SIZE,
+    SERVER_REQUEST_TIMEOUT,
+)
+from translator.model_manager import BACKENDS, get_model_manager
+
+
+class TranslationRequestHandler(BaseHTTPRequestHandler):
+    """JSON接口请求处理"""
+
+    server_version = "LocalTranslator/1.0"
+
+    @property
+    def service(self) -> MicroBatchScheduler:
+        return self.server.service
+
+    def log_message(self, format, *args):
+        # 默认日志写入stderr过于冗长，只在verbose模式下输出
+        if getattr(self.server, "verbose", False):
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > SERVER_MAX_BODY_BYTES:
+            raise ValueError("请求体过大")
+        data = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(data, dict):
+            raise ValueError("请求体必须是JSON对象")
+        return data
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/ready":
+            payload = {
+                "ready": self.service.ready,
+                "model_state": self.service.manager.state,
+                "backend": self.service.manager.active_backend,
+                "queue_depth": self.service.queue_depth,
+                "stats": self.service.stats,
+            }
+            self._send_json(200 if self.service.ready else 503, payload)
+        else:
+            self._send_json(404, {"error": "未知接口"})
+
+    def do_POST(self):
+        if self.path not in ("/translate", "/translate/batch"):
+            self._send_json(404, {"error": "未知接口"})
+            return
+
+        try:
+            data = self._read_json()
+            texts = self._parse_texts(data, batch=self.path == "/translate/batch")
+            target_lang = data.get("target_lang")
+            if target_lang not in LANGUAGES.values():
+                raise ValueError(f"不支持的目标语言: {target_lang}")
+            source_lang = data.get("source_lang")
+            if source_lang is not None and source_lang not in LANGUAGES.values():
+                raise ValueError(f"不支持的源语言: {source_lang}")
+        except (ValueError, TypeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        started = time.perf_counter()
+        try:
+            job = self.service.submit(texts, target_lang, source_lang)
+            translations = job.wait(SERVER_REQUEST_TIMEOUT)
+        except QueueFullError as e:
+            self._send_json(503, {"error": str(e)}, {"Retry-After": "1"})
+            return
+        except TimeoutError as e:
+            self._send_json(504, {"error": str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": f"翻译出错: {str(e)}"})
+            return
+
+        payload = {"seconds": round(time.perf_counter() - started, 4)}
+        if self.path == "/translate":
+            payload["translation"] = translations[0]
+        else:
+            payload["translations"] = translations
+        self._send_json(200, payload)
+
+    @staticmethod
+    def _parse_texts(data: dict, batch: bool) -> List[str]:
+        if not batch:
+            text = data.get("text")
+            if not isinstance(text, str) or not text.strip():
+                raise ValueError("缺少待翻译的text字段")
+            return [text]
+
+        texts = data.get("texts")
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            raise ValueError("texts字段必须是字符串列表")
+        if not texts:
+            raise ValueError("texts不能为空")
+        if len(texts) > SERVER_MAX_BATCH_TEXTS:
+            raise ValueError(f"单次批量请求最多{SERVER_MAX_BATCH_TEXTS}条文本")
+        return texts
+
+
+def create_server(
+    host: str = SERVER_HOST,
+    port: int = SERVER_PORT,
+    service: Optional[MicroBatchScheduler] = None,
+    verbose: bool = False,
+) -> ThreadingHTTPServer:
+    """创建HTTP服务并启动批处理调度线程（端口为0时自动选择空闲端口）"""
+    server = ThreadingHTTPServer((host, port), TranslationRequestHandler)
+    server.daemon_threads = True
+    server.service = service or MicroBatchScheduler()
+    server.verbose = verbose
+    server.service.start()
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m translator.server", description="本地HTTP翻译服务"
+    )
+    parser.add_argument("--host", default=SERVER_HOST, help="监听地址")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="监听端口")
+    parser.add_argument(
+        "--queue-size", type=int, default=SERVER_QUEUE_SIZE, help="请求队列容量"
+    )
+    parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=BATCH_MAX_SIZE,
+        help="合并为一批的最大文本数",
+    )
+    parser.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=BATCH_MAX_WAIT_MS,
+        help="收到第一个请求后等待后续请求的最长时间（毫秒）",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=INFERENCE_BACKEND,
+        help="推理后端，onnx需要先导出模型，缺失时回退到torch",
+    )
+    parser.add_argument(
+        "--preset",
+        choices=list(DECODING_PRESETS),
+        default=DEFAULT_DECODING_PRESET,
+        help="解码预设：fast为贪心解码，balanced/quality使用束搜索",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出访问日志")
+    args = parser.parse_args(argv)
+
+    get_model_manager().set_backend(args.backend)
+    scheduler = MicroBatchScheduler(
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        queue_size=args.queue_size,
+        decoding_preset=args.preset,
+    )
+    server = create_server(args.host, args.port, scheduler, args.verbose)
+    host, port = server.server_address[:2]
+    print(f"翻译服务已启动: http://{host}:{port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
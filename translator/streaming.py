@@ -0,0 +1,75 @@
+"""
+流式解码模块
+在 model.generate 逐步解码时接收新token，统计进度并增量解码出部分译文
+"""
+
+import time
+from typing import Callable, List, Optional
+
+from translator.config import STREAM_UPDATE_INTERVAL
+
+
+class BatchTokenStreamer:
+    """
+    批量流式接收器，实现transformers BaseStreamer的put/end接口
+
+    transformers自带的TextStreamer只支持batch为1，这里按行分别累积token，
+    使批量生成时也能得到每个片段的部分译文
+    """
+
+    def __init__(
+        self,
+        tokenizer,
+        on_update: Optional[Callable[["BatchTokenStreamer"], None]] = None,
+        min_interval: float = STREAM_UPDATE_INTERVAL,
+    ):
+        self.tokenizer = tokenizer
+        self.on_update = on_update
+        self.min_interval = min_interval
+        self.eos_token_id = tokenizer.eos_token_id
+        self.token_ids: List[List[int]] = []
+        self.finished: List[bool] = []
+        self.generated_tokens = 0
+        self._last_update = 0.0
+
+    def put(self, value):
+        # 编码器-解码器模型第一次put的是解码器起始token（二维），直接跳过
+        if value.dim() > 1:
+            if not self.token_ids:
+                self.token_ids = [[] for _ in range(value.shape[0])]
+                self.finished = [False] * value.shape[0]
+            return
+
+        tokens = value.tolist()
+        if not self.token_ids:
+            self.token_ids = [[] for _ in tokens]
+            self.finished = [False] * len(tokens)
+
+        for row, token in enumerate(tokens):
+            if self.finished[row]:
+                continue
+            if token == self.eos_token_id:
+                self.finished[row] = True
+                continue
+            self.token_ids[row].append(token)
+            self.generated_tokens += 1
+
+        # 限制刷新频率，第一个token总是立即通知
+        now = time.monotonic()
+        if now - self._last_update >= self.min_interval:
+            self._last_update = now
+            self._notify()
+
+    def end(self):
+        self._notify()
+
+    def texts(self) -> List[str]:
+        """当前每一行已解码的部分译文"""
+        return [
+            self.tokenizer.decode(ids, skip_special_tokens=True).strip()
+            for ids in self.token_ids
+        ]
+
+    def _notify(self):
+        if self.on_update is not None:
+            self.on_update(self)
@@ -0,0 +1,116 @@
+"""
+分词器加载模块
+优先使用Rust实现的快速分词器（T5TokenizerFast），批量分词和batch_decode的开销远低于
+基于Python的SentencePiece分词器。快速分词器首次由本地SentencePiece模型转换，
+并以tokenizer.json缓存在MODEL_PATH下，之后直接加载；转换不可用时回退到慢速分词器
+"""
+
+import logging
+import os
+from typing import List, Optional
+
+from translator.config import FAST_TOKENIZER_FILE, MODEL_PATH, USE_FAST_TOKENIZER
+from translator.file_utils import atomic_output
+
+logger = logging.getLogger(__name__)
+
+# 转换后与慢速分词器核对编码结果的样本，覆盖三种语言、数字和标点
+VERIFICATION_TEXTS = [
+    "translate to zh: The weather is nice today, isn't it?",
+    "translate to ru: 我们明天上午十点在会议室讨论项目进度。",
+    "translate to en: Сегодня хорошая погода — 25 °C, 10.5%!",
+    'translate to zh: "cost-benefit" [0] https://example.com/a_b?x=1',
+]
+
+
+def fast_tokenizer_path(model_path: str = MODEL_PATH) -> str:
+    return os.path.join(model_path, FAST_TOKENIZER_FILE)
+
+
+def load_slow_tokenizer(source: str):
+    from transformers import T5Tokenizer
+
+    return T5Tokenizer.from_pretrained(source)
+
+
+def convert_fast_tokenizer(
+    source: str, slow_tokenizer=None, cache_path: Optional[str] = None
+):
+    """
+    由SentencePiece模型转换出快速分词器，编码结果与慢速分词器一致时写入缓存
+
+    Args:
+        source: 模型目录或模型名称
+        slow_tokenizer: 用于核对的慢速分词器，默认从source加载
+        cache_path: tokenizer.json的保存路径，为None时不保存
+
+    Returns:
+        快速分词器；转换失败或编码结果不一致时返回None
+    """
+    try:
+        from transformers import T5TokenizerFast
+
+        fast_tokenizer = T5TokenizerFast.from_pretrained(source, from_slow=True)
+        if slow_tokenizer is None:
+            slow_tokenizer = load_slow_tokenizer(source)
+    except Exception as e:
+        # 缺少tokenizers/sentencepiece/protobuf等依赖时无法转换
+        logger.warning("快速分词器转换失败，使用慢速分词器: %s", e)
+        return None
+
+    if not tokenizers_match(slow_tokenizer, fast_tokenizer, VERIFICATION_TEXTS):
+        logger.warning("快速分词器与慢速分词器的编码结果不一致，使用慢速分词器")
+        return None
+
+    if cache_path is not None:
+        try:
+            with atomic_output(cache_path) as temp_path:
+                fast_tokenizer.backend_tokenizer.save(temp_path)
+        except Exception as e:
+            logger.warning("保存快速分词器时出错: %s", e)
+    return fast_tokenizer
+
+
+def tokenizers_match(slow_tokenizer, fast_tokenizer, texts: List[str]) -> bool:
+    """两个分词器对样本的编码和解码结果是否一致"""
+    slow_ids = slow_tokenizer(texts)["input_ids"]
+    fast_ids = fast_tokenizer(texts)["input_ids"]
+    if slow_ids != fast_ids:
+        return False
+    return slow_tokenizer.batch_decode(
+        slow_ids, skip_special_tokens=True
+    ) == fast_tokenizer.batch_decode(fast_ids, skip_special_tokens=True)
+
+
+def load_tokenizer(
+    source: str = MODEL_PATH,
+    use_fast: bool = USE_FAST_TOKENIZER,
+    cache_dir: Optional[str] = MODEL_PATH,
+):
+    """
+    加载分词器，优先使用缓存的快速分词器
+
+    Args:
+        source: 模型目录或模型名称
+        use_fast: 是否尝试使用快速分词器
+        cache_dir: 缓存tokenizer.json的目录（通常为MODEL_PATH），为None时不缓存
+
+    Returns:
+        快速分词器，或回退的慢速分词器
+    """
+    if not use_fast:
+        return load_slow_tokenizer(source)
+
+    cache_path = fast_tokenizer_path(cache_dir) if cache_dir else None
+    if cache_path is not None and os.path.exists(cache_path):
+        try:
+            from transformers import T5TokenizerFast
+
+            # 其余配置（特殊token等）仍从source读取
+            return T5TokenizerFast.from_pretrained(source, tokenizer_file=cache_path)
+        except Exception as e:
+            logger.warning("加载缓存的快速分词器失败，重新转换: %s", e)
+
+    slow_tokenizer = load_slow_tokenizer(source)
+    fast_tokenizer = convert_fast_tokenizer(source, slow_tokenizer, cache_path)
+    return fast_tokenizer if fast_tokenizer is not None else slow_tokenizer
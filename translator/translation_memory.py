@@ -0,0 +1,213 @@
+"""
+翻译记忆模块
+按 (模型及生成设置, 目标语言, 规范化原文片段) 缓存译文，
+内存中为有界LRU缓存，磁盘上为SQLite持久化存储，重启后仍然有效
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from translator.config import (
+    MODEL_NAME,
+    MODEL_PRECISION,
+    TRANSLATION_MEMORY_PATH,
+    TRANSLATION_MEMORY_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# 不同精度的模型输出可能不同，各自使用独立的缓存键
+DEFAULT_MODEL_KEY = (
+    MODEL_NAME if MODEL_PRECISION == "fp32" else f"{MODEL_NAME}@{MODEL_PRECISION}"
+)
+
+
+def normalize_segment(segment: str) -> str:
+    """规范化原文片段：统一Unicode形式并合并空白"""
+    return WHITESPACE_PATTERN.sub(" ", unicodedata.normalize("NFC", segment)).strip()
+
+
+class TranslationMemory:
+    """两级翻译记忆：内存LRU + SQLite持久化"""
+
+    def __init__(
+        self,
+        db_path: Optional[str] = TRANSLATION_MEMORY_PATH,
+        memory_size: int = TRANSLATION_MEMORY_SIZE,
+        model_name: str = DEFAULT_MODEL_KEY,
+    ):
+        self.db_path = db_path
+        self.memory_size = max(0, memory_size)
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+        self._conn = self._open_db(db_path) if db_path else None
+
+    @staticmethod
+    def _open_db(db_path: str):
+        try:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS translation_memory (
+                    model TEXT NOT NULL,
+                    target_lang TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    PRIMARY KEY (model, target_lang, source)
+                ) WITHOUT ROWID
+                """)
+            conn.commit()
+            return conn
+        except sqlite3.Error as e:
+            # 磁盘存储不可用时退化为纯内存缓存
+            logger.warning("无法打开翻译记忆库 %s: %s", db_path, e)
+            return None
+
+    def _key(self, target_lang: str, segment: str, variant: str = ""):
+        # 生成设置不同（如解码预设）时译文不同，与模型名一起区分条目
+        model = f"{self.model_name}#{variant}" if variant else self.model_name
+        return (model, target_lang, normalize_segment(segment))
+
+    def _remember(self, key, translation: str):
+        """写入内存LRU，超出容量时淘汰最久未使用的条目（调用方需持有锁）"""
+        if self.memory_size == 0:
+            return
+        self._memory[key] = translation
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, target_lang: str, segment: str, variant: str = "") -> Optional[str]:
+        """查询单个片段的译文，未命中返回None"""
+        return self.get_many(target_lang, [segment], variant).get(segment)
+
+    def get_many(
+        self, target_lang: str, segments: List[str], variant: str = ""
+    ) -> Dict[str, str]:
+        """
+        批量查询片段译文
+
+        Args:
+            target_lang: 目标语言代码
+            segments: 原文片段
+            variant: 生成设置标识，只命中以相同设置写入的条目
+
+        Returns:
+            Dict[str, str]: 命中的 原文片段 -> 译文
+        """
+        found = {}
+        with self._lock:
+            pending = []
+            for segment in segments:
+                key = self._key(target_lang, segment, variant)
+                translation = self._memory.get(key)
+                if translation is not None:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    found[segment] = translation
+                else:
+                    pending.append((segment, key))
+
+            for segment, key in pending:
+                translation = self._load_from_db(key)
+                if translation is not None:
+                    self._stats["disk_hits"] += 1
+                    self._remember(key, translation)
+                    found[segment] = translation
+                else:
+                    self._stats["misses"] += 1
+        return found
+
+    def _load_from_db(self, key) -> Optional[str]:
+        if self._conn is None:
+            return None
+        try:
+            row = self._conn.execute(
+                "SELECT translation FROM translation_memory "
+                "WHERE model = ? AND target_lang = ? AND source = ?",
+                key,
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def put(self, target_lang: str, segment: str, translation: str, variant: str = ""):
+        """保存单个片段的译文"""
+        self.put_many(target_lang, {segment: translation}, variant)
+
+    def put_many(
+        self, target_lang: str, translations: Dict[str, str], variant: str = ""
+    ):
+        """批量保存译文，在同一个事务中写入磁盘，variant为生成设置标识"""
+        rows = []
+        with self._lock:
+            for segment, translation in translations.items():
+                key = self._key(target_lang, segment, variant)
+                self._remember(key, translation)
+                rows.append(key + (translation,))
+            self._stats["writes"] += len(rows)
+
+            if self._conn is None or not rows:
+                return
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO translation_memory "
+                        "(model, target_lang, source, translation) "
+                        "VALUES (?, ?, ?, ?)",
+                        rows,
+                    )
+            except sqlite3.Error as e:
+                logger.warning("写入翻译记忆库时出错: %s", e)
+
+    def stats(self) -> Dict[str, float]:
+        """命中/未命中统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """清空内存和磁盘中的全部条目"""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM translation_memory")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_shared_memory = None
+_shared_memory_lock = threading.Lock()
+
+
+def get_translation_memory() -> TranslationMemory:
+    """获取进程内共享的翻译记忆"""
+    global _shared_memory
+    if _shared_memory is None:
+        with _shared_memory_lock:
+            if _shared_memory is None:
+                _shared_memory = TranslationMemory()
+    return _shared_memory
@@ -3,114 +3,214 @@
 处理翻译任务，避免UI卡顿
 """
 
-import os
+import logging
 
 from PyQt6.QtCore import QThread, pyqtSignal
-from transformers import T5ForConditionalGeneration, T5Tokenizer
 
-from translator.config import MODEL_PATH, MODEL_NAME, USE_LOCAL_MODEL, MAX_INPUT_LENGTH
-from translator.text_formatter import TextFormatter
+from translator.cancellation import CancellationToken, TranslationCancelled
+from translator.config import (
+    DEFAULT_DECODING_PRESET,
+    ENABLE_LAYOUT_PRESERVATION,
+    ENABLE_STREAMING,
+    ENABLE_TRANSLATION_MEMORY,
+    LANGUAGES,
+    TEXT_TARGET_SECTION,
+)
+from translator.instrumentation import Trace, format_breakdown
+from translator.model_manager import get_model_manager
+from translator.pipeline import TranslationPipeline
+from translator.translation_memory import get_translation_memory
+from translator.worker_pool import get_worker_pool
+
+logger = logging.getLogger(__name__)
+
+# 预热状态
+WARMUP_LOADING = "loading"
+WARMUP_WARMING = "warming"
+WARMUP_READY = "ready"
+WARMUP_FAILED = "failed"
+
+LANGUAGE_NAMES = {code: name for name, code in LANGUAGES.items()}
+
+
+def format_multi_target(translations):
+    """将 目标语言 -> 译文 的结果合并为带语言标题的文本"""
+    return "\n\n".join(
+        TEXT_TARGET_SECTION.format(LANGUAGE_NAMES.get(lang, lang)) + "\n" + text
+        for lang, text in translations.items()
+    )
+
+
+class ModelWarmupThread(QThread):
+    """后台线程，在窗口显示后预加载模型并执行一次预热推理"""
+
+    warmup_state = pyqtSignal(str)
+
+    def run(self):
+        manager = get_model_manager()
+        try:
+            if not manager.is_loaded:
+                self.warmup_state.emit(WARMUP_LOADING)
+                manager.load()
+            self.warmup_state.emit(WARMUP_WARMING)
+            manager.warmup()
+            # 启用多进程推理时同时启动推理进程
+            get_worker_pool()
+            self.warmup_state.emit(WARMUP_READY)
+        except Exception as e:
+            logger.warning("模型预热失败: %s", e)
+            self.warmup_state.emit(WARMUP_FAILED)
 
 
 class TranslationThread(QThread):
-    """线程类用于执行翻译任务，避免UI卡顿"""
+    """
+    线程类用于执行翻译任务，避免UI卡顿
+
+    target_lang为语言代码列表时，在同一轮批量生成中翻译为所有这些语言
+    """
 
     translation_done = pyqtSignal(str)
     progress_update = pyqtSignal(int)
-
-    def __init__(self, text, target_lang):
+    # 流式模式下逐步发出当前已得到的部分译文
+    partial_translation = pyqtSignal(str)
+    # 翻译结束后发出各阶段耗时明细
+    timing_report = pyqtSignal(str)
+    # 翻译被取消后发出
+    translation_cancelled = pyqtSignal()
+
+    def __init__(
+        self,
+        text,
+        target_lang,
+        source_lang=None,
+        decoding_preset=DEFAULT_DECODING_PRESET,
+        live_session=None,
+    ):
         super().__init__()
         self.text = text
         self.target_lang = target_lang
-        self.formatter = TextFormatter()
+        self.source_lang = source_lang
+        self.decoding_preset = decoding_preset
+        # 实时翻译会话，给出时只重新翻译与上一次相比有变化的句子
+        self.live_session = live_session
+        self.cancel_token = CancellationToken()
+
+    def cancel(self):
+        """请求取消翻译，生成会在下一个解码步停止，线程随后尽快结束"""
+        self.cancel_token.cancel()
 
     def run(self):
+        trace = Trace(
+            "gui",
+            target_lang=self.target_lang,
+            source_lang=self.source_lang,
+            preset=self.decoding_preset,
+            live=self.live_session is not None,
+        )
+        with trace:
+            self._run(trace)
+        # 状态栏显示本次翻译各阶段的耗时
+        self.timing_report.emit(format_breakdown(trace.record))
+
+    def _run(self, trace):
         try:
             # 更新进度条 - 开始加载模型
             self.progress_update.emit(10)
 
-            # 加载模型和分词器 - 优先使用本地模型
-            if USE_LOCAL_MODEL:
+            # 获取常驻模型，只有首次翻译时才会真正加载
+            manager = get_model_manager()
+            if not manager.is_loaded:
                 self.progress_update.emit(20)
-                # 直接从本地模型目录加载
-                model = T5ForConditionalGeneration.from_pretrained(MODEL_PATH)
-                self.progress_update.emit(50)
-                tokenizer = T5Tokenizer.from_pretrained(MODEL_PATH)
-            else:
-                # 如果本地模型不存在，则从在线加载
-                model = T5ForConditionalGeneration.from_pretrained(MODEL_NAME)
-                self.progress_update.emit(50)
-                tokenizer = T5Tokenizer.from_pretrained(MODEL_NAME)
-
-                # 保存模型到本地以便下次使用
-                try:
-                    os.makedirs(MODEL_PATH, exist_ok=True)
-                    model.save_pretrained(MODEL_PATH)
-                    tokenizer.save_pretrained(MODEL_PATH)
-                except Exception as e:
-                    print(f"保存模型到本地时出错: {str(e)}")
+            with trace.span("model"):
+                model, tokenizer = manager.load()
+                pool = get_worker_pool()
 
+            # 加载模型期间可能已被取消
+            self.cancel_token.raise_if_cancelled()
             self.progress_update.emit(70)
 
-            # 准备输入
-            # 限制输入文本长度，避免超出模型处理能力
-            if len(self.text) > MAX_INPUT_LENGTH:
-                processed_text = self.text[:MAX_INPUT_LENGTH] + "..."
-                print(f"输入文本过长，已截断到{MAX_INPUT_LENGTH}字符")
-            else:
-                processed_text = self.text
-
-            # 对特殊组合词进行处理，避免被拆分
-            import re
-
-            processed_text = re.sub(r"(\w+)-(\w+)", r'"\1-\2"', processed_text)
-
-            prefix = f"translate to {self.target_lang}: "
-            src_text = prefix + processed_text
-
-            # 添加调试信息
-            print(f"输入文本长度: {len(src_text)}")
-            print(f"输入文本: {src_text[:200]}...")  # 只打印前200个字符
-
-            # 分词和生成翻译
-            input_ids = tokenizer(
-                src_text, return_tensors="pt", max_length=512, truncation=True
+            # 每个非空行再按句子切分为适合模型窗口的片段，在同一轮批量生成中翻译，
+            # 译文按原始的缩进、空行和换行符逐行重组
+            memory = get_translation_memory() if ENABLE_TRANSLATION_MEMORY else None
+            pipeline = TranslationPipeline(
+                model,
+                tokenizer,
+                batch_size=manager.batch_size,
+                memory=memory,
+                decoding_preset=self.decoding_preset,
+                cancel_token=self.cancel_token,
+                preserve_layout=ENABLE_LAYOUT_PRESERVATION,
+                pool=pool,
             )
-            print(f"输入token数量: {input_ids['input_ids'].shape[1]}")
-            self.progress_update.emit(80)
-
-            # 使用模型默认参数，避免过度配置
-            generated_tokens = model.generate(**input_ids)
-            self.progress_update.emit(90)
-
-            # 解码结果
-            result = tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)
-            translated_text = result[0] if result else "翻译失败"
-
-            # 添加调试信息
-            print(f"生成的token数量: {generated_tokens.shape[1]}")
-            print(
-                f"新生成的token数量: {generated_tokens.shape[1] - input_ids['input_ids'].shape[1]}"
-            )
-            print(f"原始翻译结果: {translated_text}")
-            print(f"翻译结果长度: {len(translated_text)}")
-
-            # 移除输入前缀（如果存在）
-            if translated_text.startswith(prefix):
-                translated_text = translated_text[len(prefix) :].strip()
-                print(f"移除前缀后: {translated_text}")
+            trace.count("input_chars", len(self.text))
+
+            def on_progress(done, total):
+                # 已解码token数相对估算输出token数的比例映射到70%-99%
+                self.progress_update.emit(70 + int(29 * done / max(total, 1)))
+
+            if self.live_session is not None:
+                translated_text = self._translate_live(pipeline, on_progress)
+            elif isinstance(self.target_lang, str):
+                translated_text = pipeline.translate(
+                    self.text,
+                    self.target_lang,
+                    on_progress,
+                    self.partial_translation.emit if ENABLE_STREAMING else None,
+                    self.source_lang,
+                )
+            else:
 
-            # 禁用格式恢复，直接使用翻译结果
-            # if translated_text != "翻译失败":
-            #     formatted_translation = self.formatter.restore_format(translated_text)
-            #     print(f"恢复格式后: {formatted_translation}")
-            # else:
-            #     formatted_translation = translated_text
+                def on_partial(translations):
+                    self.partial_translation.emit(format_multi_target(translations))
+
+                translations = pipeline.translate_multi(
+                    self.text,
+                    self.target_lang,
+                    on_progress,
+                    on_partial if ENABLE_STREAMING else None,
+                    self.source_lang,
+                )
+                if any(text.strip() for text in translations.values()):
+                    translated_text = format_multi_target(translations)
+                else:
+                    translated_text = ""
+            if not translated_text.strip():
+                translated_text = "翻译失败"
+            trace.count("output_chars", len(translated_text))
 
             # 发送翻译完成信号
             self.progress_update.emit(100)
             self.translation_done.emit(translated_text)
 
+        except TranslationCancelled:
+            trace.status = "cancelled"
+            self.translation_cancelled.emit()
         except Exception as e:
+            trace.fail(e)
             self.translation_done.emit(f"翻译出错: {str(e)}")
             self.progress_update.emit(0)
+
+    def _translate_live(self, pipeline, on_progress):
+        """通过实时翻译会话翻译，未变化的句子直接复用上一次的译文"""
+        single = isinstance(self.target_lang, str)
+        target_langs = [self.target_lang] if single else list(self.target_lang)
+
+        def format_result(translations):
+            if single:
+                return translations[self.target_lang]
+            return format_multi_target(translations)
+
+        def on_partial(translations):
+            self.partial_translation.emit(format_result(translations))
+
+        translations = self.live_session.translate(
+            pipeline,
+            self.text,
+            target_langs,
+            on_progress,
+            on_partial if ENABLE_STREAMING else None,
+            self.source_lang,
+        )
+        if not any(text.strip() for text in translations.values()):
+            return ""
+        return format_result(translations)
@@ -3,10 +3,11 @@
 包含主窗口和UI逻辑
 """
 
-from PyQt6.QtCore import QPoint, Qt
+from PyQt6.QtCore import QPoint, Qt, QTimer
 from PyQt6.QtGui import QIcon
 from PyQt6.QtWidgets import (
     QApplication,
+    QCheckBox,
     QComboBox,
     QGroupBox,
     QHBoxLayout,
@@ -27,33 +28,61 @@ from translator.config import (
     APP_MIN_WIDTH,
     APP_TITLE,
     APP_WIDTH,
+    AUTO_DETECT_SOURCE_LANG,
+    CLOSE_WARMUP_WAIT_MS,
+    DECODING_PRESET_NAMES,
+    DEFAULT_DECODING_PRESET,
     LANGUAGES,
+    LIVE_TRANSLATION_DEBOUNCE_MS,
     MAX_INPUT_LENGTH,
+    TEXT_ALL_TARGETS,
+    TEXT_ALL_TARGETS_TOOLTIP,
+    TEXT_CANCEL,
     TEXT_CLEAR,
     TEXT_COPIED,
     TEXT_COPY_TOOLTIP,
+    TEXT_DECODING_PRESET,
+    TEXT_DECODING_PRESET_TOOLTIP,
     TEXT_EMPTY_INPUT,
     TEXT_INPUT,
     TEXT_INPUT_LENGTH_INFO,
     TEXT_INPUT_LENGTH_WARNING,
     TEXT_INPUT_PLACEHOLDER,
     TEXT_INPUT_TOO_LONG,
+    TEXT_LIVE_TRANSLATION,
+    TEXT_LIVE_TRANSLATION_TOOLTIP,
+    TEXT_MODEL_LOAD_FAILED,
+    TEXT_MODEL_LOADING,
+    TEXT_MODEL_READY,
+    TEXT_MODEL_WARMING_UP,
     TEXT_OUTPUT,
     TEXT_OUTPUT_PLACEHOLDER,
     TEXT_PREPARING,
     TEXT_PROGRESS,
     TEXT_READY,
     TEXT_SOURCE_LANG,
+    TEXT_SOURCE_LANG_TOOLTIP,
     TEXT_TARGET_LANG,
     TEXT_THEME_TOOLTIP,
     TEXT_TRANSLATE,
     TEXT_TRANSLATING,
+    TEXT_TRANSLATION_CANCELLED,
     TEXT_TRANSLATION_COMPLETE,
     TEXT_TRANSLATION_FAILED,
     TEXT_WARNING,
 )
+from translator.language_detection import detect_language
+from translator.live import IncrementalTranslator
 from translator.themes import apply_dark_theme, apply_light_theme
-from translator.translation_thread import TranslationThread
+from translator.translation_thread import (
+    WARMUP_FAILED,
+    WARMUP_LOADING,
+    WARMUP_READY,
+    WARMUP_WARMING,
+    ModelWarmupThread,
+    TranslationThread,
+)
+from translator.worker_pool import shutdown_worker_pool
 
 
 # 自定义ComboBox类，强制下拉菜单始终向下展开
@@ -106,8 +135,18 @@ class TranslatorApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.is_dark_theme = False  # 默认使用亮色主题
+        # 实时翻译的逐句译文，跨多次翻译复用
+        self.live_session = IncrementalTranslator()
+        # 实时翻译防抖：停止输入一段时间后才开始翻译
+        self.live_timer = QTimer()
+        self.live_timer.setSingleShot(True)
+        self.live_timer.setInterval(LIVE_TRANSLATION_DEBOUNCE_MS)
+        self.live_timer.timeout.connect(self.start_live_translation)
         self.initUI()
         self.translation_thread = None
+        # 已取消但尚未结束的翻译线程，结束前需保留引用
+        self.retired_threads = []
+        self.warmup_thread = None
 
     def initUI(self):
         # 设置窗口
@@ -151,6 +190,10 @@ class TranslatorApp(QMainWindow):
             self.source_lang_combo.addItem(f"{lang} ({code})")
         # 设置默认源语言为英文
         self.source_lang_combo.setCurrentText("英文 (en)")
+        # 输入时自动识别源语言，用户手动选择后不再自动切换
+        self.source_lang_combo.setToolTip(TEXT_SOURCE_LANG_TOOLTIP)
+        self.source_lang_chosen = False
+        self.source_lang_combo.activated.connect(self.choose_source_language)
         source_lang_layout.addWidget(self.source_lang_label)
         source_lang_layout.addWidget(self.source_lang_combo)
         source_lang_layout.addStretch(1)
@@ -160,12 +203,22 @@ class TranslatorApp(QMainWindow):
         self.input_text = QTextEdit()
         self.input_text.setPlaceholderText(TEXT_INPUT_PLACEHOLDER)
         self.input_text.textChanged.connect(self.update_character_count)
+        self.input_text.textChanged.connect(self.detect_source_language)
+        self.input_text.textChanged.connect(self.schedule_live_translation)
         left_layout.addWidget(self.input_text)
 
         # 字符计数标签
         self.char_count_label = QLabel(TEXT_INPUT_LENGTH_INFO.format(0))
         self.char_count_label.setStyleSheet("color: gray; font-size: 10px;")
-        left_layout.addWidget(self.char_count_label)
+        # 实时翻译开关
+        self.live_checkbox = QCheckBox(TEXT_LIVE_TRANSLATION)
+        self.live_checkbox.setToolTip(TEXT_LIVE_TRANSLATION_TOOLTIP)
+        self.live_checkbox.toggled.connect(self.toggle_live_translation)
+        count_layout = QHBoxLayout()
+        count_layout.addWidget(self.char_count_label)
+        count_layout.addStretch(1)
+        count_layout.addWidget(self.live_checkbox)
+        left_layout.addLayout(count_layout)
 
         # 添加左侧布局到内容布局
         content_layout.addWidget(left_group)
@@ -202,6 +255,14 @@ class TranslatorApp(QMainWindow):
         self.translate_button.clicked.connect(self.start_translation)
         middle_layout.addWidget(self.translate_button, 0, Qt.AlignmentFlag.AlignCenter)
 
+        # 取消按钮，仅在翻译进行中可用
+        self.cancel_button = QPushButton(TEXT_CANCEL)
+        self.cancel_button.setFixedWidth(80)
+        self.cancel_button.setFixedHeight(32)
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_translation)
+        middle_layout.addWidget(self.cancel_button, 0, Qt.AlignmentFlag.AlignCenter)
+
         # 清除按钮
         self.clear_button = QPushButton(TEXT_CLEAR)
         self.clear_button.setFixedWidth(80)  # 减小宽度
@@ -229,7 +290,24 @@ class TranslatorApp(QMainWindow):
         self.target_lang_combo.setCurrentText("中文 (zh)")
         target_lang_layout.addWidget(self.target_lang_label)
         target_lang_layout.addWidget(self.target_lang_combo)
+        # 多目标模式：一次翻译为除源语言外的所有语言
+        self.all_targets_checkbox = QCheckBox(TEXT_ALL_TARGETS)
+        self.all_targets_checkbox.setToolTip(TEXT_ALL_TARGETS_TOOLTIP)
+        self.all_targets_checkbox.toggled.connect(
+            lambda checked: self.target_lang_combo.setEnabled(not checked)
+        )
+        target_lang_layout.addWidget(self.all_targets_checkbox)
         target_lang_layout.addStretch(1)
+
+        # 解码预设选择：速度与质量的取舍
+        self.preset_label = QLabel(TEXT_DECODING_PRESET)
+        self.preset_combo = DownComboBox()
+        for preset, name in DECODING_PRESET_NAMES.items():
+            self.preset_combo.addItem(name, preset)
+        self.preset_combo.setCurrentText(DECODING_PRESET_NAMES[DEFAULT_DECODING_PRESET])
+        self.preset_combo.setToolTip(TEXT_DECODING_PRESET_TOOLTIP)
+        target_lang_layout.addWidget(self.preset_label)
+        target_lang_layout.addWidget(self.preset_combo)
         right_layout.addLayout(target_lang_layout)
 
         # 输出文本区域和复制按钮的容器
@@ -274,6 +352,11 @@ class TranslatorApp(QMainWindow):
         self.status_label = QLabel(TEXT_READY)
         status_layout.addWidget(self.status_label)
 
+        # 上一次翻译的各阶段耗时明细
+        self.timing_label = QLabel("")
+        self.timing_label.setStyleSheet("color: gray; font-size: 10px;")
+        status_layout.addWidget(self.timing_label)
+
         status_layout.addStretch(1)
 
         # 进度条
@@ -290,6 +373,28 @@ class TranslatorApp(QMainWindow):
 
         main_layout.addLayout(status_layout)
 
+    def start_warmup(self):
+        """在后台预加载并预热模型，应在窗口显示之后调用"""
+        if self.warmup_thread is not None:
+            return
+        self.warmup_thread = ModelWarmupThread()
+        self.warmup_thread.warmup_state.connect(self.update_warmup_state)
+        self.warmup_thread.start()
+
+    def update_warmup_state(self, state):
+        """在状态栏显示模型预热状态"""
+        # 翻译进行中时不覆盖翻译状态
+        if self.translation_thread is not None and self.translation_thread.isRunning():
+            return
+
+        status_texts = {
+            WARMUP_LOADING: TEXT_MODEL_LOADING,
+            WARMUP_WARMING: TEXT_MODEL_WARMING_UP,
+            WARMUP_READY: TEXT_MODEL_READY,
+            WARMUP_FAILED: TEXT_MODEL_LOAD_FAILED,
+        }
+        self.status_label.setText(status_texts.get(state, TEXT_READY))
+
     def update_character_count(self):
         """更新字符计数显示"""
         text = self.input_text.toPlainText()
@@ -308,15 +413,57 @@ class TranslatorApp(QMainWindow):
         else:
             self.char_count_label.setStyleSheet("color: gray; font-size: 10px;")
 
-    def start_translation(self):
+    def choose_source_language(self):
+        """用户手动选择了源语言，之后不再自动识别"""
+        self.source_lang_chosen = True
+
+    def detect_source_language(self):
+        """根据输入文本自动选择源语言，清空输入后恢复自动识别"""
+        if not AUTO_DETECT_SOURCE_LANG:
+            return
+        text = self.input_text.toPlainText()
+        if not text.strip():
+            self.source_lang_chosen = False
+            return
+        if self.source_lang_chosen:
+            return
+        codes = list(LANGUAGES.values())
+        lang = detect_language(text)
+        if lang in codes:
+            self.source_lang_combo.setCurrentIndex(codes.index(lang))
+
+    def toggle_live_translation(self, checked):
+        """开启实时翻译时立即翻译当前输入，关闭时停止等待中的自动翻译"""
+        if checked:
+            self.schedule_live_translation()
+        else:
+            self.live_timer.stop()
+            self.live_session.reset()
+
+    def schedule_live_translation(self):
+        """输入变化时重新开始防抖计时，连续输入期间不会触发翻译"""
+        if self.live_checkbox.isChecked():
+            self.live_timer.start()
+
+    def start_live_translation(self):
+        """实时模式下自动翻译，取代仍在进行的上一次翻译"""
+        if not self.input_text.toPlainText().strip():
+            self.cancel_translation()
+            self.output_text.clear()
+            self.status_label.setText(TEXT_READY)
+            return
+        self.start_translation(live=True)
+
+    def start_translation(self, live=False):
         # 获取输入文本
-        text = self.input_text.toPlainText().strip()
-        if not text:
+        # 保留首尾空白，译文按原始排版重组
+        text = self.input_text.toPlainText()
+        if not text.strip():
             QMessageBox.warning(self, TEXT_WARNING, TEXT_EMPTY_INPUT)
             return
 
-        # 检查文本长度
-        if len(text) > MAX_INPUT_LENGTH:
+        # 检查文本长度，实时模式下不弹窗打断输入
+        if len(text) > MAX_INPUT_LENGTH and not live:
             reply = QMessageBox.question(
                 self,
                 TEXT_INPUT_TOO_LONG,
@@ -329,22 +476,99 @@ class TranslatorApp(QMainWindow):
 
         # 获取目标语言代码
         target_lang = self.target_lang_combo.currentText().split("(")[1].strip(")")
+        source_lang = self.source_lang_combo.currentText().split("(")[1].strip(")")
+        preset = self.preset_combo.currentData()
+        if self.all_targets_checkbox.isChecked():
+            target_lang = [code for code in LANGUAGES.values() if code != source_lang]
+
+        # 再次翻译时取代仍在进行的旧翻译，旧翻译在下一个解码步停止
+        self.retire_translation_thread()
 
         # 更新状态
         self.status_label.setText(TEXT_PREPARING)
-
-        # 禁用翻译按钮，避免重复点击
-        self.translate_button.setEnabled(False)
         self.progress_bar.setValue(0)
+        self.cancel_button.setEnabled(True)
 
         # 创建并启动翻译线程
-        self.translation_thread = TranslationThread(text, target_lang)
-        self.translation_thread.translation_done.connect(self.update_translation)
-        self.translation_thread.progress_update.connect(self.update_progress)
-        self.translation_thread.finished.connect(
-            lambda: self.translate_button.setEnabled(True)
+        thread = TranslationThread(
+            text,
+            target_lang,
+            source_lang,
+            preset,
+            self.live_session if self.live_checkbox.isChecked() else None,
         )
-        self.translation_thread.start()
+        thread.translation_done.connect(self.update_translation)
+        thread.partial_translation.connect(self.update_partial_translation)
+        thread.progress_update.connect(self.update_progress)
+        thread.timing_report.connect(self.timing_label.setText)
+        thread.finished.connect(lambda: self.on_translation_finished(thread))
+        self.translation_thread = thread
+        thread.start()
+
+    def retire_translation_thread(self):
+        """
+        取消当前翻译线程并断开它与界面的连接，使其后续的信号不再更新界面；
+        线程结束前保留引用，避免QThread在运行中被销毁
+
+        Returns:
+            bool: 是否有正在进行的翻译被取消
+        """
+        thread = self.translation_thread
+        self.translation_thread = None
+        if thread is None or thread.isFinished():
+            return False
+        for signal in (
+            thread.translation_done,
+            thread.partial_translation,
+            thread.progress_update,
+            thread.timing_report,
+        ):
+            signal.disconnect()
+        thread.cancel()
+        self.retired_threads.append(thread)
+        return True
+
+    def cancel_translation(self):
+        """取消正在进行的翻译"""
+        if self.retire_translation_thread():
+            self.status_label.setText(TEXT_TRANSLATION_CANCELLED)
+            self.progress_bar.setValue(0)
+        self.cancel_button.setEnabled(False)
+
+    def closeEvent(self, event):
+        """
+        关闭窗口时取消进行中的翻译，并等待线程在下一个解码步退出；
+        模型加载无法中途停止，后台预热线程短时间内未结束时先隐藏窗口、暂不关闭，
+        加载结束后再关闭，既不卡住界面，也避免QThread在运行中被销毁
+        """
+        self.live_timer.stop()
+        self.retire_translation_thread()
+        for thread in list(self.retired_threads):
+            thread.wait(2000)
+        warmup_thread = self.warmup_thread
+        if (
+            warmup_thread is not None
+            and warmup_thread.isRunning()
+            and not warmup_thread.wait(CLOSE_WARMUP_WAIT_MS)
+        ):
+            warmup_thread.warmup_state.disconnect()
+            warmup_thread.finished.connect(self.finish_deferred_close)
+            self.hide()
+            event.ignore()
+            return
+        shutdown_worker_pool()
+        super().closeEvent(event)
+
+    def finish_deferred_close(self):
+        """模型加载结束后完成之前推迟的关闭；窗口已隐藏，关闭它不会再触发退出，需显式退出"""
+        self.close()
+        QApplication.quit()
+
+    def on_translation_finished(self, thread):
+        if thread in self.retired_threads:
+            self.retired_threads.remove(thread)
+        if thread is self.translation_thread:
+            self.cancel_button.setEnabled(False)
 
     def update_translation(self, text):
         self.output_text.setText(text)
@@ -354,6 +578,10 @@ class TranslatorApp(QMainWindow):
         else:
             self.status_label.setText(TEXT_TRANSLATION_COMPLETE)
 
+    def update_partial_translation(self, text):
+        """流式显示尚未完成的译文"""
+        self.output_text.setPlainText(text)
+
     def update_progress(self, value):
         self.progress_bar.setValue(value)
         # 根据进度更新状态标签
@@ -365,6 +593,8 @@ class TranslatorApp(QMainWindow):
             self.status_label.setText(TEXT_TRANSLATION_COMPLETE)
 
     def clear_text(self):
+        self.live_timer.stop()
+        self.cancel_translation()
         self.input_text.clear()
         self.output_text.clear()
         self.progress_bar.setValue(0)
@@ -0,0 +1,395 @@
+"""
+CPU线程自动调优模块
+在本机上对已加载的模型测量不同线程数、批大小以及是否绑定物理核心时的吞吐，
+将最佳配置保存为性能配置文件，模型加载时自动应用
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from typing import Callable, List, Optional, Sequence
+
+from translator.config import (
+    PERFORMANCE_PROFILE_PATH,
+    TUNING_BATCH_SIZES,
+    TUNING_THREAD_TOLERANCE,
+)
+from translator.file_utils import atomic_output
+from translator.quantization import REFERENCE_CORPUS
+from translator.translation_memory import DEFAULT_MODEL_KEY
+
+logger = logging.getLogger(__name__)
+
+# 配置文件格式版本，格式变化时递增使旧配置失效
+PROFILE_FORMAT_VERSION = 1
+# 绑定物理核心至少快这么多才采用，避免测量噪声导致无谓的绑定
+PINNING_MIN_GAIN = 1.03
+
+
+def available_cpus() -> List[int]:
+    """当前进程允许使用的逻辑CPU编号"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def physical_core_cpus(cpus: Sequence[int]) -> List[int]:
+    """
+    每个物理核心只保留一个逻辑CPU（去掉超线程兄弟），
+    无法读取CPU拓扑时原样返回
+    """
+    selected = []
+    seen_cores = set()
+    for cpu in cpus:
+        topology = f"/sys/devices/system/cpu/cpu{cpu}/topology"
+        try:
+            with open(os.path.join(topology, "physical_package_id")) as f:
+                package = f.read().strip()
+            with open(os.path.join(topology, "core_id")) as f:
+                core = f.read().strip()
+        except OSError:
+            return list(cpus)
+        if (package, core) not in seen_cores:
+            seen_cores.add((package, core))
+            selected.append(cpu)
+    return selected
+
+
+def candidate_thread_counts(max_threads: int) -> List[int]:
+    """候选线程数：不超过max_threads的2的幂，以及max_threads本身和3/4"""
+    counts = {max_threads, max(1, max_threads * 3 // 4)}
+    count = 1
+    while count < max_threads:
+        counts.add(count)
+        count *= 2
+    return sorted(counts)
+
+
+def set_process_affinity(cpus: Sequence[int]) -> bool:
+    """将进程内所有线程绑定到指定CPU，平台不支持时返回False"""
+    if not hasattr(os, "sched_setaffinity"):
+        return False
+    cpus = set(cpus)
+    try:
+        # Linux上sched_setaffinity只作用于单个线程，已创建的线程需逐个设置
+        thread_ids = [int(tid) for tid in os.listdir("/proc/self/task")]
+    except OSError:
+        thread_ids = [0]
+    for thread_id in thread_ids:
+        try:
+            os.sched_setaffinity(thread_id, cpus)
+        except OSError:
+            pass
+    return True
+
+
+# 进程启动时允许使用的CPU，应用配置中的CPU绑定后仍以此作为机器信息
+_PROCESS_CPUS = available_cpus()
+
+
+def partition_cpus(parts: int, cpus: Optional[Sequence[int]] = None) -> List[List[int]]:
+    """
+    将CPU平分为parts组供多个推理进程独占，优先使用物理核心（不含超线程兄弟），
+    物理核心少于组数时使用全部逻辑CPU
+
+    Args:
+        parts: 组数
+        cpus: 可用的逻辑CPU，默认为进程启动时允许使用的CPU
+
+    Returns:
+        List[List[int]]: 每组的CPU编号，CPU少于组数时部分组共用CPU
+    """
+    cpus = list(_PROCESS_CPUS if cpus is None else cpus)
+    physical = physical_core_cpus(cpus)
+    if len(physical) >= parts:
+        cpus = physical
+    if len(cpus) < parts:
+        return [[cpus[i % len(cpus)]] for i in range(parts)]
+    size, extra = divmod(len(cpus), parts)
+    groups = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        groups.append(cpus[start:end])
+        start = end
+    return groups
+
+
+def machine_signature(backend: str) -> dict:
+    """描述当前机器和模型的信息，任何一项变化都会使已保存的配置失效"""
+    import torch
+
+    cpus = _PROCESS_CPUS
+    return {
+        "cpus": cpus,
+        "physical_cores": len(physical_core_cpus(cpus)),
+        "torch": torch.__version__,
+        "model": DEFAULT_MODEL_KEY,
+        "backend": backend,
+    }
+
+
+def load_profile(backend: str, path: str = PERFORMANCE_PROFILE_PATH) -> Optional[dict]:
+    """读取性能配置文件，不存在或与当前机器、模型不匹配时返回None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("读取性能配置文件失败: %s", e)
+        return None
+    if profile.get("format") != PROFILE_FORMAT_VERSION:
+        return None
+    if profile.get("machine") != machine_signature(backend):
+        logger.warning("性能配置文件与当前机器或模型不匹配，已忽略，可重新运行调优")
+        return None
+    return profile
+
+
+def save_profile(profile: dict, path: str = PERFORMANCE_PROFILE_PATH):
+    with atomic_output(path) as temp_path:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(profile, f, ensure_ascii=False, indent=2)
+
+
+def apply_thread_settings(intra_op_threads: int, inter_op_threads: int = 1):
+    """设置torch的算子内和算子间线程数"""
+    import torch
+
+    torch.set_num_threads(max(1, intra_op_threads))
+    try:
+        torch.set_num_interop_threads(max(1, inter_op_threads))
+    except RuntimeError:
+        # 算子间线程数只能在首次并行计算之前设置一次
+        pass
+
+
+def apply_profile(backend: str, path: str = PERFORMANCE_PROFILE_PATH) -> Optional[dict]:
+    """
+    读取并应用性能配置文件中的线程数和CPU绑定
+
+    Returns:
+        Optional[dict]: 已应用的配置，没有可用配置时为None
+    """
+    profile = load_profile(backend, path)
+    if profile is None:
+        return None
+    apply_thread_settings(profile["intra_op_threads"], profile["inter_op_threads"])
+    if profile.get("affinity"):
+        set_process_affinity(profile["affinity"])
+    return profile
+
+
+def _tuning_segments(count: int) -> List[tuple]:
+    """从固定语料中循环取出count个(目标语言, 原文)"""
+    return [REFERENCE_CORPUS[i % len(REFERENCE_CORPUS)] for i in range(count)]
+
+
+def measure_throughput(model, tokenizer, batch_size: int, repeats: int = 2) -> dict:
+    """
+    测量给定批大小下的吞吐（片段/秒），取多次运行的中位数
+
+    Returns:
+        dict: seconds和segments_per_second
+    """
+    from translator.pipeline import TranslationPipeline
+
+    pipeline = TranslationPipeline(model, tokenizer, batch_size=batch_size)
+    corpus = _tuning_segments(max(len(REFERENCE_CORPUS), batch_size * 2))
+    segments = [text for _, text in corpus]
+    target_langs = [target_lang for target_lang, _ in corpus]
+
+    # 第一次运行包含内存分配等一次性开销，不计入结果
+    pipeline.generate_batched(segments[:batch_size], target_langs[:batch_size])
+    timings = []
+    for _ in range(max(1, repeats)):
+        started = time.perf_counter()
+        pipeline.generate_batched(segments, target_langs)
+        timings.append(time.perf_counter() - started)
+    seconds = statistics.median(timings)
+    return {
+        "seconds": round(seconds, 4),
+        "segments_per_second": round(len(segments) / seconds, 3) if seconds else 0.0,
+    }
+
+
+def tune(
+    model,
+    tokenizer,
+    backend: str,
+    thread_counts: Optional[List[int]] = None,
+    batch_sizes: Sequence[int] = TUNING_BATCH_SIZES,
+    repeats: int = 2,
+    model_factory: Optional[Callable[[int], object]] = None,
+    log: Callable[[str], None] = print,
+) -> dict:
+    """
+    在本机上搜索最佳的线程数、批大小和CPU绑定
+
+    Args:
+        model: 已加载的模型
+        tokenizer: 分词器
+        backend: 模型对应的推理后端
+        thread_counts: 候选线程数，默认按物理核心数生成
+        batch_sizes: 候选批大小
+        repeats: 每个组合的重复次数
+        model_factory: 线程数需要在创建时指定的后端（如ONNX）用它按线程数重建模型
+        log: 输出测量进度的函数
+
+    Returns:
+        dict: 性能配置（尚未保存）
+    """
+    cpus = available_cpus()
+    physical = physical_core_cpus(cpus)
+    if not thread_counts:
+        thread_counts = candidate_thread_counts(len(physical))
+
+    def configure(threads):
+        apply_thread_settings(threads)
+        return model_factory(threads) if model_factory is not None else model
+
+    results = []
+    for threads in thread_counts:
+        threads_model = configure(threads)
+        for batch_size in batch_sizes:
+            result = measure_throughput(threads_model, tokenizer, batch_size, repeats)
+            result.update(threads=threads, batch_size=batch_size, pinned=False)
+            results.append(result)
+            log(
+                f"线程 {threads:>3}  批大小 {batch_size:>3}  "
+                f"{result['segments_per_second']:.2f} 片段/秒"
+            )
+
+    # 吞吐接近最佳时优先选择更少的线程和更小的批
+    best_rate = max(r["segments_per_second"] for r in results)
+    best = min(
+        (
+            r
+            for r in results
+            if r["segments_per_second"] >= best_rate * TUNING_THREAD_TOLERANCE
+        ),
+        key=lambda r: (r["threads"], r["batch_size"]),
+    )
+
+    affinity = None
+    if len(physical) < len(cpus) and best["threads"] <= len(physical):
+        # 有超线程时，测试把线程绑定到不同的物理核心上是否更快
+        pinned_cpus = physical[: best["threads"]]
+        threads_model = configure(best["threads"])
+        set_process_affinity(pinned_cpus)
+        try:
+            pinned = measure_throughput(
+                threads_model, tokenizer, best["batch_size"], repeats
+            )
+        finally:
+            set_process_affinity(cpus)
+        pinned.update(threads=best["threads"], batch_size=best["batch_size"])
+        pinned["pinned"] = True
+        results.append(pinned)
+        log(f"绑定物理核心 {pinned['segments_per_second']:.2f} 片段/秒")
+        if pinned["segments_per_second"] >= (
+            best["segments_per_second"] * PINNING_MIN_GAIN
+        ):
+            affinity = pinned_cpus
+
+    return {
+        "format": PROFILE_FORMAT_VERSION,
+        "machine": machine_signature(backend),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "intra_op_threads": best["threads"],
+        # 逐token生成几乎没有可并行的独立算子，算子间线程只会争抢核心
+        "inter_op_threads": 1,
+        "batch_size": best["batch_size"],
+        "affinity": affinity,
+        "results": results,
+    }
+
+
+def _parse_int_list(value: str) -> List[int]:
+    try:
+        numbers = [int(part) for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"应为逗号分隔的整数: {value}")
+    if not numbers or min(numbers) < 1:
+        raise argparse.ArgumentTypeError(f"应为正整数: {value}")
+    return numbers
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from translator.model_manager import BACKEND_ONNX, BACKENDS, get_model_manager
+
+    parser = argparse.ArgumentParser(
+        prog="python -m translator.tuning",
+        description="在本机测量最佳的推理线程数、批大小和CPU绑定",
+    )
+    parser.add_argument(
+        "--backend", choices=BACKENDS, help="推理后端，默认使用配置中的后端"
+    )
+    parser.add_argument(
+        "--threads", type=_parse_int_list, help="候选线程数，如 1,2,4,8"
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        type=_parse_int_list,
+        default=list(TUNING_BATCH_SIZES),
+        help="候选批大小，如 1,4,8,16",
+    )
+    parser.add_argument("--repeats", type=int, default=2, help="每个组合的重复次数")
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=PERFORMANCE_PROFILE_PATH,
+        help=f"配置文件路径（默认 {PERFORMANCE_PROFILE_PATH}）",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="只输出结果，不保存配置文件"
+    )
+    args = parser.parse_args(argv)
+
+    manager = get_model_manager()
+    if args.backend:
+        manager.set_backend(args.backend)
+    # 调优时不能受旧配置的线程数和CPU绑定影响
+    manager.use_performance_profile = False
+    model, tokenizer = manager.load()
+    backend = manager.active_backend
+
+    model_factory = None
+    if backend == BACKEND_ONNX:
+        from translator.onnx_backend import OnnxT5Model
+
+        def model_factory(threads):
+            # ONNX Runtime的线程数只能在创建会话时指定
+            return OnnxT5Model(num_threads=threads)
+
+    profile = tune(
+        model,
+        tokenizer,
+        backend,
+        args.threads,
+        args.batch_sizes,
+        args.repeats,
+        model_factory,
+        log=lambda message: print(message, file=sys.stderr),
+    )
+    print(
+        f"最佳配置: 线程 {profile['intra_op_threads']}, "
+        f"批大小 {profile['batch_size']}, "
+        f"CPU绑定 {profile['affinity'] or '无'}",
+        file=sys.stderr,
+    )
+    if args.dry_run:
+        print(json.dumps(profile, ensure_ascii=False, indent=2))
+    else:
+        save_profile(profile, args.output)
+        print(f"性能配置已保存到 {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
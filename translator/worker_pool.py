@@ -0,0 +1,437 @@
+"""
+多进程推理模块
+启动多个推理进程，每个进程独占一部分CPU核心并持有一份模型（fp32的PyTorch后端下权重通过
+内存映射共享，不会占用多份物理内存；int8量化或ONNX后端下每个进程各有一份权重），
+片段按批放入共享队列，由空闲的进程取走生成。
+分词、翻译记忆和结果重组仍在主进程中完成，不受GIL限制的只有最耗时的生成部分
+"""
+
+import atexit
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Callable, Dict, List, Optional
+
+from translator.cancellation import CancellationToken, TranslationCancelled
+from translator.config import (
+    DEFAULT_DECODING_PRESET,
+    INFERENCE_BACKEND,
+    TRANSLATION_BATCH_SIZE,
+    TRANSLATION_WORKERS,
+    WORKER_START_METHOD,
+)
+from translator.tuning import partition_cpus
+
+# 结果队列中的消息类型
+MESSAGE_READY = "ready"
+MESSAGE_RESULT = "ok"
+MESSAGE_ERROR = "error"
+MESSAGE_CANCELLED = "cancelled"
+# 可同时取消的generate调用数：每个调用占用一个跨进程的取消事件
+CANCEL_SLOTS = 16
+# 等待结果时检查取消标记的间隔（秒）
+CANCEL_POLL_INTERVAL = 0.05
+
+
+class WorkerError(RuntimeError):
+    """推理进程启动失败、生成出错或意外退出"""
+
+
+def _worker_main(
+    index, cpus, threads, backend, task_queue, result_queue, cancel_events
+):
+    """
+    推理进程：绑定CPU、加载模型，然后循环从任务队列取批次生成
+
+    每个任务带有取消事件的编号，事件被主进程设置后，生成在下一个解码步停止
+    """
+    from translator.model_manager import get_model_manager
+    from translator.pipeline import TranslationPipeline
+    from translator.tuning import apply_thread_settings, set_process_affinity
+
+    try:
+        if cpus:
+            set_process_affinity(cpus)
+        apply_thread_settings(threads)
+        manager = get_model_manager()
+        # 各进程平分CPU核心，不能套用单进程调优得到的线程数和CPU绑定
+        manager.use_performance_profile = False
+        manager.set_backend(backend)
+        model, tokenizer = manager.load()
+    except Exception as e:
+        result_queue.put((None, index, MESSAGE_ERROR, f"模型加载失败: {str(e)}"))
+        return
+    result_queue.put((None, index, MESSAGE_READY, None))
+
+    pipelines = {}
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        task_id, segments, target_langs, source_lang, preset, slot = task
+        cancel_event = cancel_events[slot] if slot >= 0 else None
+        if cancel_event is not None and cancel_event.is_set():
+            result_queue.put((task_id, index, MESSAGE_CANCELLED, None))
+            continue
+        pipeline = pipelines.get((preset, slot))
+        if pipeline is None:
+            pipeline = TranslationPipeline(
+                model,
+                tokenizer,
+                decoding_preset=preset,
+                cancel_token=(
+                    CancellationToken(cancel_event)
+                    if cancel_event is not None
+                    else None
+                ),
+            )
+            pipelines[(preset, slot)] = pipeline
+        # 每个任务就是一批，流水线内部不再切分
+        pipeline.batch_size = max(1, len(segments))
+        try:
+            results = pipeline.generate_batched(
+                segments, target_langs, source_lang=source_lang
+            )
+            result_queue.put((task_id, index, MESSAGE_RESULT, results))
+        except TranslationCancelled:
+            result_queue.put((task_id, index, MESSAGE_CANCELLED, None))
+        except Exception as e:
+            result_queue.put((task_id, index, MESSAGE_ERROR, str(e)))
+
+
+class WorkerPool:
+    """
+    推理进程池
+
+    每个进程从同一个任务队列取批次，哪个进程空闲就由哪个进程处理；
+    主进程同时只保留少量批次在队列中，取消时未发出的批次直接放弃
+    """
+
+    def __init__(
+        self,
+        num_workers: int = TRANSLATION_WORKERS,
+        threads_per_worker: int = 0,
+        backend: str = INFERENCE_BACKEND,
+        start_method: str = WORKER_START_METHOD,
+    ):
+        """
+        Args:
+            num_workers: 推理进程数
+            threads_per_worker: 每个进程的torch线程数，为0时等于分到的CPU核心数
+            backend: 推理后端
+            start_method: 进程启动方式，spawn或fork
+        """
+        self.num_workers = max(1, num_workers)
+        self.threads_per_worker = threads_per_worker
+        self.backend = backend
+        self.start_method = start_method
+        self._processes = []
+        self._task_queue = None
+        self._result_queue = None
+        self._futures: Dict[int, Future] = {}
+        self._futures_lock = threading.Lock()
+        self._next_task_id = 0
+        self._cancel_events = []
+        self._free_slots: List[int] = []
+        self._collector = None
+        self._closed = False
+        # 推理进程意外退出后记录的错误，之后的提交直接失败
+        self._broken: Optional[WorkerError] = None
+
+    @property
+    def started(self) -> bool:
+        return bool(self._processes)
+
+    @property
+    def usable(self) -> bool:
+        """进程池未关闭，且没有推理进程意外退出"""
+        return not self._closed and self._broken is None
+
+    def start(self):
+        """启动推理进程并等待全部加载完模型"""
+        if self.started:
+            return
+        context = multiprocessing.get_context(self.start_method)
+        self._task_queue = context.Queue()
+        self._result_queue = context.Queue()
+        # 事件只能在创建进程时传给子进程，预先创建固定数量，由各generate调用轮流使用
+        self._cancel_events = [context.Event() for _ in range(CANCEL_SLOTS)]
+        self._free_slots = list(range(CANCEL_SLOTS))
+        for index, cpus in enumerate(partition_cpus(self.num_workers)):
+            threads = self.threads_per_worker or len(cpus)
+            process = context.Process(
+                target=_worker_main,
+                args=(
+                    index,
+                    cpus,
+                    threads,
+                    self.backend,
+                    self._task_queue,
+                    self._result_queue,
+                    self._cancel_events,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+
+        ready = 0
+        while ready < self.num_workers:
+            try:
+                _, index, kind, payload = self._result_queue.get(timeout=1.0)
+            except queue.Empty:
+                if not all(process.is_alive() for process in self._processes):
+                    self.close()
+                    raise WorkerError("推理进程意外退出")
+                continue
+            if kind == MESSAGE_ERROR:
+                self.close()
+                raise WorkerError(payload)
+            ready += 1
+
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def _collect(self):
+        """接收各进程的结果并完成对应的Future，进程意外退出时令所有等待中的任务失败"""
+        while not self._closed:
+            try:
+                task_id, _, kind, payload = self._result_queue.get(timeout=0.5)
+            except queue.Empty:
+                if not all(process.is_alive() for process in self._processes):
+                    self._fail_pending(WorkerError("推理进程意外退出"), broken=True)
+                    return
+                continue
+            except (EOFError, OSError):
+                self._fail_pending(
+                    WorkerError("推理进程池的结果队列已关闭"), broken=True
+                )
+                return
+            with self._futures_lock:
+                future = self._futures.pop(task_id, None)
+            if future is None:
+                continue
+            if kind == MESSAGE_RESULT:
+                future.set_result(payload)
+            elif kind == MESSAGE_CANCELLED:
+                future.set_exception(TranslationCancelled("翻译已取消"))
+            else:
+                future.set_exception(WorkerError(payload))
+
+    def _fail_pending(self, error: WorkerError, broken: bool = False):
+        """令所有等待中的任务失败；broken为True时之后的提交也直接失败"""
+        with self._futures_lock:
+            if broken:
+                self._broken = error
+            futures = list(self._futures.values())
+            self._futures.clear()
+        for future in futures:
+            future.set_exception(error)
+
+    def submit(
+        self,
+        segments: List[str],
+        target_langs: List[str],
+        source_lang: Optional[str] = None,
+        decoding_preset: str = DEFAULT_DECODING_PRESET,
+        cancel_slot: int = -1,
+    ) -> Future:
+        """
+        提交一批片段，由空闲的推理进程一次生成
+
+        Args:
+            cancel_slot: 取消事件的编号，为-1时不可取消
+
+        Returns:
+            Future: 结果为与segments一一对应的译文列表
+        """
+        if not self.started:
+            self.start()
+        future = Future()
+        with self._futures_lock:
+            if self._closed:
+                raise WorkerError("推理进程池已关闭")
+            if self._broken is not None:
+                raise self._broken
+            task_id = self._next_task_id
+            self._next_task_id += 1
+            self._futures[task_id] = future
+        self._task_queue.put(
+            (
+                task_id,
+                list(segments),
+                list(target_langs),
+                source_lang,
+                decoding_preset,
+                cancel_slot,
+            )
+        )
+        return future
+
+    def _acquire_cancel_slot(self) -> int:
+        """取得一个空闲的取消事件编号，全部占用时返回-1（此次调用只能停止发出新批次）"""
+        with self._futures_lock:
+            if not self._free_slots:
+                return -1
+            slot = self._free_slots.pop()
+        self._cancel_events[slot].clear()
+        return slot
+
+    def _release_cancel_slot(self, slot: int, futures: List[Future]):
+        """
+        已发出的批次全部结束后归还取消事件，
+        避免事件被下一个调用清除时仍有已取消的批次在排队
+        """
+        if slot < 0:
+            return
+        remaining = [future for future in futures if not future.done()]
+        if not remaining:
+            with self._futures_lock:
+                self._free_slots.append(slot)
+            return
+        counter = [len(remaining)]
+
+        def on_done(_):
+            with self._futures_lock:
+                counter[0] -= 1
+                if counter[0] == 0:
+                    self._free_slots.append(slot)
+
+        for future in remaining:
+            future.add_done_callback(on_done)
+
+    def generate(
+        self,
+        segments: List[str],
+        target_langs: List[str],
+        batch_size: int = TRANSLATION_BATCH_SIZE,
+        decoding_preset: str = DEFAULT_DECODING_PRESET,
+        source_lang: Optional[str] = None,
+        estimates: Optional[List[int]] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        partial_callback: Optional[Callable[[Dict[int, str]], None]] = None,
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> List[str]:
+        """
+        按长度排序分批，分发给各推理进程并行生成，结果按输入顺序返回
+
+        Args:
+            segments: 待翻译片段
+            target_langs: 与segments一一对应的目标语言
+            batch_size: 每批的片段数
+            decoding_preset: 解码预设
+            source_lang: 源语言代码
+            estimates: 每个片段估算的输出token数，用于排序和计算进度
+            progress_callback: 进度回调，参数为(已完成批次的估算token数, 估算的总token数)
+            partial_callback: 每批完成时的回调，参数为 片段下标 -> 译文
+            cancel_token: 取消标记，取消后不再发出新的批次，已发出的批次在推理进程中
+                于下一个解码步停止，并抛出TranslationCancelled
+
+        Returns:
+            List[str]: 与输入一一对应的译文
+        """
+        if not segments:
+            return []
+        if estimates is None:
+            estimates = [len(segment) for segment in segments]
+        order = sorted(range(len(segments)), key=lambda i: estimates[i])
+        batches = [
+            order[start : start + batch_size]
+            for start in range(0, len(order), max(1, batch_size))
+        ]
+        total_tokens = sum(estimates)
+        finished_tokens = 0
+        results = [""] * len(segments)
+
+        # 每个进程最多排队两批，既不让进程空等，也使取消时浪费的计算有限
+        max_in_flight = self.num_workers * 2
+        slot = self._acquire_cancel_slot() if cancel_token is not None else -1
+        pending = {}
+        next_batch = 0
+        try:
+            while next_batch < len(batches) or pending:
+                if cancel_token is not None and cancel_token.cancelled:
+                    # 通知推理进程在下一个解码步停止已发出的批次
+                    if slot >= 0:
+                        self._cancel_events[slot].set()
+                    cancel_token.raise_if_cancelled()
+                while next_batch < len(batches) and len(pending) < max_in_flight:
+                    indices = batches[next_batch]
+                    future = self.submit(
+                        [segments[i] for i in indices],
+                        [target_langs[i] for i in indices],
+                        source_lang,
+                        decoding_preset,
+                        slot,
+                    )
+                    pending[future] = indices
+                    next_batch += 1
+
+                done, _ = wait(
+                    list(pending),
+                    timeout=CANCEL_POLL_INTERVAL,
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    indices = pending.pop(future)
+                    for index, text in zip(indices, future.result()):
+                        results[index] = text
+                    finished_tokens += sum(estimates[i] for i in indices)
+                    if progress_callback is not None:
+                        progress_callback(finished_tokens, total_tokens)
+                    if partial_callback is not None:
+                        partial_callback({i: results[i] for i in indices})
+        finally:
+            self._release_cancel_slot(slot, list(pending))
+        return results
+
+    def close(self):
+        """通知各进程退出，未能及时退出的进程被强制结束"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._processes:
+            try:
+                self._task_queue.put(None)
+            except (OSError, ValueError):
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._fail_pending(WorkerError("推理进程池已关闭"))
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> Optional[WorkerPool]:
+    """
+    获取进程内共享的推理进程池，TRANSLATION_WORKERS不大于1时返回None；
+    有推理进程意外退出的进程池会被关闭并重新启动
+    """
+    global _shared_pool
+    if TRANSLATION_WORKERS <= 1:
+        return None
+    if _shared_pool is None or not _shared_pool.usable:
+        with _shared_pool_lock:
+            if _shared_pool is not None and not _shared_pool.usable:
+                _shared_pool.close()
+                _shared_pool = None
+            if _shared_pool is None:
+                pool = WorkerPool(TRANSLATION_WORKERS)
+                pool.start()
+                atexit.register(pool.close)
+                _shared_pool = pool
+    return _shared_pool
+
+
+def shutdown_worker_pool():
+    """关闭共享的推理进程池"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is not None:
+            _shared_pool.close()
+            _shared_pool = None